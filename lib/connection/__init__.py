@@ -15,7 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import threading
+
 class Connection:
+    # name of the virtual host behind the connection, if any
+    servername = None
+    # circuit breaker of the target, if any
+    breaker = None
+    # counter of all connections to the target, if any
+    counter = None
+
     def __init__(self):
         pass
 
@@ -25,9 +35,45 @@ class Connection:
     def __exit__(self, ctx_type, ctx_value, ctx_traceback):
         pass
 
+class Connection_Counter:
+    # connections opened by all (parallel) probes of a scan
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    # the lock can not be pickled (targets are returned by worker processes)
+    def __getstate__(self):
+        return {'count': self.count}
+
+    def __setstate__(self, state):
+        self.count = state['count']
+        self.lock = threading.Lock()
+
+    def increment(self):
+        with self.lock:
+            self.count += 1
+
 class Connection_Exception(Exception):
-    def __init__(self, msg):
+    def __init__(self, msg, connecting=False):
         self.msg = msg
+        # raised while establishing the connection, before any data was sent
+        self.connecting = connecting
 
     def __str__(self):
         return 'Connection Exception: ' + str(self.msg)
+
+class Connection_Timeout_Exception(Connection_Exception):
+    def __str__(self):
+        return 'Connection Timeout: ' + str(self.msg)
+
+class Connection_Refused_Exception(Connection_Exception):
+    def __str__(self):
+        return 'Connection Refused: ' + str(self.msg)
+
+class Connection_Reset_Exception(Connection_Exception):
+    def __str__(self):
+        return 'Connection Reset: ' + str(self.msg)
+
+class Connection_Circuit_Open_Exception(Connection_Exception):
+    def __str__(self):
+        return 'Connection Circuit Open: ' + str(self.msg)
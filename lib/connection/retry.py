@@ -0,0 +1,84 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import random
+import threading
+
+# TLS SAK imports
+from lib.connection import Connection_Circuit_Open_Exception
+from lib.connection import Connection_Refused_Exception
+from lib.connection import Connection_Reset_Exception
+from lib.connection import Connection_Timeout_Exception
+
+class Connection_Retry_Policy:
+    # retries per kind of failure: resets are mostly transient, timeouts are
+    # expensive and a refused connection means the port is closed. Other
+    # failures (e.g. a server closing the connection after the ClientHello)
+    # are answers of the server and not retried.
+    RETRIES = [(Connection_Reset_Exception, 2), (Connection_Timeout_Exception, 1), (Connection_Refused_Exception, 0)]
+    # seconds of the first backoff, doubled with each retry
+    BACKOFF = 0.5
+    MAXIMUM_BACKOFF = 5.0
+
+    @staticmethod
+    def retries(e):
+        for cls, retries in Connection_Retry_Policy.RETRIES:
+            if isinstance(e, cls):
+                return retries
+        return 0
+
+    @staticmethod
+    def isHardFailure(e):
+        # only a target which can not be connected to is dead, a reset after
+        # the ClientHello is the server refusing that single handshake (e.g.
+        # a protocol it does not support)
+        return e.connecting and isinstance(e, (Connection_Refused_Exception, Connection_Timeout_Exception))
+
+    @staticmethod
+    def delay(attempt):
+        # full jitter, so parallel probes do not retry in lockstep
+        return random.uniform(0, min(Connection_Retry_Policy.MAXIMUM_BACKOFF, Connection_Retry_Policy.BACKOFF * 2 ** attempt))
+
+class Connection_Circuit_Breaker:
+    # consecutive failures to connect (after all retries) until a target is
+    # given up
+    THRESHOLD = 3
+
+    def __init__(self):
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    # the lock can not be pickled (targets are returned by worker processes)
+    def __getstate__(self):
+        return {'failures': self.failures}
+
+    def __setstate__(self, state):
+        self.failures = state['failures']
+        self.lock = threading.Lock()
+
+    def check(self):
+        if self.failures >= self.THRESHOLD:
+            raise Connection_Circuit_Open_Exception('target given up after ' + str(self.failures) + ' consecutive connection failures')
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
@@ -26,7 +26,13 @@ class Connection_STARTTLS(Connection_TCP_Socket):
 
     def connect(self):
         super(Connection_STARTTLS, self).connect()
-        self.do_starttls()
+        self.buffer = b''
+        try:
+            self.do_starttls()
+        except Exception:
+            # a failed negotiation must not leave the connection half open
+            self.close()
+            raise
 
     def do_starttls(self):
         pass
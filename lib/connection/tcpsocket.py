@@ -17,16 +17,49 @@
 
 # generic imports
 import socket
+import threading
+import time
 
 # TLS SAK imports
 from lib.connection import Connection
 from lib.connection import Connection_Exception
+from lib.connection import Connection_Refused_Exception
+from lib.connection import Connection_Reset_Exception
+from lib.connection import Connection_Timeout_Exception
+
+class Connection_DNS_Cache:
+    # seconds until a resolved address is looked up again
+    ttl = 300
+    entries = {}
+    lock = threading.Lock()
+
+    @staticmethod
+    def resolve(host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with Connection_DNS_Cache.lock:
+            entry = Connection_DNS_Cache.entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        infos = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        if len(infos) < 1:
+            raise socket.gaierror('no address found for ' + str(host))
+
+        # prefer IPv4 addresses
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        address = (infos[0][0], infos[0][4])
+
+        with Connection_DNS_Cache.lock:
+            Connection_DNS_Cache.entries[key] = (now + Connection_DNS_Cache.ttl, address)
+        return address
 
 class Connection_TCP_Socket(Connection):
     def __init__(self, host, port):
         self.host = host
         self.port = port
         self.socket = None
+        self.connections = 0
 
     def __enter__(self):
         self.connect()
@@ -38,18 +71,29 @@ class Connection_TCP_Socket(Connection):
         if self.socket is not None:
             raise Connection_Exception('already connected')
 
+        self.connections += 1
+        if self.counter is not None:
+            self.counter.increment()
+
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            family, address = Connection_DNS_Cache.resolve(self.host, self.port)
+            self.socket = socket.socket(family, socket.SOCK_STREAM)
             self.socket.settimeout(10)
-            self.socket.connect((self.host, self.port))
+            self.socket.connect(address)
         except socket.gaierror as e:
             raise Connection_Exception(e)
-        except socket.timeout as e:
-            raise Connection_Exception(e)
-        except TimeoutError as e:
-            raise Connection_Exception(e)
+        except (socket.timeout, TimeoutError) as e:
+            self.close()
+            raise Connection_Timeout_Exception(e, connecting=True)
         except ConnectionRefusedError as e:
-            raise Connection_Exception(e)
+            self.close()
+            raise Connection_Refused_Exception(e, connecting=True)
+        except ConnectionResetError as e:
+            self.close()
+            raise Connection_Reset_Exception(e, connecting=True)
+        except OSError as e:
+            self.close()
+            raise Connection_Exception(e, connecting=True)
 
     def close(self):
         if self.socket != None:
@@ -60,13 +104,27 @@ class Connection_TCP_Socket(Connection):
         if self.socket is None:
             raise Connection_Exception('not connected')
 
-        self.socket.send(msg)
+        try:
+            self.socket.send(msg)
+        except socket.timeout as e:
+            raise Connection_Timeout_Exception(e)
+        except (ConnectionResetError, BrokenPipeError) as e:
+            raise Connection_Reset_Exception(e)
+        except OSError as e:
+            raise Connection_Exception(e)
 
     def recv(self):
         if self.socket is None:
             raise Connection_Exception('not connected')
 
-        data = self.socket.recv(4096)
+        try:
+            data = self.socket.recv(4096)
+        except socket.timeout as e:
+            raise Connection_Timeout_Exception(e)
+        except ConnectionResetError as e:
+            raise Connection_Reset_Exception(e)
+        except OSError as e:
+            raise Connection_Exception(e)
         if data is None or len(data) < 1:
             raise Connection_Exception('no data received from socket')
         return data
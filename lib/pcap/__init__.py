@@ -0,0 +1,229 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import mmap
+import struct
+
+class Pcap_Exception(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return 'Pcap Exception: ' + str(self.msg)
+
+class Pcap_Reader:
+    # link layer types
+    LINKTYPE_NULL = 0
+    LINKTYPE_ETHERNET = 1
+    LINKTYPE_RAW = 101
+    LINKTYPE_LINUX_SLL = 113
+    LINKTYPE_IPV4 = 228
+    LINKTYPE_IPV6 = 229
+    LINKTYPE_LINUX_SLL2 = 276
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.buffer = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'rb')
+        try:
+            # captures are mapped instead of read, pages are only loaded while
+            # the packets are processed
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            self.buffer = b''
+        return self
+
+    def __exit__(self, ctx_type, ctx_value, ctx_traceback):
+        if type(self.buffer) is mmap.mmap:
+            self.buffer.close()
+        self.file.close()
+
+    def packets(self):
+        # yields (link type, timestamp, packet data) for each packet
+        if len(self.buffer) < 4:
+            return
+        magic = self.buffer[0:4]
+        if magic == b'\x0a\x0d\x0d\x0a':
+            yield from self.packetsPcapng()
+        elif magic in (b'\xd4\xc3\xb2\xa1', b'\xa1\xb2\xc3\xd4', b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d'):
+            yield from self.packetsPcap()
+        else:
+            raise Pcap_Exception('unknown file format: ' + self.path)
+
+    def packetsPcap(self):
+        #  4 bytes  magic number        (0xa1b2c3d4 = microseconds, 0xa1b23c4d = nanoseconds)
+        #  2 bytes  major version
+        #  2 bytes  minor version
+        #  8 bytes  (reserved)
+        #  4 bytes  snap length
+        #  4 bytes  link type
+        buffer = self.buffer
+        endian = '<' if buffer[0:4] in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1') else '>'
+        resolution = 1e-9 if buffer[0:4] in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e-6
+        if len(buffer) < 24:
+            raise Pcap_Exception('truncated file header: ' + self.path)
+        [linktype] = struct.unpack_from(endian + 'I', buffer, 20)
+        linktype &= 0xffff
+
+        # - packet record -
+        #  4 bytes  timestamp (seconds)
+        #  4 bytes  timestamp (micro- or nanoseconds)
+        #  4 bytes  captured length
+        #  4 bytes  original length
+        # .. bytes  packet data
+        header = struct.Struct(endian + 'IIII')
+        view = memoryview(buffer)
+        pos = 24
+        end = len(buffer)
+        while pos + 16 <= end:
+            ts_sec, ts_frac, caplen, origlen = header.unpack_from(buffer, pos)
+            pos += 16
+            if pos + caplen > end:
+                break
+            yield linktype, ts_sec + ts_frac * resolution, view[pos:pos+caplen]
+            pos += caplen
+
+    def packetsPcapng(self):
+        # - block -
+        #  4 bytes  block type
+        #  4 bytes  total block length
+        # .. bytes  block body
+        #  4 bytes  total block length
+        buffer = self.buffer
+        view = memoryview(buffer)
+        endian = '<'
+        linktypes = []
+        resolutions = []
+        pos = 0
+        end = len(buffer)
+        while pos + 12 <= end:
+            if buffer[pos:pos+4] == b'\x0a\x0d\x0d\x0a':
+                # section header block: byte order magic, new list of interfaces
+                endian = '<' if buffer[pos+8:pos+12] == b'\x4d\x3c\x2b\x1a' else '>'
+                linktypes = []
+                resolutions = []
+            [block_type, block_length] = struct.unpack_from(endian + 'II', buffer, pos)
+            if block_length < 12 or pos + block_length > end:
+                break
+
+            if block_type == 1:
+                # interface description block
+                [linktype] = struct.unpack_from(endian + 'H', buffer, pos + 8)
+                linktypes += [linktype]
+                resolutions += [self.resolution(buffer, pos + 16, pos + block_length - 4, endian)]
+            elif block_type == 6:
+                # enhanced packet block
+                interface, ts_high, ts_low, caplen = struct.unpack_from(endian + 'IIII', buffer, pos + 8)
+                if interface < len(linktypes):
+                    yield linktypes[interface], ((ts_high << 32) | ts_low) * resolutions[interface], view[pos+28:pos+28+caplen]
+            elif block_type == 3 and len(linktypes) > 0:
+                # simple packet block
+                [origlen] = struct.unpack_from(endian + 'I', buffer, pos + 8)
+                caplen = min(origlen, block_length - 16)
+                yield linktypes[0], 0, view[pos+12:pos+12+caplen]
+
+            pos += block_length
+
+    @staticmethod
+    def resolution(buffer, pos, end, endian):
+        # if_tsresol option of an interface description block
+        while pos + 4 <= end:
+            [code, length] = struct.unpack_from(endian + 'HH', buffer, pos)
+            if code == 0:
+                break
+            if code == 9 and length == 1:
+                value = buffer[pos+4]
+                if value & 0x80:
+                    return 2 ** -(value & 0x7f)
+                return 10 ** -value
+            pos += 4 + ((length + 3) & ~3)
+        return 1e-6
+
+class Pcap_Packet_Decoder:
+    # decodes TCP segments: returns (source, destination, flags, sequence
+    # number, payload) or None for everything else
+    @staticmethod
+    def decode(linktype, data):
+        if linktype == Pcap_Reader.LINKTYPE_ETHERNET:
+            if len(data) < 14:
+                return None
+            ethertype = (data[12] << 8) | data[13]
+            pos = 14
+            while ethertype in (0x8100, 0x88a8) and len(data) >= pos + 4:
+                ethertype = (data[pos+2] << 8) | data[pos+3]
+                pos += 4
+        elif linktype == Pcap_Reader.LINKTYPE_LINUX_SLL:
+            if len(data) < 16:
+                return None
+            ethertype = (data[14] << 8) | data[15]
+            pos = 16
+        elif linktype == Pcap_Reader.LINKTYPE_LINUX_SLL2:
+            if len(data) < 20:
+                return None
+            ethertype = (data[0] << 8) | data[1]
+            pos = 20
+        elif linktype == Pcap_Reader.LINKTYPE_NULL:
+            if len(data) < 4:
+                return None
+            family = data[0] | data[3]
+            ethertype = 0x0800 if family == 2 else 0x86dd
+            pos = 4
+        elif linktype in (Pcap_Reader.LINKTYPE_RAW, Pcap_Reader.LINKTYPE_IPV4, Pcap_Reader.LINKTYPE_IPV6):
+            if len(data) < 1:
+                return None
+            ethertype = 0x0800 if data[0] >> 4 == 4 else 0x86dd
+            pos = 0
+        else:
+            return None
+
+        if ethertype == 0x0800:
+            # IPv4, fragments are ignored
+            if len(data) < pos + 20 or data[pos+9] != 6:
+                return None
+            if ((data[pos+6] & 0x1f) << 8) | data[pos+7] != 0:
+                return None
+            header_length = (data[pos] & 0x0f) * 4
+            total_length = (data[pos+2] << 8) | data[pos+3]
+            source = bytes(data[pos+12:pos+16])
+            destination = bytes(data[pos+16:pos+20])
+            end = min(len(data), pos + total_length)
+            pos += header_length
+        elif ethertype == 0x86dd:
+            # IPv6 without extension headers
+            if len(data) < pos + 40 or data[pos+6] != 6:
+                return None
+            payload_length = (data[pos+4] << 8) | data[pos+5]
+            source = bytes(data[pos+8:pos+24])
+            destination = bytes(data[pos+24:pos+40])
+            end = min(len(data), pos + 40 + payload_length)
+            pos += 40
+        else:
+            return None
+
+        if end < pos + 20:
+            return None
+        source_port = (data[pos] << 8) | data[pos+1]
+        destination_port = (data[pos+2] << 8) | data[pos+3]
+        [sequence] = struct.unpack_from('!I', data, pos + 4)
+        header_length = (data[pos+12] >> 4) * 4
+        flags = data[pos+13]
+        return (source, source_port), (destination, destination_port), flags, sequence, data[pos+header_length:end]
@@ -0,0 +1,219 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import collections
+import struct
+
+# TLS SAK imports
+from lib.pcap import Pcap_Packet_Decoder
+from lib.pcap import Pcap_Reader
+from lib.pcap.tcp import Pcap_TCP_Stream
+from lib.tls import TLS_VERSIONS
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlsexceptions import TLS_Exception
+from lib.tls.tlsparameter import TLS_Extension_ServerName
+from lib.tls.tlsparameter import TLS_Extension_SupportedVersions
+from lib.tls.tlspkg import TLS_pkg
+from lib.tls.tlspkg import TLS_Handshake_pkg_ClientHello
+from lib.tls.tlspkg import TLS_Handshake_pkg_ServerHello
+
+class Pcap_TLS_Statistics:
+    def __init__(self):
+        self.counters = {'packets': collections.Counter(), 'clientversions': collections.Counter(), \
+                         'offered': collections.Counter(), 'negotiated': collections.Counter(), \
+                         'versions': collections.Counter(), 'alerts': collections.Counter(), \
+                         'servernames': collections.Counter()}
+
+    def count(self, counter, key, value=1):
+        self.counters[counter][key] += value
+
+    def merge(self, other):
+        for name, counter in other.counters.items():
+            self.counters[name].update(counter)
+
+    def report(self, top=None):
+        database = TLS_CipherSuite_Database.getInstance()
+        report = {}
+        for name, counter in self.counters.items():
+            items = counter.most_common(top if name in ('offered', 'servernames') else None)
+            if name in ('offered', 'negotiated'):
+                # cipher suites are counted by id, names are only looked up once
+                items = [(self.name(database, key), value) for key, value in items]
+            report[name] = collections.OrderedDict(items)
+        return report
+
+    @staticmethod
+    def name(database, key):
+        if type(key) is tuple:
+            return key[0] + ' ' + database.getCipherSuite(key[1]).name
+        return database.getCipherSuite(key).name
+
+class Pcap_TLS_Connection:
+    # state of one TCP connection until the ClientHello and the answer of the
+    # server have been seen
+    LIMIT = 65536
+
+    def __init__(self):
+        self.streams = {}
+        self.client = None
+        self.client_hello = None
+        self.done = False
+
+class Pcap_TLS_Analyzer:
+    # connections without handshake are forgotten after this many packets
+    MAX_CONNECTIONS = 100000
+
+    def __init__(self):
+        self.statistics = Pcap_TLS_Statistics()
+        self.connections = collections.OrderedDict()
+
+    def analyzeFile(self, path):
+        with Pcap_Reader(path) as reader:
+            for linktype, timestamp, data in reader.packets():
+                self.statistics.count('packets', 'total')
+                segment = Pcap_Packet_Decoder.decode(linktype, data)
+                if segment is None:
+                    continue
+                self.statistics.count('packets', 'tcp')
+                self.analyzeSegment(*segment)
+
+            # packet data refers to the mapped file until it is released
+            data = segment = None
+        return self.statistics
+
+    def analyzeSegment(self, source, destination, flags, sequence, payload):
+        key = (source, destination) if source < destination else (destination, source)
+        connection = self.connections.get(key)
+
+        # FIN or RST: the connection is over
+        if flags & 0x05:
+            if connection is not None:
+                del self.connections[key]
+            return
+
+        if connection is None:
+            if len(payload) > 0 and payload[0] != 0x16:
+                # not starting with a TLS handshake
+                return
+            connection = Pcap_TLS_Connection()
+            self.connections[key] = connection
+            if len(self.connections) > self.MAX_CONNECTIONS:
+                self.connections.popitem(last=False)
+        if connection.done:
+            return
+
+        stream = connection.streams.get(source)
+        if stream is None:
+            stream = connection.streams[source] = Pcap_TCP_Stream(Pcap_TLS_Connection.LIMIT)
+        if not stream.add(sequence, payload, flags & 0x02 != 0):
+            return
+
+        try:
+            self.analyzeStream(connection, source, stream)
+        except (TLS_Exception, struct.error, ValueError):
+            # no TLS or broken handshake
+            self.statistics.count('packets', 'invalid')
+            connection.done = True
+            connection.streams = {}
+
+    def analyzeStream(self, connection, source, stream):
+        # the ClientHello of this connection has already been counted
+        if connection.client == source:
+            return
+
+        message = self.firstHandshakeMessage(stream.data)
+        if message is None:
+            return
+
+        if message[0] == 'alert':
+            if connection.client is not None:
+                self.statistics.count('alerts', message[1].getDescription())
+                connection.done = True
+            return
+
+        if connection.client is None and message[0:1] == TLS_Handshake_pkg_ClientHello.PACKAGETYPE:
+            client_hello = TLS_Handshake_pkg_ClientHello()
+            client_hello.parse(message)
+            connection.client = source
+            connection.client_hello = client_hello
+            self.countClientHello(client_hello)
+        elif connection.client is None and message[0:1] == TLS_Handshake_pkg_ServerHello.PACKAGETYPE:
+            # ClientHello has not been captured (yet)
+            return
+        elif message[0:1] == TLS_Handshake_pkg_ServerHello.PACKAGETYPE:
+            server_hello = TLS_Handshake_pkg_ServerHello()
+            server_hello.parse(message)
+            self.countServerHello(server_hello)
+            connection.done = True
+            connection.streams = {}
+        else:
+            raise TLS_Exception('unexpected handshake message')
+
+    @staticmethod
+    def firstHandshakeMessage(data):
+        # handshake messages may be fragmented over several records, so the
+        # record layer is removed before the message is parsed
+        handshake = b''
+        pos = 0
+        while pos + 5 <= len(data):
+            content_type = data[pos]
+            if data[pos+1] != 3:
+                raise TLS_Exception('no TLS record')
+            [size] = struct.unpack_from('!H', data, pos + 3)
+            if pos + 5 + size > len(data):
+                return None
+            if content_type == 0x15 and len(handshake) == 0:
+                return ('alert', TLS_pkg.parser(bytes(data[pos:pos+5+size])))
+            elif content_type != 0x16:
+                raise TLS_Exception('handshake record expected')
+            handshake += data[pos+5:pos+5+size]
+            pos += 5 + size
+
+            if len(handshake) >= 4:
+                [message_size] = struct.unpack('!I', b'\x00' + handshake[1:4])
+                if len(handshake) >= 4 + message_size:
+                    return bytes(handshake[:4+message_size])
+        return None
+
+    def countClientHello(self, client_hello):
+        self.statistics.count('packets', 'clienthello')
+
+        version = client_hello.version
+        for ext in client_hello.extensions:
+            if type(ext) is TLS_Extension_SupportedVersions:
+                version = max((v for v in ext.versions if v in TLS_VERSIONS), key=lambda v: TLS_VERSIONS[v], default=version)
+            elif type(ext) is TLS_Extension_ServerName and ext.hostname is not None:
+                self.statistics.count('servernames', ext.hostname.decode('utf-8', 'replace'))
+        self.statistics.count('clientversions', version)
+
+        for cs in client_hello.cipher_suites:
+            self.statistics.count('offered', cs.cs_id)
+
+    def countServerHello(self, server_hello):
+        self.statistics.count('packets', 'serverhello')
+
+        version = server_hello.version
+        supported_versions = server_hello.getExtension(TLS_Extension_SupportedVersions.EXTENSIONTYPE)
+        if supported_versions is not None and len(supported_versions.versions) == 1:
+            version = supported_versions.versions[0]
+        self.statistics.count('versions', version)
+        self.statistics.count('negotiated', (version, server_hello.cipher_suite.cs_id))
+
+def analyzeFile(path):
+    # entry point of the worker processes
+    return path, Pcap_TLS_Analyzer().analyzeFile(path)
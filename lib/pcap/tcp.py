@@ -0,0 +1,56 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+class Pcap_TCP_Stream:
+    # reassembles the first bytes of one direction of a TCP connection
+    def __init__(self, limit):
+        self.limit = limit
+        self.next_sequence = None
+        self.segments = {}
+        self.data = bytearray()
+
+    def add(self, sequence, payload, syn=False):
+        if syn:
+            self.next_sequence = (sequence + 1) & 0xffffffff
+            return False
+        if len(payload) < 1 or len(self.data) >= self.limit:
+            return False
+        if self.next_sequence is None:
+            # capture started within the connection
+            self.next_sequence = sequence
+
+        offset = (sequence - self.next_sequence) & 0xffffffff
+        if offset >= 0x80000000:
+            # retransmission of data already seen (possibly overlapping)
+            overlap = (self.next_sequence - sequence) & 0xffffffff
+            if overlap >= len(payload):
+                return False
+            payload = payload[overlap:]
+            offset = 0
+        if offset > 0:
+            # out of order, wait for the missing data
+            if len(self.segments) < 64:
+                self.segments[sequence] = bytes(payload)
+            return False
+
+        self.data += payload
+        self.next_sequence = (self.next_sequence + len(payload)) & 0xffffffff
+        while self.next_sequence in self.segments:
+            payload = self.segments.pop(self.next_sequence)
+            self.data += payload
+            self.next_sequence = (self.next_sequence + len(payload)) & 0xffffffff
+        return True
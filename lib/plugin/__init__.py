@@ -37,6 +37,12 @@ class Plugin:
     def deinit(self, storage):
         pass
 
+    def acceptTarget(self, target):
+        return True
+
+    def initTarget(self, storage, target):
+        storage.put(type(self).__name__, Plugin_Storage())
+
     def instancable(self):
         return False
 
@@ -139,6 +145,8 @@ class Plugin_Storage:
         self._storage = {}
 
     def __getattr__(self, name):
+        if name[:1] == '_':
+            raise AttributeError(name)
         return self.get(name)
 
     def __setattr__(self, name, value):
@@ -155,12 +163,20 @@ class Plugin_Storage:
     def put(self, key, value):
         self._storage[key] = value
 
+    def items(self):
+        return self._storage.items()
+
+    def copy(self):
+        storage = Plugin_Storage()
+        storage._storage = dict(self._storage)
+        return storage
+
     def init(self, key, value):
         self.put(key, value)
         return self.get(key, value)
 
     def append(self, key, value):
-        self.put(key, self.get(key, []) + [value])
+        self._storage.setdefault(key, []).append(value)
 
 class Plugin_Exception(Exception):
     def __init__(self, msg):
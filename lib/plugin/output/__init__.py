@@ -15,6 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import collections
+import threading
+import traceback
+
 # TLS SAK imports
 from lib.plugin import Plugin
 from lib.plugin import Plugin_Exception
@@ -29,34 +34,176 @@ class Output_Log_Plugin(Plugin):
     def logError(self, msg):
         pass
 
+    def flushLog(self):
+        # called after each batch of events, e.g. to write buffered lines
+        pass
+
 class Output_Ciphersuites_Plugin(Plugin):
-    def reportCiphersuite(self, cs):
+    def reportCiphersuite(self, target, protocol, cs):
+        pass
+
+    def reportCiphersuitesDone(self, target, protocol, fingerprint):
+        pass
+
+class Output_Metrics_Plugin(Plugin):
+    def reportHandshake(self, protocol, duration, bytes_sent, bytes_received):
+        pass
+
+    def reportAlert(self, protocol, description):
+        pass
+
+    def reportTimeout(self, protocol):
         pass
 
-class Helper_Output_Plugin(Output_Log_Plugin,Output_Ciphersuites_Plugin):
+    def reportConnectionError(self, protocol):
+        pass
+
+    def reportHandshakesSaved(self, protocol, count):
+        pass
+
+    def reportTarget(self, target, duration):
+        pass
+
+class Output_Result_Plugin(Plugin):
+    def reportResult(self, target, storage):
+        pass
+
+class Helper_Output_Plugin(Output_Log_Plugin,Output_Ciphersuites_Plugin,Output_Metrics_Plugin,Output_Result_Plugin):
+    # events waiting for the writer thread, reporting threads block when
+    # this many events are pending
+    QUEUE_SIZE = 10000
+    # events handed to the listeners before the log plugins are flushed
+    BATCH_SIZE = 256
+
     def instancable(self):
         return True
 
-    def _helper(self, p, l):
-        if p != self:
-            l(p)
+    def priority(self):
+        # deinit before all other plugins, so pending events are delivered
+        # while the outputs are still open
+        return -1
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        # listeners per output interface, all plugins are loaded by now
+        self.listeners = {}
+        for interface in (Output_Log_Plugin, Output_Ciphersuites_Plugin, Output_Metrics_Plugin, Output_Result_Plugin):
+            self.listeners[interface] = [p for p in Plugin.instances if isinstance(p, interface) and p is not self]
+
+        # events are appended to a deque (cheap and thread-safe), the writer
+        # thread is woken up only when it is idle
+        self.events = collections.deque()
+        self.wakeup = threading.Event()
+        self.space = threading.Condition()
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def deinit(self, storage):
+        self.flush()
+
+    def flush(self):
+        # wait until all events reported so far have been delivered
+        if self.writer is not None:
+            delivered = threading.Event()
+            self._enqueue((None, delivered, None))
+            delivered.wait()
+
+    def _dispatch(self, interface, name, params):
+        listeners = self.listeners[interface]
+        if len(listeners) > 0:
+            self._enqueue((listeners, name, params))
+
+    def _enqueue(self, event):
+        # the writer thread is started on the first event (and in each worker
+        # process on its own)
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._write, daemon=True)
+                    self.writer.start()
+
+        # backpressure: block the reporting thread while the writer is behind
+        if len(self.events) >= self.QUEUE_SIZE:
+            with self.space:
+                self.space.wait_for(lambda: len(self.events) < self.QUEUE_SIZE)
+
+        self.events.append(event)
+        if not self.wakeup.is_set():
+            self.wakeup.set()
+
+    def _write(self):
+        # the only thread calling the output plugins, events are delivered in
+        # the order they were reported
+        logs = self.listeners[Output_Log_Plugin]
+        while True:
+            if len(self.events) < 1:
+                # check again after clearing, an event may have been added
+                # while the wakeup was still set
+                self.wakeup.clear()
+                if len(self.events) < 1:
+                    self.wakeup.wait()
+                continue
+
+            batch = []
+            while len(batch) < self.BATCH_SIZE and len(self.events) > 0:
+                batch += [self.events.popleft()]
+            with self.space:
+                self.space.notify_all()
+
+            for listeners, name, params in batch:
+                if listeners is None:
+                    # flush marker
+                    self._flushLogs(logs)
+                    name.set()
+                    continue
+                for p in listeners:
+                    try:
+                        getattr(p, name)(*params)
+                    except Exception:
+                        traceback.print_exc()
+            self._flushLogs(logs)
+
+    @staticmethod
+    def _flushLogs(logs):
+        for p in logs:
+            try:
+                p.flushLog()
+            except Exception:
+                traceback.print_exc()
 
     def logVerbose(self, msg):
-        l = lambda p, msg=msg: p.logVerbose(msg)
-        l = lambda p, s=self, l=l: s._helper(p, l)
-        Plugin.executeLambda(Output_Log_Plugin, l)
+        self._dispatch(Output_Log_Plugin, 'logVerbose', (msg,))
 
     def logInfo(self, msg):
-        l = lambda p, msg=msg: p.logInfo(msg)
-        l = lambda p, s=self, l=l: s._helper(p, l)
-        Plugin.executeLambda(Output_Log_Plugin, l)
+        self._dispatch(Output_Log_Plugin, 'logInfo', (msg,))
 
     def logError(self, msg):
-        l = lambda p, msg=msg: p.logError(msg)
-        l = lambda p, s=self, l=l: s._helper(p, l)
-        Plugin.executeLambda(Output_Log_Plugin, l)
-
-    def reportCiphersuite(self, cs):
-        l = lambda p, msg=msg: p.reportCiphersuite(cs)
-        l = lambda p, s=self, l=l: s._helper(p, l)
-        Plugin.executeLambda(Output_Ciphersuites_Plugin, l)
+        self._dispatch(Output_Log_Plugin, 'logError', (msg,))
+
+    def reportCiphersuite(self, target, protocol, cs):
+        self._dispatch(Output_Ciphersuites_Plugin, 'reportCiphersuite', (target, protocol, cs))
+
+    def reportCiphersuitesDone(self, target, protocol, fingerprint):
+        self._dispatch(Output_Ciphersuites_Plugin, 'reportCiphersuitesDone', (target, protocol, fingerprint))
+
+    def reportHandshake(self, protocol, duration, bytes_sent, bytes_received):
+        self._dispatch(Output_Metrics_Plugin, 'reportHandshake', (protocol, duration, bytes_sent, bytes_received))
+
+    def reportAlert(self, protocol, description):
+        self._dispatch(Output_Metrics_Plugin, 'reportAlert', (protocol, description))
+
+    def reportTimeout(self, protocol):
+        self._dispatch(Output_Metrics_Plugin, 'reportTimeout', (protocol,))
+
+    def reportConnectionError(self, protocol):
+        self._dispatch(Output_Metrics_Plugin, 'reportConnectionError', (protocol,))
+
+    def reportHandshakesSaved(self, protocol, count):
+        self._dispatch(Output_Metrics_Plugin, 'reportHandshakesSaved', (protocol, count))
+
+    def reportTarget(self, target, duration):
+        self._dispatch(Output_Metrics_Plugin, 'reportTarget', (target, duration))
+
+    def reportResult(self, target, storage):
+        self._dispatch(Output_Result_Plugin, 'reportResult', (target, storage))
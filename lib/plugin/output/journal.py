@@ -0,0 +1,125 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import binascii
+import json
+import os
+import time
+
+# TLS SAK imports
+from lib.plugin import Plugin_Exception
+from lib.plugin.output import Output_Ciphersuites_Plugin
+from lib.plugin.output import Output_Result_Plugin
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+
+class Journal_Output_Plugin(Output_Ciphersuites_Plugin, Output_Result_Plugin):
+    def instancable(self):
+        return True
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--journal', default=None, help='checkpoint scan progress to this append-only journal file', dest='journal')
+        parser.add_argument('--journal-batch', type=int, default=100, help='number of journal entries written at once', dest='journalbatch')
+        parser.add_argument('--resume', action='store_true', help='resume an interrupted scan from its journal, skipping finished work', dest='resume')
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        self.file = None
+        self.finished = set()
+        self.partial = {}
+        if args.journal is None:
+            if args.resume:
+                raise Plugin_Exception('--resume requires a journal (--journal)')
+            return
+
+        self.batch = max(args.journalbatch, 1)
+        self.buffer = []
+        self.lastFlush = time.monotonic()
+
+        if args.resume and os.path.exists(args.journal):
+            self.load(args.journal)
+        self.file = open(args.journal, 'a' if args.resume else 'w')
+
+    def deinit(self, storage):
+        if self.file is None:
+            return
+
+        self.flush()
+        self.file.close()
+        self.file = None
+
+    # ---- journal reading ----
+    def load(self, filename):
+        database = TLS_CipherSuite_Database.getInstance()
+        with open(filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line may be incomplete after a crash
+                    continue
+
+                target = entry['target']
+                if entry['type'] == 'target':
+                    self.finished.add(target)
+                    self.partial.pop(target, None)
+                    continue
+                if target in self.finished:
+                    continue
+
+                protocol = self.partial.setdefault(target, {}).setdefault(entry['protocol'], {'ciphersuites': [], 'fingerprint': None, 'complete': False})
+                if entry['type'] == 'ciphersuite':
+                    protocol['ciphersuites'] += [database.getCipherSuite(binascii.unhexlify(entry['id']))]
+                elif entry['type'] == 'protocol':
+                    protocol['fingerprint'] = entry['fingerprint']
+                    protocol['complete'] = True
+
+    def acceptTarget(self, target):
+        return str(target) not in self.finished
+
+    def initTarget(self, storage, target):
+        super().initTarget(storage, target)
+
+        if str(target) in self.partial:
+            storage.put('partial', self.partial.pop(str(target)))
+
+    # ---- journal writing ----
+    def write(self, entry):
+        if self.file is None:
+            return
+
+        self.buffer += [json.dumps(entry, sort_keys=True)]
+        if len(self.buffer) >= self.batch or time.monotonic() - self.lastFlush >= 1:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lastFlush = time.monotonic()
+
+    def reportCiphersuite(self, target, protocol, cs):
+        self.write({'type': 'ciphersuite', 'target': str(target), 'protocol': protocol, 'id': binascii.hexlify(cs.cs_id).decode('utf-8')})
+
+    def reportCiphersuitesDone(self, target, protocol, fingerprint):
+        self.write({'type': 'protocol', 'target': str(target), 'protocol': protocol, 'fingerprint': fingerprint})
+
+    def reportResult(self, target, storage):
+        self.write({'type': 'target', 'target': str(target)})
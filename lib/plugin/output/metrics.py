@@ -0,0 +1,183 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import bisect
+import os
+import os.path
+import time
+
+# TLS SAK imports
+from lib.plugin.output import Output_Metrics_Plugin
+from lib.tls.tlspkg import TLS_pkg_Alert
+
+class Textfile_Metrics_Output_Plugin(Output_Metrics_Plugin):
+    # upper bounds of the handshake latency histogram in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def instancable(self):
+        return True
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--metrics-file', default=None, help='write scan metrics to this file (Prometheus textfile format, e.g. for node_exporter)', dest='metricsfile')
+        parser.add_argument('--metrics-interval', type=int, default=60, help='rewrite metrics file every N seconds during a scan (0 = only at the end)', dest='metricsinterval')
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        self.filename = args.metricsfile
+        self.interval = args.metricsinterval
+        self.started = time.time()
+        self.lastWrite = time.monotonic()
+
+        self.handshakes = {}
+        self.latencyBuckets = {}
+        self.latencySum = {}
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.timeouts = {}
+        self.connectionErrors = {}
+        self.handshakesSaved = {}
+        self.alerts = {description: 0 for description in TLS_pkg_Alert.DESCRIPTIONS.values()}
+        self.targets = 0
+        self.targetsDuration = 0.0
+
+    def deinit(self, storage):
+        if self.filename is None:
+            return
+        self.writeMetrics()
+
+    # ---- metrics collection (hot path, keep it cheap) ----
+    def reportHandshake(self, protocol, duration, bytes_sent, bytes_received):
+        if self.filename is None:
+            return
+
+        if protocol not in self.handshakes:
+            self.handshakes[protocol] = 0
+            self.latencyBuckets[protocol] = [0] * (len(self.BUCKETS) + 1)
+            self.latencySum[protocol] = 0.0
+
+        self.handshakes[protocol] += 1
+        self.latencyBuckets[protocol][bisect.bisect_left(self.BUCKETS, duration)] += 1
+        self.latencySum[protocol] += duration
+        self.bytesSent += bytes_sent
+        self.bytesReceived += bytes_received
+
+    def reportAlert(self, protocol, description):
+        if self.filename is None:
+            return
+        self.alerts[description] = self.alerts.get(description, 0) + 1
+
+    def reportTimeout(self, protocol):
+        if self.filename is None:
+            return
+        self.timeouts[protocol] = self.timeouts.get(protocol, 0) + 1
+
+    def reportConnectionError(self, protocol):
+        if self.filename is None:
+            return
+        self.connectionErrors[protocol] = self.connectionErrors.get(protocol, 0) + 1
+
+    def reportHandshakesSaved(self, protocol, count):
+        if self.filename is None:
+            return
+        self.handshakesSaved[protocol] = self.handshakesSaved.get(protocol, 0) + count
+
+    def reportTarget(self, target, duration):
+        if self.filename is None:
+            return
+
+        self.targets += 1
+        self.targetsDuration += duration
+
+        # periodic rewrite for long running scans
+        if self.interval > 0 and time.monotonic() - self.lastWrite >= self.interval:
+            self.writeMetrics()
+
+    # ---- textfile output ----
+    def writeMetrics(self):
+        self.lastWrite = time.monotonic()
+
+        # write to a temporary file in the same directory and rename it, so
+        # the collector never reads a partially written file
+        tmpname = self.filename + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpname, 'w') as f:
+            f.write(self.formatMetrics())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpname, self.filename)
+
+    def formatMetrics(self):
+        lines = []
+        elapsed = max(time.time() - self.started, 0.000001)
+
+        def family(name, mtype, mhelp):
+            lines.append('# HELP ' + name + ' ' + mhelp)
+            lines.append('# TYPE ' + name + ' ' + mtype)
+
+        def sample(name, labels, value):
+            if labels:
+                name += '{' + ','.join(k + '="' + str(labels[k]).replace('\\', '\\\\').replace('"', '\\"') + '"' for k in sorted(labels)) + '}'
+            lines.append(name + ' ' + repr(value))
+
+        family('tlssak_handshakes_total', 'counter', 'Number of ClientHello messages sent.')
+        for protocol in sorted(self.handshakes):
+            sample('tlssak_handshakes_total', {'protocol': protocol}, self.handshakes[protocol])
+
+        family('tlssak_handshake_duration_seconds', 'histogram', 'Duration from connect until the end of the server flight.')
+        for protocol in sorted(self.handshakes):
+            cumulative = 0
+            for i, bound in enumerate(self.BUCKETS):
+                cumulative += self.latencyBuckets[protocol][i]
+                sample('tlssak_handshake_duration_seconds_bucket', {'protocol': protocol, 'le': repr(bound)}, cumulative)
+            sample('tlssak_handshake_duration_seconds_bucket', {'protocol': protocol, 'le': '+Inf'}, self.handshakes[protocol])
+            sample('tlssak_handshake_duration_seconds_sum', {'protocol': protocol}, self.latencySum[protocol])
+            sample('tlssak_handshake_duration_seconds_count', {'protocol': protocol}, self.handshakes[protocol])
+
+        family('tlssak_handshake_timeouts_total', 'counter', 'Number of probes aborted by a timeout.')
+        for protocol in sorted(self.timeouts):
+            sample('tlssak_handshake_timeouts_total', {'protocol': protocol}, self.timeouts[protocol])
+
+        family('tlssak_connection_errors_total', 'counter', 'Number of probes aborted by other connection errors.')
+        for protocol in sorted(self.connectionErrors):
+            sample('tlssak_connection_errors_total', {'protocol': protocol}, self.connectionErrors[protocol])
+
+        family('tlssak_handshakes_saved_total', 'counter', 'Number of handshakes saved by verifying previous results.')
+        for protocol in sorted(self.handshakesSaved):
+            sample('tlssak_handshakes_saved_total', {'protocol': protocol}, self.handshakesSaved[protocol])
+
+        family('tlssak_alerts_total', 'counter', 'Number of TLS alerts received by description.')
+        for description in sorted(self.alerts):
+            sample('tlssak_alerts_total', {'description': description}, self.alerts[description])
+
+        family('tlssak_sent_bytes_total', 'counter', 'Number of bytes sent in TLS handshakes.')
+        sample('tlssak_sent_bytes_total', None, self.bytesSent)
+        family('tlssak_received_bytes_total', 'counter', 'Number of bytes received in TLS handshakes.')
+        sample('tlssak_received_bytes_total', None, self.bytesReceived)
+
+        family('tlssak_targets_total', 'counter', 'Number of scanned targets.')
+        sample('tlssak_targets_total', None, self.targets)
+        family('tlssak_target_duration_seconds_total', 'counter', 'Accumulated scan time of all targets.')
+        sample('tlssak_target_duration_seconds_total', None, self.targetsDuration)
+        family('tlssak_targets_per_second', 'gauge', 'Average target throughput of the current run.')
+        sample('tlssak_targets_per_second', None, self.targets / elapsed)
+        family('tlssak_run_start_timestamp_seconds', 'gauge', 'Start time of the current run.')
+        sample('tlssak_run_start_timestamp_seconds', None, self.started)
+        family('tlssak_run_duration_seconds', 'gauge', 'Duration of the current run.')
+        sample('tlssak_run_duration_seconds', None, elapsed)
+
+        return '\n'.join(lines) + '\n'
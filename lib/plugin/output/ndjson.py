@@ -0,0 +1,72 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import json
+import sys
+
+# TLS SAK imports
+from lib.plugin.output import Output_Result_Plugin
+
+class NDJSON_Result_Output_Plugin(Output_Result_Plugin):
+    def instancable(self):
+        return True
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--json-output', default=None, help='stream one JSON record per finished target to this file (- for stdout)', dest='jsonoutput')
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        self.file = None
+        if args.jsonoutput == '-':
+            self.file = sys.stdout
+        elif args.jsonoutput is not None:
+            # keep records of an interrupted scan when resuming it
+            self.file = open(args.jsonoutput, 'a' if args.resume else 'w')
+
+    def deinit(self, storage):
+        if self.file is not None and self.file is not sys.stdout:
+            self.file.close()
+        self.file = None
+
+    def reportResult(self, target, storage):
+        if self.file is None:
+            return
+
+        # one line per target, flushed immediately so consumers can follow
+        # the file while the scan is still running
+        self.file.write(json.dumps(self.record(target, storage), sort_keys=True) + '\n')
+        self.file.flush()
+
+    @staticmethod
+    def record(target, storage):
+        record = {'target': str(target), 'host': target.host, 'port': target.port, 'starttls': target.starttls, \
+                  'started': storage.get('started'), 'duration': storage.get('duration'), 'protocols': {}, 'probes': {}}
+        if storage.get('duplicate') is not None:
+            record['duplicate'] = storage.get('duplicate')
+        if storage.get('error') is not None:
+            record['error'] = storage.get('error')
+        if storage.get('service') is not None:
+            record['service'] = storage.get('service')
+
+        result = storage.get('result')
+        if result is not None:
+            record['protocols'] = result.serialize()
+            record['probes'] = result.stats()
+
+        return record
@@ -0,0 +1,163 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import urllib.parse
+
+# TLS SAK imports
+from lib.plugin.output import Output_Result_Plugin
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+
+class SQLite_Result_Output_Plugin(Output_Result_Plugin):
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS scans (id INTEGER PRIMARY KEY, started REAL NOT NULL, finished REAL, arguments TEXT)',
+        'CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL REFERENCES scans(id), host TEXT NOT NULL, port INTEGER NOT NULL, starttls TEXT, started REAL, duration REAL)',
+        'CREATE TABLE IF NOT EXISTS protocols (result_id INTEGER NOT NULL REFERENCES results(id), protocol TEXT NOT NULL, accepted INTEGER NOT NULL, honoredorder TEXT, error TEXT, PRIMARY KEY (result_id, protocol)) WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS ciphersuites (result_id INTEGER NOT NULL REFERENCES results(id), protocol TEXT NOT NULL, position INTEGER NOT NULL, cs_id INTEGER NOT NULL, rating INTEGER, status TEXT, PRIMARY KEY (result_id, protocol, position)) WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS certificates (result_id INTEGER NOT NULL REFERENCES results(id), protocol TEXT NOT NULL, fingerprint TEXT NOT NULL, PRIMARY KEY (result_id, protocol)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS results_target ON results (host, port, started)',
+        'CREATE INDEX IF NOT EXISTS results_scan ON results (scan_id)',
+        'CREATE INDEX IF NOT EXISTS ciphersuites_cs_id ON ciphersuites (cs_id, protocol, result_id)',
+    ]
+
+    def instancable(self):
+        return True
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--sqlite-db', default=None, help='store results of this scan in a SQLite database', dest='sqlitedb')
+        parser.add_argument('--sqlite-batch', type=int, default=100, help='number of targets written per SQLite transaction', dest='sqlitebatch')
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        self.db = None
+        self.rescan = args.rescan
+        if args.sqlitedb is None:
+            return
+
+        self.batch = max(args.sqlitebatch, 1)
+        self.pending = 0
+        self.lastCommit = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.db = SQLite_Result_Output_Plugin.openDatabase(args.sqlitedb)
+        arguments = {k: v for k, v in vars(args).items() if type(v) in (str, int, float, bool, list, type(None))}
+        cur = self.db.execute('INSERT INTO scans (started, arguments) VALUES (?, ?)', (time.time(), json.dumps(arguments, sort_keys=True)))
+        self.scan_id = cur.lastrowid
+        self.db.commit()
+
+    def deinit(self, storage):
+        if self.db is None:
+            return
+
+        with self.lock:
+            self.db.execute('UPDATE scans SET finished = ? WHERE id = ?', (time.time(), self.scan_id))
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def initTarget(self, storage, target):
+        super().initTarget(storage, target)
+
+        if self.rescan:
+            storage.put('previous', self.getPreviousResult(target))
+
+    @staticmethod
+    def openDatabase(filename):
+        db = sqlite3.connect(filename, check_same_thread=False)
+        # WAL allows readers (e.g. tlssak-query.py) while a scan is writing
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('PRAGMA foreign_keys=ON')
+        for statement in SQLite_Result_Output_Plugin.SCHEMA:
+            db.execute(statement)
+        db.commit()
+        return db
+
+    @staticmethod
+    def openReadOnly(filename):
+        # for the query tools: a mistyped path must not create an empty
+        # database, and a file without results is no result database
+        db = sqlite3.connect('file:' + urllib.parse.quote(os.path.abspath(filename)) + '?mode=ro', uri=True, check_same_thread=False)
+        db.execute('SELECT 1 FROM results LIMIT 1')
+        return db
+
+    @staticmethod
+    def csId(cs):
+        [cs_id] = struct.unpack('!H', cs.cs_id)
+        return cs_id
+
+    def reportResult(self, target, storage):
+        if self.db is None:
+            return
+
+        protocols = storage.get('result').snapshot()
+
+        with self.lock:
+            cur = self.db.execute('INSERT INTO results (scan_id, host, port, starttls, started, duration) VALUES (?, ?, ?, ?, ?, ?)', \
+                                  (self.scan_id, target.host, target.port, target.starttls, storage.get('started'), storage.get('duration')))
+            result_id = cur.lastrowid
+
+            protocol_rows = []
+            cs_rows = []
+            crt_rows = []
+            for protocol, results in protocols.items():
+                cipher_suites = results.get('ciphersuites', [])
+                protocol_rows += [(result_id, protocol, len(cipher_suites) > 0, results.get('honoredorder'), results.get('error'))]
+                for position, cs in enumerate(cipher_suites):
+                    rating = cs.getRating(protocol)
+                    cs_rows += [(result_id, protocol, position, self.csId(cs), rating.rating, rating.status)]
+                if results.get('fingerprint') is not None:
+                    crt_rows += [(result_id, protocol, results.get('fingerprint'))]
+
+            self.db.executemany('INSERT INTO protocols (result_id, protocol, accepted, honoredorder, error) VALUES (?, ?, ?, ?, ?)', protocol_rows)
+            self.db.executemany('INSERT INTO ciphersuites (result_id, protocol, position, cs_id, rating, status) VALUES (?, ?, ?, ?, ?, ?)', cs_rows)
+            self.db.executemany('INSERT INTO certificates (result_id, protocol, fingerprint) VALUES (?, ?, ?)', crt_rows)
+
+            # commit in batches to keep up with many finished targets
+            self.pending += 1
+            if self.pending >= self.batch or time.monotonic() - self.lastCommit >= 5:
+                self.db.commit()
+                self.pending = 0
+                self.lastCommit = time.monotonic()
+
+    def getPreviousResult(self, target):
+        if self.db is None:
+            return None
+
+        with self.lock:
+            row = self.db.execute('SELECT id FROM results WHERE host = ? AND port = ? AND starttls IS ? ORDER BY started DESC LIMIT 1', \
+                                  (target.host, target.port, target.starttls)).fetchone()
+            if row is None:
+                return None
+            [result_id] = row
+
+            previous = {}
+            for protocol, honoredorder, error in self.db.execute('SELECT protocol, honoredorder, error FROM protocols WHERE result_id = ?', (result_id,)):
+                previous[protocol] = {'ciphersuites': [], 'honoredorder': honoredorder, 'error': error, 'fingerprint': None}
+            for protocol, cs_id in self.db.execute('SELECT protocol, cs_id FROM ciphersuites WHERE result_id = ? ORDER BY protocol, position', (result_id,)):
+                previous[protocol]['ciphersuites'] += [TLS_CipherSuite_Database.getInstance().getCipherSuite(struct.pack('!H', cs_id))]
+            for protocol, fingerprint in self.db.execute('SELECT protocol, fingerprint FROM certificates WHERE result_id = ?', (result_id,)):
+                previous[protocol]['fingerprint'] = fingerprint
+
+        return previous
@@ -15,18 +15,39 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import os
+import sys
+
 # TLS SAK imports
 from lib.plugin.output import Output_Log_Plugin
 
 class Stdout_Log_Output_Plugin(Output_Log_Plugin):
+    def __init__(self):
+        # lines are written in batches by flushLog()
+        self.lines = []
+
     def instancable(self):
         return True
 
     def logVerbose(self, msg):
-        print(msg)
+        self.lines += [msg]
 
     def logInfo(self, msg):
-        print(msg)
+        self.lines += [msg]
 
     def logError(self, msg):
-        print(msg)
+        self.lines += [msg]
+
+    def flushLog(self):
+        lines = self.lines
+        self.lines = []
+        if len(lines) < 1:
+            return
+        try:
+            sys.stdout.write('\n'.join(str(line) for line in lines) + '\n')
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # the reader has gone away (e.g. piped to head), the scan goes on
+            # and further output is discarded
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
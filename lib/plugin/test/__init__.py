@@ -15,8 +15,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import time
+
 # TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.connection import Connection_Timeout_Exception
+from lib.connection.retry import Connection_Retry_Policy
 from lib.plugin import Plugin
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsconnection import TLS_Connection
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Exception
 
 class Test_Plugin(Plugin):
     def init(self, storage, args):
@@ -27,3 +37,67 @@ class Test_Plugin(Plugin):
 class Active_Test_Plugin(Test_Plugin):
     def execute(self, connection, storage):
         pass
+
+    def handshake(self, connection, protocol, cipher_suites, compression_methods=None, groups=None, session_id=None, result=None):
+        # transient connection failures are retried with backoff, targets
+        # failing repeatedly are given up by their circuit breaker
+        breaker = getattr(connection, 'breaker', None)
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.check()
+            try:
+                tls_connection = self._handshake(connection, protocol, cipher_suites, compression_methods, groups, session_id, result)
+            except Connection_Exception as e:
+                if attempt < Connection_Retry_Policy.retries(e):
+                    time.sleep(Connection_Retry_Policy.delay(attempt))
+                    attempt += 1
+                    continue
+                if breaker is not None and Connection_Retry_Policy.isHardFailure(e):
+                    breaker.failure()
+                raise
+            except TLS_Exception:
+                # the server is alive
+                if breaker is not None:
+                    breaker.success()
+                raise
+            if breaker is not None:
+                breaker.success()
+            return tls_connection
+
+    def _handshake(self, connection, protocol, cipher_suites, compression_methods, groups, session_id, result):
+        if compression_methods is None:
+            compression_methods = TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods()
+
+        tls_connection = None
+        failed = True
+        start = time.perf_counter()
+        try:
+            with connection:
+                tls_connection = TLS_Connection(connection)
+                tls_connection.setClientProtocolVersion(protocol)
+                tls_connection.setAvailableCipherSuites(cipher_suites)
+                tls_connection.setAvailableCompressionMethods(compression_methods)
+                if groups is not None:
+                    tls_connection.setSupportedGroups(groups)
+                if session_id is not None:
+                    tls_connection.setSessionId(session_id)
+                tls_connection.connect()
+                failed = False
+                return tls_connection
+        except TLS_Alert_Exception as e:
+            self.output.reportAlert(protocol, e.description)
+            raise
+        except Connection_Timeout_Exception:
+            self.output.reportTimeout(protocol)
+            raise
+        except Connection_Exception:
+            self.output.reportConnectionError(protocol)
+            raise
+        finally:
+            # every sent ClientHello counts as a handshake, even if it failed
+            if tls_connection is not None and tls_connection.bytes_sent > 0:
+                duration = time.perf_counter() - start
+                self.output.reportHandshake(protocol, duration, tls_connection.bytes_sent, tls_connection.bytes_received)
+                if result is not None:
+                    result.protocol(protocol).addProbe(duration, tls_connection.bytes_sent, tls_connection.bytes_received, failed)
@@ -15,24 +15,43 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import binascii
+import concurrent.futures
+import threading
+
 # TLS SAK imports
+from lib.connection import Connection_Circuit_Open_Exception
 from lib.connection import Connection_Exception
+from lib.plugin import Plugin_Exception
 from lib.plugin.test import Active_Test_Plugin
 from lib.tls import TLS_VERSIONS
 from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
 from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
 from lib.tls.tlsconnection import TLS_Connection
 from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Exception
+from lib.tls.tlsexceptions import TLS_Protocol_Version_Exception
+from lib.tls.tlsx509 import X509_Exception
 
 class List_Ciphers_Test(Active_Test_Plugin):
+    # ClientHello sizes (record bytes) tried when a target does not answer at
+    # all, the common thresholds of intolerant implementations
+    HELLO_LIMITS = [511, 255]
+    # parallel connections listing the chunks of an intolerant target
+    CHUNK_PROBES = 4
+
+    # size limits learned per target, kept for later scans of this process
+    # (scheduler, scan service)
+    helloLimits = {}
+    helloLimitsLock = threading.Lock()
+
     def instancable(self):
         return True
 
     def init(self, storage, args):
         super().init(storage, args)
 
-        sto = storage.get(type(self).__name__)
-
         # parse protocols
         if len(args.tlsprotocol) < 1:
             args.tlsprotocol = ['*']
@@ -50,43 +69,292 @@ class List_Ciphers_Test(Active_Test_Plugin):
                 if item not in protocols:
                     protocols += [item]
 
-        sto.put('protocols', protocols)
+        self.protocols = protocols
+
+        # previous results are needed for a rescan
+        if args.rescan and args.sqlitedb is None:
+            raise Plugin_Exception('--rescan requires a result database (--sqlite-db)')
 
     def prepareArguments(self, parser):
         parser.add_argument('-tp', '--tls-protocol', default=[], help='choose protocol to connect with', choices=list(TLS_VERSIONS.keys()) + ['*'], dest='tlsprotocol', action='append')
+        parser.add_argument('--rescan', action='store_true', help='verify the previous result of each target and only list all cipher suites again if it has changed', dest='rescan')
 
     def execute(self, connection, storage):
-        sto = storage.get(type(self).__name__)
-        protocols = sto.get('protocols', [])
+        result = storage.get('result')
+        target = storage.get('target')
+
+        # previous result (--rescan) and partial result of an interrupted
+        # scan (--resume) are provided by the result plugins
+        previous = storage.get('previous')
+        partial = storage.get('partial', {})
 
         # connect and test
-        for protocol in protocols:
+        for protocol in self.protocols:
             self.output.logInfo('Listing cipher suites with ' + protocol + ' ...')
+            protocol_result = result.protocol(protocol)
             try:
-                cipher_suites = TLS_CipherSuite_Database.getInstance().getAllCipherSuites()
-                while True:
-                    with connection:
-                        tls_connection = TLS_Connection(connection)
-                        tls_connection.setClientProtocolVersion(protocol)
-                        tls_connection.setAvailableCipherSuites(cipher_suites)
-                        tls_connection.setAvailableCompressionMethods(TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods())
-                        tls_connection.connect()
-
-                        chosen_cipher_suite = tls_connection.getChosenCipherSuite()
-
-                        # output result
-                        sto.append('ciphersuites@' + protocol, chosen_cipher_suite)
-                        self.output.logInfo(' * ' + chosen_cipher_suite.name)
-
-                        # remove cipher suite from list
-                        cipher_suites.remove(chosen_cipher_suite)
+                cipher_suites = TLS_CipherSuite_Database.getInstance().getAllCipherSuites(protocol)
+
+                # continue where an interrupted scan has stopped
+                if protocol in partial:
+                    for cs in partial[protocol]['ciphersuites']:
+                        protocol_result.addCipherSuite(cs)
+                        self.output.logInfo(' * ' + cs.name)
+                        cipher_suites.remove(cs)
+                    protocol_result.set(fingerprint=partial[protocol]['fingerprint'])
+                    if partial[protocol]['complete']:
+                        self.output.logInfo(' * restored from journal')
+                        continue
+
+                # try to confirm the previous result with a few handshakes
+                elif previous is not None and protocol in previous and self.getHelloLimit(target) is None:
+                    if self.verifyPrevious(connection, protocol, cipher_suites, previous[protocol], result):
+                        for cs in protocol_result.getCipherSuites():
+                            self.output.reportCiphersuite(target, protocol, cs)
+                        self.output.reportCiphersuitesDone(target, protocol, protocol_result.fingerprint)
+                        continue
+
+                # targets known to drop large ClientHellos are listed in chunks
+                limit = self.getHelloLimit(target)
+                if limit is None:
+                    try:
+                        while len(cipher_suites) > 0:
+                            tls_connection = self.handshake(connection, protocol, cipher_suites, result=result)
+
+                            # output result
+                            chosen_cipher_suite = tls_connection.getChosenCipherSuite()
+                            self.accept(target, protocol, tls_connection, protocol_result)
+
+                            # remove cipher suite from list
+                            cipher_suites.remove(chosen_cipher_suite)
+                    except Connection_Exception as e:
+                        # the first ClientHello is not answered at all: it
+                        # might be too large for the target
+                        if len(protocol_result.getCipherSuites()) > 0 or isinstance(e, Connection_Circuit_Open_Exception):
+                            raise
+                        connection.close()
+                        limit = self.detectHelloLimit(target, protocol, cipher_suites, result)
+                        if limit is None:
+                            raise
+                if limit is not None:
+                    protocol_result.set(hellolimit=limit)
+                    self.listChunked(target, protocol, cipher_suites, limit, protocol_result)
             except TLS_Alert_Exception as e:
                 if e.description != 'handshake_failure':
                     self.output.logError(str(e))
 
+            except TLS_Protocol_Version_Exception as e:
+                # protocol is not supported, the server fell back to another one
+                self.output.logInfo(' * ' + e.msg)
+
+            except TLS_Exception as e:
+                # the answer is not a valid TLS handshake (e.g. SSLv2)
+                self.output.logError(str(e))
+                protocol_result.set(error=str(e))
+                continue
+
             except Connection_Exception as e:
                 self.output.logError('Error while connecting: ' + str(e))
+                protocol_result.set(error=str(e))
+                connection.close()
+                continue
+
+            # listing has been finished (server rejected all remaining cipher suites)
+            self.output.reportCiphersuitesDone(target, protocol, protocol_result.fingerprint)
+
+    def accept(self, target, protocol, tls_connection, protocol_result):
+        chosen_cipher_suite = tls_connection.getChosenCipherSuite()
+        protocol_result.addCipherSuite(chosen_cipher_suite)
+        if protocol_result.fingerprint is None:
+            protocol_result.set(fingerprint=self.fingerprint(tls_connection), certificates=self.certificates(tls_connection))
+        self.output.logInfo(' * ' + chosen_cipher_suite.name + self.keyExchange(tls_connection, protocol_result))
+        self.output.reportCiphersuite(target, protocol, chosen_cipher_suite)
+
+    # ---- ClientHello size intolerance ----
+    def getHelloLimit(self, target):
+        with List_Ciphers_Test.helloLimitsLock:
+            return List_Ciphers_Test.helloLimits.get((target.host, target.port, target.starttls))
+
+    def detectHelloLimit(self, target, protocol, cipher_suites, result):
+        # some middleboxes and old stacks drop ClientHellos above a size
+        # threshold: if a smaller ClientHello is answered, the target is
+        # listed with ClientHellos below that size (for this and later scans)
+        for limit in self.HELLO_LIMITS:
+            chunk_size = self.chunkSize(target, protocol, cipher_suites, limit)
+            if chunk_size < 2:
+                break
+            try:
+                self.handshake(target.createConnection(), protocol, cipher_suites[:chunk_size], result=result)
+            except TLS_Exception:
+                pass
+            except Connection_Exception:
+                continue
+
+            self.output.logInfo(' * ClientHello above ' + str(limit) + ' bytes is not answered, listing in chunks of ' + str(chunk_size) + ' cipher suites')
+            with List_Ciphers_Test.helloLimitsLock:
+                List_Ciphers_Test.helloLimits[(target.host, target.port, target.starttls)] = limit
+            return limit
+        return None
+
+    def chunkSize(self, target, protocol, cipher_suites, limit):
+        # number of cipher suites fitting into a ClientHello of this size,
+        # each cipher suite takes two bytes
+        tls_connection = TLS_Connection(target.createConnection())
+        tls_connection.setClientProtocolVersion(protocol)
+        tls_connection.setAvailableCipherSuites(cipher_suites)
+        tls_connection.setAvailableCompressionMethods(TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods())
+        size = tls_connection.getClientHelloSize() - 2 * len(cipher_suites)
+        return (limit - size) // 2
+
+    def listChunked(self, target, protocol, cipher_suites, limit, protocol_result):
+        result = protocol_result.result
+        chunk_size = self.chunkSize(target, protocol, cipher_suites, limit)
+        chunks = [cipher_suites[i:i+chunk_size] for i in range(0, len(cipher_suites), chunk_size)]
+
+        # the server order within each chunk is found in parallel
+        with concurrent.futures.ThreadPoolExecutor(min(self.CHUNK_PROBES, len(chunks))) as executor:
+            orders = list(executor.map(lambda chunk: self.eliminate(target, protocol, chunk, result), chunks))
+        connections = {cs: tls_connection for order in orders for cs, tls_connection in order}
+        orders = [[cs for cs, tls_connection in order] for order in orders if len(order) > 0]
+
+        # merge the chunks: the chosen cipher suite of each chunk competes
+        # in a final round, the winner is the next one of the server order
+        merged = []
+        connection = target.createConnection()
+        while len(orders) > 1:
+            heads = [order[0] for order in orders]
+            chosen = self.prefer(connection, protocol, heads, chunk_size, result)
+            # a server choosing a cipher suite which was not offered makes
+            # the merge impossible, the rest is appended chunk by chunk
+            if chosen is None or chosen not in heads:
+                break
+            for order in orders:
+                if order[0] == chosen:
+                    order.pop(0)
+            merged += [chosen]
+            orders = [order for order in orders if len(order) > 0]
+        for order in orders:
+            merged += order
+
+        for cs in merged:
+            self.accept(target, protocol, connections[cs], protocol_result)
+
+    def eliminate(self, target, protocol, cipher_suites, result):
+        connection = target.createConnection()
+        cipher_suites = list(cipher_suites)
+        order = []
+        while len(cipher_suites) > 0:
+            try:
+                tls_connection = self.handshake(connection, protocol, cipher_suites, result=result)
+            except (TLS_Alert_Exception, TLS_Protocol_Version_Exception):
+                break
+            chosen_cipher_suite = tls_connection.getChosenCipherSuite()
+            if chosen_cipher_suite not in cipher_suites:
+                break
+            order += [(chosen_cipher_suite, tls_connection)]
+            cipher_suites.remove(chosen_cipher_suite)
+        return order
+
+    def prefer(self, connection, protocol, candidates, chunk_size, result):
+        # more candidates than fit into one ClientHello compete in rounds
+        while len(candidates) > 1:
+            winners = []
+            for i in range(0, len(candidates), chunk_size):
+                group = candidates[i:i+chunk_size]
+                if len(group) > 1:
+                    try:
+                        chosen = self.handshake(connection, protocol, group, result=result).getChosenCipherSuite()
+                    except (TLS_Alert_Exception, TLS_Protocol_Version_Exception):
+                        return None
+                    if chosen not in group:
+                        return None
+                    group = [chosen]
+                winners += group
+            candidates = winners
+        return candidates[0]
+
+    def verifyPrevious(self, connection, protocol, cipher_suites, previous, result):
+        previous_cipher_suites = previous['ciphersuites']
+        if previous['error'] is not None or len(previous_cipher_suites) < 1:
+            # nothing to save: a full listing costs only one handshake
+            return False
+
+        # the previously preferred cipher suite has to be chosen again with
+        # the same server certificate
+        handshakes = 1
+        tls_connection = self.handshake(connection, protocol, cipher_suites, result=result)
+        if tls_connection.getChosenCipherSuite() != previous_cipher_suites[0]:
+            self.output.logInfo(' * preferred cipher suite has changed, listing all cipher suites again')
+            return False
+        fingerprint = self.fingerprint(tls_connection)
+        if previous['fingerprint'] is not None and fingerprint != previous['fingerprint']:
+            self.output.logInfo(' * certificate has changed, listing all cipher suites again')
+            return False
+
+        # none of the previously rejected cipher suites may be accepted now
+        rejected_cipher_suites = [cs for cs in cipher_suites if cs not in previous_cipher_suites]
+        if len(rejected_cipher_suites) > 0:
+            handshakes += 1
+            try:
+                self.handshake(connection, protocol, rejected_cipher_suites, result=result)
+                self.output.logInfo(' * previously rejected cipher suite is accepted now, listing all cipher suites again')
+                return False
+            except TLS_Alert_Exception:
+                pass
+            except Connection_Exception:
                 connection.close()
+                return False
+
+        # previous result is still valid
+        saved = len(previous_cipher_suites) + 1 - handshakes
+        result.protocol(protocol).set(ciphersuites=list(previous_cipher_suites), fingerprint=fingerprint, certificates=self.certificates(tls_connection))
+        for cs in previous_cipher_suites:
+            self.output.logInfo(' * ' + cs.name)
+        self.output.logInfo(' * previous result verified, saved ' + str(saved) + ' handshakes')
+        self.output.reportHandshakesSaved(protocol, saved)
+        return True
+
+    @staticmethod
+    def fingerprint(tls_connection):
+        certificates = tls_connection.getCertificates()
+        if len(certificates) < 1 or certificates[0] is None:
+            return None
+        return certificates[0].getFingerprint()
+
+    def keyExchange(self, tls_connection, protocol_result):
+        # strength of the (EC)DH parameters per cipher suite
+        try:
+            parameters = tls_connection.getKeyExchange()
+            if parameters is None:
+                return ''
+            classification = parameters.getClassification()
+        except TLS_Exception as e:
+            self.output.logError('Unable to parse key exchange: ' + str(e))
+            return ''
+
+        cs_id = binascii.hexlify(tls_connection.getChosenCipherSuite().cs_id).decode('utf-8')
+        protocol_result.addKeyExchange(cs_id, classification)
+
+        description = classification['type'] + ' ' + str(classification['bits']) + ' bits'
+        if classification['group'] is not None:
+            description += ', ' + classification['group']
+        return ' (' + description + ', ' + classification['status'] + ')'
+
+    def certificates(self, tls_connection):
+        # the chain is decoded once per fingerprint, other handshakes only
+        # keep the DER encoding
+        chain = []
+        for crt in tls_connection.getCertificates():
+            try:
+                summary = crt.getInfo().summary()
+            except X509_Exception as e:
+                self.output.logError('Unable to parse certificate: ' + str(e))
+                summary = {}
+            summary['fingerprint'] = crt.getFingerprint()
+            chain += [summary]
+        if len(chain) > 0:
+            self.output.logInfo(' * certificate: ' + str(chain[0].get('subject')) + ' (valid until ' + str(chain[0].get('notafter')) + ')')
+        return chain
 
 
 class Check_Honor_Cipher_Order_Test(Active_Test_Plugin):
@@ -99,8 +367,6 @@ class Check_Honor_Cipher_Order_Test(Active_Test_Plugin):
     def init(self, storage, args):
         super().init(storage, args)
 
-        sto = storage.get(type(self).__name__)
-
         # parse protocols
         if len(args.tlsprotocol) < 1:
             args.tlsprotocol = ['*']
@@ -118,61 +384,61 @@ class Check_Honor_Cipher_Order_Test(Active_Test_Plugin):
                 if item not in protocols:
                     protocols += [item]
 
-        sto.put('protocols', protocols)
+        self.protocols = protocols
 
     def prepareArguments(self, parser):
         pass
 
     def execute(self, connection, storage):
-        sto = storage.get(type(self).__name__)
-        protocols = sto.get('protocols', [])
-
-        cl_sto = storage.get(List_Ciphers_Test.__name__)
+        result = storage.get('result')
 
         # connect and test
-        for protocol in protocols:
+        for protocol in self.protocols:
             self.output.logInfo('Checking honor cipher order for ' + protocol + ' ...')
             try:
-                cipher_suites = cl_sto.get('ciphersuites@' + protocol, [])
+                cipher_suites = result.getCipherSuites(protocol)
                 if len(cipher_suites) < 2:
                     self.output.logInfo(' * unable to test! less than 2 cipher suites found.')
                     continue
 
-                with connection:
-                    top_cs = cipher_suites[0]
-                    bottom_cs = cipher_suites[-1]
-
-                    # re-order last cipher suite to the top position
-                    cipher_suites = [bottom_cs] + cipher_suites[:-1]
-
-                    tls_connection = TLS_Connection(connection)
-                    tls_connection.setClientProtocolVersion(protocol)
-                    tls_connection.setAvailableCipherSuites(cipher_suites)
-                    tls_connection.setAvailableCompressionMethods(TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods())
-                    tls_connection.connect()
-
-                    chosen_cipher_suite = tls_connection.getChosenCipherSuite()
-
-                    honored_order = 'unknown'
-                    if chosen_cipher_suite == top_cs:
-                        # good: order is honored
-                        honored_order = 'yes'
-                        self.output.logInfo(' * good: cipher suite order is honored')
-                    elif chosen_cipher_suite == bottom_cs:
-                        # bad: order is not honored
-                        honored_order = 'no'
-                        self.output.logInfo(' * bad: cipher suite order is NOT honored')
-                    else:
-                        # unknown state
-                        self.output.logInfo(' * unknown: cipher suite order seems to be randomized')
-
-                    # store result
-                    sto.append('honoredorder@' + protocol, honored_order)
+                top_cs = cipher_suites[0]
+                bottom_cs = cipher_suites[-1]
+
+                # re-order last cipher suite to the top position
+                cipher_suites = [bottom_cs] + cipher_suites[:-1]
+
+                tls_connection = self.handshake(connection, protocol, cipher_suites, result=result)
+
+                chosen_cipher_suite = tls_connection.getChosenCipherSuite()
+
+                honored_order = 'unknown'
+                if chosen_cipher_suite == top_cs:
+                    # good: order is honored
+                    honored_order = 'yes'
+                    self.output.logInfo(' * good: cipher suite order is honored')
+                elif chosen_cipher_suite == bottom_cs:
+                    # bad: order is not honored
+                    honored_order = 'no'
+                    self.output.logInfo(' * bad: cipher suite order is NOT honored')
+                else:
+                    # unknown state
+                    self.output.logInfo(' * unknown: cipher suite order seems to be randomized')
+
+                # store result
+                result.protocol(protocol).set(honoredorder=honored_order)
 
             except TLS_Alert_Exception as e:
                 if e.description != 'handshake_failure':
                     self.output.logError(str(e))
 
+            except TLS_Protocol_Version_Exception as e:
+                self.output.logInfo(' * ' + e.msg)
+
+            except TLS_Exception as e:
+                self.output.logError(str(e))
+                result.protocol(protocol).set(error=str(e))
+
             except Connection_Exception as e:
                 self.output.logError('Error while connecting: ' + str(e))
+                result.protocol(protocol).set(error=str(e))
                 connection.close()
@@ -0,0 +1,97 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import concurrent.futures
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.plugin import Plugin
+from lib.plugin.test import Active_Test_Plugin
+from lib.plugin.test.ciphers import List_Ciphers_Test
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Protocol_Version_Exception
+
+class List_Compression_Methods_Test(Active_Test_Plugin):
+    def dependencies(self):
+        return [List_Ciphers_Test.__name__]
+
+    def instancable(self):
+        return True
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        # TLS 1.3 only allows the null compression method (RFC 8446, 4.1.2)
+        self.protocols = [protocol for protocol in Plugin.getPlugin(List_Ciphers_Test.__name__).protocols if protocol != 'TLSv1.3']
+
+    def execute(self, connection, storage):
+        result = storage.get('result')
+        target = storage.get('target')
+
+        # only a single cipher suite known to be accepted is offered, so each
+        # probe is a small ClientHello which the server answers
+        protocols = [(protocol, result.getCipherSuites(protocol)[:1]) for protocol in self.protocols]
+        protocols = [(protocol, cipher_suites) for protocol, cipher_suites in protocols if len(cipher_suites) > 0]
+        if len(protocols) < 1:
+            return
+
+        self.output.logInfo('Listing compression methods ...')
+        # protocols are independent of each other and probed in parallel
+        with concurrent.futures.ThreadPoolExecutor(len(protocols)) as executor:
+            futures = [executor.submit(self.eliminate, target, protocol, cipher_suites, result) for protocol, cipher_suites in protocols]
+            concurrent.futures.wait(futures)
+
+        for (protocol, cipher_suites), future in zip(protocols, futures):
+            try:
+                supported = future.result()
+            except Connection_Exception as e:
+                self.output.logError('Error while connecting: ' + str(e))
+                result.protocol(protocol).set(compressionerror=str(e))
+                continue
+
+            for cm in supported:
+                self.output.logInfo(' * ' + protocol + ': ' + cm)
+            if any(cm != 'null' for cm in supported):
+                # compressed records leak the length of secrets (CRIME)
+                self.output.logInfo(' * ' + protocol + ': server accepts TLS compression, vulnerable to CRIME')
+            result.protocol(protocol).set(compression=supported)
+
+    def eliminate(self, target, protocol, cipher_suites, result):
+        # offer all compression methods, remove the chosen one and repeat
+        # until the server rejects the remaining methods
+        connection = target.createConnection()
+        compression_methods = TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods()
+        supported = []
+        while len(compression_methods) > 0:
+            try:
+                tls_connection = self.handshake(connection, protocol, cipher_suites, compression_methods=compression_methods, result=result)
+            except (TLS_Alert_Exception, TLS_Protocol_Version_Exception):
+                break
+            except Connection_Exception:
+                # servers may just close the connection once the null method
+                # is not offered anymore, which ends the enumeration as well
+                if len(supported) < 1:
+                    raise
+                break
+            chosen = tls_connection.getChosenCompressionMethod()
+            if chosen is None or chosen not in compression_methods:
+                break
+            supported += [chosen.name]
+            compression_methods.remove(chosen)
+        return supported
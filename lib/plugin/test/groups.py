@@ -0,0 +1,140 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import concurrent.futures
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.plugin import Plugin
+from lib.plugin.test import Active_Test_Plugin
+from lib.plugin.test.ciphers import List_Ciphers_Test
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Protocol_Version_Exception
+from lib.tls.tlsparameter import TLS_Extension_SupportedGroups
+
+class List_Groups_Test(Active_Test_Plugin):
+    # groups which are valid with TLS 1.3 (RFC 8446, 4.2.7)
+    GROUPS_TLS13 = ['x25519', 'x448', 'secp256r1', 'secp384r1', 'secp521r1', \
+                    'ffdhe2048', 'ffdhe3072', 'ffdhe4096', 'ffdhe6144', 'ffdhe8192']
+
+    def dependencies(self):
+        return [List_Ciphers_Test.__name__]
+
+    def instancable(self):
+        return True
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        # SSLv3 has no extensions to offer named groups
+        self.protocols = [protocol for protocol in Plugin.getPlugin(List_Ciphers_Test.__name__).protocols if protocol != 'SSLv3']
+        self.probes = args.groupprobes
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--group-probes', type=int, default=4, help='number of parallel connections used to list the named groups of a target (0 to skip the group test)', dest='groupprobes')
+
+    def execute(self, connection, storage):
+        if self.probes < 1:
+            return
+
+        result = storage.get('result')
+        target = storage.get('target')
+
+        for protocol in self.protocols:
+            # only (EC)DHE handshakes reveal the named group: all TLS 1.3 cipher
+            # suites, ECDHE cipher suites for older protocols (the group of a
+            # DHE key exchange is not named before TLS 1.3)
+            cipher_suites = result.getCipherSuites(protocol)
+            if protocol == 'TLSv1.3':
+                groups = list(self.GROUPS_TLS13)
+            else:
+                cipher_suites = [cs for cs in cipher_suites if cs.kx == 'ECDHE']
+                groups = [group for group in TLS_Extension_SupportedGroups.GROUPS if not group.startswith('ffdhe')]
+
+                # before TLS 1.3 the curve of an ECDSA certificate has to be
+                # offered as well, so use other cipher suites where possible
+                if any(cs.au != 'ECDSA' for cs in cipher_suites):
+                    cipher_suites = [cs for cs in cipher_suites if cs.au != 'ECDSA']
+            if len(cipher_suites) < 1:
+                continue
+
+            self.output.logInfo('Listing named groups with ' + protocol + ' ...')
+            try:
+                # each partition is reduced by set elimination in parallel
+                partitions = [groups[i::self.probes] for i in range(min(self.probes, len(groups)))]
+                with concurrent.futures.ThreadPoolExecutor(len(partitions)) as executor:
+                    orders = list(executor.map(lambda partition: self.eliminate(target, protocol, cipher_suites, partition, result), partitions))
+
+                # merge the preference orders of all partitions: the server
+                # chooses the most preferred group of all partition heads
+                orders = [order for order in orders if len(order) > 0]
+                supported = []
+                while len(orders) > 1:
+                    heads = [order[0] for order in orders]
+                    chosen = self.probe(connection, protocol, cipher_suites, heads, result)
+                    # a server ignoring the offered groups makes the merge
+                    # impossible, the rest is appended partition by partition
+                    if chosen is None or chosen not in heads:
+                        break
+                    for order in orders:
+                        if order[0] == chosen:
+                            order.pop(0)
+                    supported += [chosen]
+                    orders = [order for order in orders if len(order) > 0]
+                for order in orders:
+                    supported += order
+
+                for group in supported:
+                    self.output.logInfo(' * ' + group)
+                result.protocol(protocol).set(groups=supported)
+
+                # offer the groups in reverse order to find out if the server
+                # enforces its own preference
+                if len(supported) > 1:
+                    chosen = self.probe(connection, protocol, cipher_suites, list(reversed(supported)), result)
+                    if chosen == supported[0]:
+                        result.protocol(protocol).set(grouporder='server')
+                    else:
+                        self.output.logInfo(' * server follows the group preference of the client')
+                        result.protocol(protocol).set(grouporder='client')
+
+            except Connection_Exception as e:
+                self.output.logError('Error while connecting: ' + str(e))
+                result.protocol(protocol).set(grouperror=str(e))
+                connection.close()
+
+    def eliminate(self, target, protocol, cipher_suites, groups, result):
+        # offer all groups, remove the chosen one and repeat until the server
+        # rejects the remaining groups
+        connection = target.createConnection()
+        groups = list(groups)
+        order = []
+        while len(groups) > 0:
+            chosen = self.probe(connection, protocol, cipher_suites, groups, result)
+            if chosen is None or chosen not in groups:
+                break
+            order += [chosen]
+            groups.remove(chosen)
+        return order
+
+    def probe(self, connection, protocol, cipher_suites, groups, result):
+        try:
+            tls_connection = self.handshake(connection, protocol, cipher_suites, groups=groups, result=result)
+            return tls_connection.getSelectedGroup()
+        except (TLS_Alert_Exception, TLS_Protocol_Version_Exception):
+            return None
@@ -0,0 +1,210 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import binascii
+import concurrent.futures
+import socket
+import ssl
+import statistics
+import time
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.plugin import Plugin
+from lib.plugin.test import Active_Test_Plugin
+from lib.plugin.test.ciphers import List_Ciphers_Test
+from lib.tls.tlsexceptions import TLS_Exception
+
+class Session_Resumption_Test(Active_Test_Plugin):
+    # number of sequential handshakes to measure the latency
+    SAMPLES = 3
+
+    # sessions and tickets are only issued after a complete handshake, which
+    # is done with the ssl module (SSLv3 is not available there)
+    SSL_VERSIONS = {'TLSv1.0': ssl.TLSVersion.TLSv1, 'TLSv1.1': ssl.TLSVersion.TLSv1_1, \
+                    'TLSv1.2': ssl.TLSVersion.TLSv1_2, 'TLSv1.3': ssl.TLSVersion.TLSv1_3}
+
+    def dependencies(self):
+        return [List_Ciphers_Test.__name__]
+
+    def instancable(self):
+        return True
+
+    def init(self, storage, args):
+        super().init(storage, args)
+
+        self.protocols = [protocol for protocol in Plugin.getPlugin(List_Ciphers_Test.__name__).protocols if protocol in self.SSL_VERSIONS]
+        self.probes = args.resumptionprobes
+        self.lifetime = args.resumptionlifetime
+
+    def prepareArguments(self, parser):
+        parser.add_argument('--resumption-probes', type=int, default=0, help='check session resumption with this number of parallel resumptions of a session (default: 0, the test is skipped)', dest='resumptionprobes')
+        parser.add_argument('--resumption-lifetime', type=int, default=0, help='resume sessions up to this age in seconds to find out how long they live (slow)', dest='resumptionlifetime')
+
+    def execute(self, connection, storage):
+        if self.probes < 1:
+            return
+
+        result = storage.get('result')
+        target = storage.get('target')
+
+        for protocol in self.protocols:
+            cipher_suites = result.getCipherSuites(protocol)
+            if len(cipher_suites) < 1:
+                continue
+
+            # TLS 1.3 resumes with tickets (PSKs) only
+            mechanisms = ['ticket']
+            if protocol != 'TLSv1.3':
+                mechanisms = ['sessionid'] + mechanisms
+
+            self.output.logInfo('Checking session resumption with ' + protocol + ' ...')
+            try:
+                results = {}
+                for mechanism in mechanisms:
+                    results[mechanism] = self.measure(target, protocol, cipher_suites, mechanism, result)
+                    self.output.logInfo(' * ' + self.describe(mechanism, results[mechanism]))
+                result.protocol(protocol).set(resumption=results)
+            except (Connection_Exception, OSError) as e:
+                self.output.logError('Error while checking session resumption: ' + str(e))
+                result.protocol(protocol).set(resumptionerror=str(e))
+
+    def measure(self, target, protocol, cipher_suites, mechanism, scan_result):
+        context = self.context(protocol, mechanism)
+
+        # full handshake issuing the session
+        issued = time.monotonic()
+        full, session, _ = self.connect(target, context, tickets=(protocol == 'TLSv1.3'))
+        result = {'full': full, 'supported': False}
+        if session is None:
+            return result
+        if mechanism == 'sessionid':
+            result['id'] = binascii.hexlify(session.id).decode('utf-8')
+            if len(session.id) < 1:
+                return result
+        else:
+            result['lifetime_hint'] = session.ticket_lifetime_hint
+            if not session.has_ticket:
+                return result
+        result['supported'] = True
+
+        # latency of full and resumed handshakes without concurrent probes
+        full = [full] + [self.connect(target, context)[0] for i in range(self.SAMPLES - 1)]
+        resumed = [self.connect(target, context, session) for i in range(self.SAMPLES)]
+        latencies = [latency for latency, _, reused in resumed if reused]
+        result['full'] = statistics.median(full)
+        result['resumed'] = statistics.median(latencies) if len(latencies) > 0 else None
+
+        # resume the session in parallel: load balancers spreading connections
+        # over backends without a shared session cache (or ticket keys) only
+        # accept a part of the resumptions
+        with concurrent.futures.ThreadPoolExecutor(self.probes) as executor:
+            resumed = list(executor.map(lambda i: self.connect(target, context, session), range(self.probes)))
+        result['probes'] = self.probes
+        result['accepted'] = len([reused for _, _, reused in resumed if reused])
+
+        if self.lifetime > 0 and result['accepted'] > 0:
+            result['lifetime'] = self.age(lambda: self.connect(target, context, session)[2], issued)
+
+        # the session id has to be echoed in the ServerHello. This is checked
+        # last as aborting the abbreviated handshake invalidates the session
+        # at many servers.
+        if mechanism == 'sessionid' and result['accepted'] > 0:
+            result['echoed'] = self.echo(target, protocol, cipher_suites, session.id, scan_result)
+        return result
+
+    def context(self, protocol, mechanism):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.minimum_version = self.SSL_VERSIONS[protocol]
+        context.maximum_version = self.SSL_VERSIONS[protocol]
+        context.set_ciphers('ALL:@SECLEVEL=0')
+        if mechanism == 'sessionid':
+            context.options |= ssl.OP_NO_TICKET
+        return context
+
+    def connect(self, target, context, session=None, tickets=False):
+        # complete handshake on top of the (STARTTLS) connection, the latency
+        # does not include the TCP handshake
+        connection = target.createConnection()
+        with connection:
+            start = time.perf_counter()
+            tls_socket = context.wrap_socket(connection.socket, server_hostname=target.getServerName(), session=session)
+            latency = time.perf_counter() - start
+            try:
+                # TLS 1.3 tickets are sent after the handshake
+                if tickets:
+                    tls_socket.settimeout(0.5)
+                    try:
+                        tls_socket.recv(1)
+                    except (socket.timeout, ssl.SSLError):
+                        pass
+                return latency, tls_socket.session, tls_socket.session_reused
+            finally:
+                # servers drop sessions of connections closed without
+                # close_notify from their cache
+                tls_socket.settimeout(1)
+                try:
+                    tls_socket.unwrap()
+                except OSError:
+                    pass
+                tls_socket.close()
+
+    def echo(self, target, protocol, cipher_suites, session_id, result):
+        try:
+            tls_connection = self.handshake(target.createConnection(), protocol, cipher_suites, session_id=session_id, result=result)
+            return tls_connection.isResumed()
+        except TLS_Exception:
+            # rejected (alert) or an abbreviated handshake which can not be
+            # parsed, either way the session id is not echoed
+            return False
+
+    def age(self, probe, issued):
+        # resume with doubling age until the session is rejected: the session
+        # lives at least as long as the first and at most as long as the
+        # second value (None if it survived all probes)
+        alive = 0
+        age = 1
+        while age <= self.lifetime:
+            time.sleep(max(0, issued + age - time.monotonic()))
+            if not probe():
+                return [alive, age]
+            alive = age
+            age *= 2
+        return [alive, None]
+
+    @staticmethod
+    def describe(mechanism, result):
+        name = 'session id' if mechanism == 'sessionid' else 'session ticket'
+        if not result['supported']:
+            return name + ': not supported'
+
+        msg = name + ': ' + str(result['accepted']) + '/' + str(result['probes']) + ' resumptions accepted'
+        if result['resumed'] is not None:
+            msg += ' (full handshake %.1fms, resumed %.1fms)' % (result['full'] * 1000, result['resumed'] * 1000)
+        if 0 < result['accepted'] < result['probes']:
+            msg += ', resumption is not shared by all servers'
+        if result.get('echoed') is False:
+            msg += ', session id is not resumed without a complete handshake'
+        if result.get('lifetime_hint'):
+            msg += ', lifetime hint ' + str(result['lifetime_hint']) + 's'
+        if result.get('lifetime') is not None:
+            alive, rejected = result['lifetime']
+            msg += ', alive after ' + str(alive) + 's' + ('' if rejected is None else ', rejected after ' + str(rejected) + 's')
+        return msg
@@ -0,0 +1,169 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import ipaddress
+import time
+
+# TLS SAK imports
+from lib.connection import Connection_Counter
+from lib.connection import Connection_Exception
+from lib.connection.retry import Connection_Circuit_Breaker
+from lib.connection.retry import Connection_Retry_Policy
+from lib.connection.starttls import Connection_STARTTLS_FTP
+from lib.connection.starttls import Connection_STARTTLS_SMTP
+from lib.connection.tcpsocket import Connection_TCP_Socket
+from lib.plugin import Plugin
+from lib.plugin import Plugin_Storage
+from lib.plugin.test import Active_Test_Plugin
+from lib.scan.preflight import Scan_Preflight
+from lib.scan.result import Scan_Result
+
+class Scan_Target:
+    # circuit breaker shared by all connections of a scan
+    breaker = None
+    # counter shared by all connections of a scan
+    counter = None
+
+    def __init__(self, host, port=443, starttls=None):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+
+    def __str__(self):
+        if ':' in self.host:
+            return '[' + self.host + ']:' + str(self.port)
+        return self.host + ':' + str(self.port)
+
+    def __eq__(self, other):
+        return type(other) is Scan_Target and (self.host, self.port, self.starttls) == (other.host, other.port, other.starttls)
+
+    def __hash__(self):
+        return hash((self.host, self.port, self.starttls))
+
+    def getServerName(self):
+        # SNI must not carry IP addresses
+        try:
+            ipaddress.ip_address(self.host)
+            return None
+        except ValueError:
+            return self.host.rstrip('.')
+
+    def createConnection(self):
+        if self.starttls == 'ftp':
+            connection = Connection_STARTTLS_FTP(self.host, self.port)
+        elif self.starttls == 'smtp':
+            connection = Connection_STARTTLS_SMTP(self.host, self.port)
+        else:
+            connection = Connection_TCP_Socket(self.host, self.port)
+        connection.servername = self.getServerName()
+        connection.breaker = self.breaker
+        connection.counter = self.counter
+        return connection
+
+    @staticmethod
+    def parse(spec, port=443, starttls=None):
+        # accepted formats: host, host:port, [ipv6], [ipv6]:port, ipv6
+        spec = spec.strip()
+        try:
+            if spec.startswith('['):
+                host, _, rest = spec[1:].partition(']')
+                if rest.startswith(':'):
+                    port = int(rest[1:])
+            elif spec.count(':') == 1:
+                host, port = spec.split(':')
+                port = int(port)
+            else:
+                host = spec
+        except ValueError:
+            raise ValueError('invalid port in target: ' + spec)
+        return Scan_Target(host, port, starttls)
+
+class Scanner:
+    def __init__(self):
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+        self.preflight = Scan_Preflight()
+
+    def prepare(self, target, plugins=None):
+        storage = Plugin_Storage()
+        storage.put('target', target)
+        storage.put('result', Scan_Result())
+        self.prepareStorage(storage, plugins)
+        return storage
+
+    def prepareStorage(self, storage, plugins=None):
+        # prepare per target storage of all (or the given) plugins
+        if plugins is None:
+            plugins = Plugin.instances
+        target = storage.get('target')
+        for plugin in plugins:
+            plugin.initTarget(storage, target)
+
+    def execute(self, storage):
+        target = storage.get('target')
+        target.breaker = Connection_Circuit_Breaker()
+        target.counter = Connection_Counter()
+        storage.put('started', time.time())
+        start = time.perf_counter()
+
+        # execute all active tests, unless the target does not speak TLS; a
+        # failing target must not abort the scan of all other targets
+        try:
+            if self.preflightCheck(storage):
+                connection = target.createConnection()
+                Plugin.executeLambda(Active_Test_Plugin, lambda p, c=connection, stor=storage: p.execute(c, stor))
+        except Exception as e:
+            self.output.logError('Error while scanning ' + str(target) + ': ' + str(e))
+            storage.put('error', str(e))
+        storage.put('duration', time.perf_counter() - start)
+        # connections of the preflight and all tests (incl. parallel probes)
+        storage.put('connections', target.counter.count)
+
+        self.output.reportTarget(str(target), storage.get('duration'))
+        return storage
+
+    def preflightCheck(self, storage):
+        # a single connection tells if the target is worth testing: the
+        # tests of each protocol would fail the same way on a port which is
+        # closed or speaks another protocol
+        target = storage.get('target')
+        attempt = 0
+        while True:
+            try:
+                service, starttls = self.preflight.classify(target)
+                break
+            except Connection_Exception as e:
+                if attempt < Connection_Retry_Policy.retries(e):
+                    time.sleep(Connection_Retry_Policy.delay(attempt))
+                    attempt += 1
+                    continue
+                self.output.logError('Unable to connect to ' + str(target) + ': ' + str(e))
+                storage.put('error', str(e))
+                return False
+        if service == 'tls':
+            return True
+
+        msg = 'no TLS service (' + service + ')'
+        if starttls is not None and target.starttls is None:
+            msg += ', try STARTTLS (--starttls ' + starttls + ')'
+        self.output.logError(str(target) + ': ' + msg)
+        storage.put('service', service)
+        storage.put('error', msg)
+        return False
+
+    def scan(self, target):
+        return self.execute(self.prepare(target))
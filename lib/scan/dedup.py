@@ -0,0 +1,116 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import binascii
+import concurrent.futures
+import socket
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.connection.tcpsocket import Connection_DNS_Cache
+from lib.plugin import Plugin
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsconnection import TLS_Connection
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Exception
+
+class Target_Deduplicator:
+    # protocol of the fingerprint ClientHello
+    PROTOCOL = 'TLSv1.2'
+
+    def __init__(self, threads=16):
+        self.threads = threads
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+        self.members = {}
+
+    def address(self, target):
+        try:
+            family, address = Connection_DNS_Cache.resolve(target.host, target.port)
+            return (address[0], target.port, target.starttls)
+        except (socket.gaierror, OSError):
+            # unresolvable targets are never grouped
+            return target
+
+    def fingerprint(self, target):
+        # one fixed ClientHello (with the SNI of the target) per target, the
+        # answer identifies the server configuration (version, cipher suite
+        # choice, extensions and certificate)
+        connection = target.createConnection()
+        try:
+            with connection:
+                tls_connection = TLS_Connection(connection)
+                tls_connection.setClientProtocolVersion(self.PROTOCOL)
+                tls_connection.setAvailableCipherSuites(TLS_CipherSuite_Database.getInstance().getAllCipherSuites(self.PROTOCOL))
+                tls_connection.setAvailableCompressionMethods(TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods())
+                tls_connection.connect()
+
+                certificates = tls_connection.getCertificates()
+                certificate = certificates[0].getFingerprint() if len(certificates) > 0 else None
+                extensions = tuple(sorted(ext.getName() for ext in tls_connection.getServerExtensions()))
+                return ('hello', tls_connection.getServerProtocolVersion(), binascii.hexlify(tls_connection.getChosenCipherSuite().cs_id).decode('utf-8'), certificate, extensions)
+        except TLS_Alert_Exception as e:
+            return ('alert', e.description)
+        except Connection_Exception as e:
+            return ('error', type(e).__name__)
+        except TLS_Exception as e:
+            return ('invalid', type(e).__name__)
+
+    def group(self, targets):
+        # group by resolved address first ...
+        groups = {}
+        for target in targets:
+            groups.setdefault(self.address(target), []).append(target)
+
+        # ... then split each group with more than one member by the server
+        # fingerprint of each member
+        candidates = [target for members in groups.values() if len(members) > 1 for target in members]
+        with concurrent.futures.ThreadPoolExecutor(self.threads) as executor:
+            fingerprints = dict(zip(candidates, executor.map(self.fingerprint, candidates)))
+
+        result = []
+        for key, members in groups.items():
+            subgroups = {}
+            for target in members:
+                subgroups.setdefault(fingerprints.get(target), []).append(target)
+            for fingerprint, subgroup in subgroups.items():
+                # failed fingerprints prove nothing, scan those targets alone;
+                # an alert neither (e.g. TLS 1.3 only virtual hosts with
+                # different certificates all reject the TLS 1.2 probe)
+                if fingerprint is not None and fingerprint[0] in ('alert', 'error', 'invalid'):
+                    result += [[target] for target in subgroup]
+                else:
+                    result += [subgroup]
+
+        saved = sum(len(members) - 1 for members in result)
+        self.output.logInfo('Deduplication: ' + str(len(result)) + ' distinct servers for ' + str(sum(len(members) for members in result)) + ' targets, ' + str(saved) + ' full scans saved')
+
+        self.members = {members[0]: members for members in result}
+        return [members[0] for members in result]
+
+    def expand(self, results):
+        # hand the result of each scanned target to all members of its group
+        for target, storage in results:
+            for member in self.members.get(target, [target]):
+                if member == target:
+                    yield target, storage
+                    continue
+                copy = storage.copy()
+                copy.put('target', member)
+                copy.put('duplicate', str(target))
+                yield member, copy
@@ -0,0 +1,229 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import collections
+import http.server
+import itertools
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.plugin import Plugin
+from lib.plugin import Plugin_Storage
+from lib.plugin.output.ndjson import NDJSON_Result_Output_Plugin
+from lib.scan import Scan_Target
+from lib.scan.result import Scan_Result
+
+def targetToDict(target):
+    return {'host': target.host, 'port': target.port, 'starttls': target.starttls}
+
+def targetFromDict(data):
+    return Scan_Target(data['host'], data['port'], data['starttls'])
+
+def recordToStorage(record):
+    # rebuild the storage of a target from a JSON record, so the result
+    # plugins of the coordinator can handle it like a local result
+    storage = Plugin_Storage()
+    storage.put('target', targetFromDict(record))
+    storage.put('started', record.get('started'))
+    storage.put('duration', record.get('duration'))
+    storage.put('error', record.get('error'))
+    storage.put('service', record.get('service'))
+    storage.put('result', Scan_Result.deserialize(record.get('protocols', {}), record.get('probes')))
+    return storage
+
+class Scan_Coordinator:
+    POLL_INTERVAL = 5
+
+    def __init__(self, address, lease_size=10, lease_timeout=300, lease_retries=3):
+        self.address = address
+        self.lease_size = lease_size
+        self.lease_timeout = lease_timeout
+        self.lease_retries = lease_retries
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.leases = {}
+        self.leaseIds = itertools.count(1)
+        self.done = set()
+        self.failed = 0
+        self.total = 0
+        self.results = queue.Queue()
+
+    def isFinished(self):
+        return len(self.done) + self.failed >= self.total
+
+    # ---- lease handling (called with lock held) ----
+    def expireLeases(self):
+        now = time.monotonic()
+        for lease_id in [l for l in self.leases if self.leases[l]['expires'] < now]:
+            lease = self.leases.pop(lease_id)
+            for key, [target, attempts] in lease['targets'].items():
+                if key in self.done:
+                    continue
+                if attempts >= self.lease_retries:
+                    self.failed += 1
+                    self.output.logError('Giving up on ' + key + ' after ' + str(attempts) + ' expired leases (last worker: ' + lease['worker'] + ')')
+                else:
+                    self.pending.append([target, attempts])
+
+    def lease(self, worker, count):
+        with self.lock:
+            self.expireLeases()
+
+            targets = {}
+            while len(self.pending) > 0 and len(targets) < min(count, self.lease_size):
+                [target, attempts] = self.pending.popleft()
+                if str(target) not in self.done:
+                    targets[str(target)] = [target, attempts + 1]
+
+            if len(targets) < 1:
+                return {'lease': None, 'done': self.isFinished()}
+
+            lease_id = next(self.leaseIds)
+            self.leases[lease_id] = {'worker': worker, 'targets': targets, 'expires': time.monotonic() + self.lease_timeout}
+            return {'lease': lease_id, 'timeout': self.lease_timeout, 'targets': [targetToDict(t) for [t, a] in targets.values()]}
+
+    def complete(self, lease_id, record):
+        key = str(targetFromDict(record))
+        with self.lock:
+            lease = self.leases.get(lease_id)
+            if lease is not None:
+                lease['targets'].pop(key, None)
+                lease['expires'] = time.monotonic() + self.lease_timeout
+                if len(lease['targets']) < 1:
+                    del self.leases[lease_id]
+
+            # late results of expired leases are still welcome, duplicates not
+            if key in self.done:
+                return
+            self.done.add(key)
+
+        self.results.put(record)
+
+    # ---- main loop ----
+    def run(self, targets):
+        for target in targets:
+            self.pending.append([target, 0])
+        self.total = len(self.pending)
+
+        server = http.server.ThreadingHTTPServer(self.address, Scan_Coordinator_Handler)
+        server.daemon_threads = True
+        server.coordinator = self
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.output.logInfo('Coordinator listening on ' + self.address[0] + ':' + str(server.server_address[1]) + ' for ' + str(self.total) + ' targets ...')
+
+        try:
+            # results are handed to the output plugins by this thread only
+            while True:
+                try:
+                    record = self.results.get(timeout=1)
+                except queue.Empty:
+                    with self.lock:
+                        self.expireLeases()
+                        if self.isFinished() and self.results.empty():
+                            break
+                    continue
+
+                storage = recordToStorage(record)
+                target = storage.get('target')
+                self.output.reportTarget(str(target), storage.get('duration'))
+                self.output.reportResult(target, storage)
+
+            # keep answering for a while, so idle workers learn that the
+            # scan is done instead of waiting for a vanished coordinator
+            time.sleep(self.POLL_INTERVAL * 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+class Scan_Coordinator_Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        try:
+            size = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(size).decode('utf-8'))
+            coordinator = self.server.coordinator
+
+            if self.path == '/lease':
+                response = coordinator.lease(str(request.get('worker', self.client_address[0])), int(request.get('count', 1)))
+            elif self.path == '/result':
+                coordinator.complete(request['lease'], request['record'])
+                response = {'ok': True}
+            else:
+                self.send_error(404)
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class Scan_Worker:
+    def __init__(self, url, name, lease_size=10, retries=10):
+        self.url = url.rstrip('/')
+        self.name = name
+        self.lease_size = lease_size
+        self.retries = retries
+        self.leaseOf = {}
+
+    def request(self, path, data):
+        # the coordinator may be busy or restarting, so retry a few times
+        body = json.dumps(data).encode('utf-8')
+        for attempt in range(self.retries):
+            try:
+                req = urllib.request.Request(self.url + path, data=body, headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(req, timeout=30) as res:
+                    return json.loads(res.read().decode('utf-8'))
+            except (urllib.error.URLError, OSError) as e:
+                error = e
+                time.sleep(min(2 ** attempt, 30))
+        raise Connection_Exception('coordinator not reachable: ' + str(error))
+
+    def targets(self):
+        while True:
+            response = self.request('/lease', {'worker': self.name, 'count': self.lease_size})
+            if response['lease'] is None:
+                if response['done']:
+                    return
+                # all remaining targets are leased to other workers
+                time.sleep(Scan_Coordinator.POLL_INTERVAL)
+                continue
+
+            for data in response['targets']:
+                target = targetFromDict(data)
+                self.leaseOf[str(target)] = response['lease']
+                yield target
+
+    def upload(self, target, storage):
+        record = NDJSON_Result_Output_Plugin.record(target, storage)
+        self.request('/result', {'lease': self.leaseOf.pop(str(target)), 'record': record})
@@ -0,0 +1,253 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import concurrent.futures
+import socketserver
+import struct
+import threading
+import time
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsconnection import TLS_Connection
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Exception
+
+class Handshake_Load_Test:
+    # scheduled handshakes per worker which may wait for a free worker
+    BACKLOG = 4
+
+    def __init__(self, target, protocol, cipher_suite, rate=None, concurrency=16, duration=10.0):
+        # with a rate, handshakes are started on a fixed schedule (open loop)
+        # and concurrency only limits the handshakes in flight; without a
+        # rate, concurrency handshakes are run back to back (closed loop)
+        self.target = target
+        self.protocol = protocol
+        self.cipher_suite = cipher_suite
+        self.cipher_suites = [cipher_suite]
+        self.chosen = None
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.compression_methods = [cm for cm in TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods() if cm.cm_id == b'\x00']
+
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.bytes = 0
+
+    @staticmethod
+    def preferred(target, protocol, cipher_suites):
+        # cipher suite chosen by the server out of all cipher suites
+        test = Handshake_Load_Test(target, protocol, None)
+        test.cipher_suites = cipher_suites
+        if test.handshake() is not None:
+            return None
+        return test.chosen
+
+    def handshake(self, scheduled=None):
+        # one full server flight, measured from the scheduled start (open loop)
+        # so a saturated server cannot hide its queueing delay
+        start = scheduled if scheduled is not None else time.perf_counter()
+        error = None
+        connection = self.target.createConnection()
+        tls_connection = None
+        try:
+            with connection:
+                tls_connection = TLS_Connection(connection)
+                tls_connection.setClientProtocolVersion(self.protocol)
+                tls_connection.setAvailableCipherSuites(self.cipher_suites)
+                tls_connection.setAvailableCompressionMethods(self.compression_methods)
+                tls_connection.connect()
+                self.chosen = tls_connection.getChosenCipherSuite()
+        except TLS_Alert_Exception as e:
+            error = 'alert ' + e.description
+        except Connection_Exception as e:
+            error = type(e).__name__
+        except TLS_Exception as e:
+            error = type(e).__name__
+        latency = time.perf_counter() - start
+
+        with self.lock:
+            if error is None:
+                self.latencies += [latency]
+                self.bytes += tls_connection.bytes_sent + tls_connection.bytes_received
+            else:
+                self.errors[error] = self.errors.get(error, 0) + 1
+        return error
+
+    def run(self):
+        start = time.perf_counter()
+        deadline = start + self.duration
+
+        if self.rate is not None:
+            # handshakes waiting for a free worker are bounded, a saturated
+            # server delays the schedule (and shows up in the latencies,
+            # which are measured from the scheduled start)
+            backlog = threading.Semaphore(self.concurrency * self.BACKLOG)
+            def done(future):
+                backlog.release()
+                if future.exception() is not None:
+                    self.fail(future.exception())
+
+            with concurrent.futures.ThreadPoolExecutor(self.concurrency) as executor:
+                count = 0
+                while True:
+                    scheduled = start + count / self.rate
+                    if scheduled >= deadline or time.perf_counter() >= deadline:
+                        break
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    backlog.acquire()
+                    executor.submit(self.handshake, scheduled).add_done_callback(done)
+                    count += 1
+        else:
+            def loop():
+                while time.perf_counter() < deadline:
+                    try:
+                        self.handshake()
+                    except Exception as e:
+                        self.fail(e)
+            threads = [threading.Thread(target=loop) for i in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return self.report(time.perf_counter() - start)
+
+    def fail(self, e):
+        # failures other than connection and TLS errors are counted as well
+        # instead of being lost in the worker
+        with self.lock:
+            error = type(e).__name__
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def report(self, elapsed):
+        latencies = sorted(self.latencies)
+        report = {'target': str(self.target), 'protocol': self.protocol, 'ciphersuite': self.cipher_suite.name, \
+                  'rate': self.rate, 'concurrency': self.concurrency, 'elapsed': elapsed, \
+                  'handshakes': len(latencies), 'errors': dict(self.errors), \
+                  'handshakes_per_second': len(latencies) / elapsed if elapsed > 0 else 0, \
+                  'bytes_per_handshake': self.bytes / len(latencies) if len(latencies) > 0 else None}
+        for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)):
+            report[name] = self.percentile(latencies, q)
+        return report
+
+    @staticmethod
+    def percentile(values, q):
+        # nearest rank
+        if len(values) < 1:
+            return None
+        return values[min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))]
+
+class Loopback_Handshake_Server:
+    # stand-in server on the loopback interface to try the load test without
+    # a real target: ClientHellos are answered with ServerHello and
+    # ServerHelloDone after a fixed delay, with at most capacity handshakes
+    # at the same time (like a server with that many cores)
+
+    # ECDHE_RSA_WITH_AES_128_GCM_SHA256, ECDHE_RSA_WITH_AES_256_GCM_SHA384,
+    # RSA_WITH_AES_128_GCM_SHA256, RSA_WITH_AES_128_CBC_SHA
+    PREFERENCE = [b'\xc0\x2f', b'\xc0\x30', b'\x00\x9c', b'\x00\x2f']
+
+    def __init__(self, delay=0.0, capacity=None):
+        self.delay = delay
+        self.capacity = threading.Semaphore(capacity) if capacity is not None else None
+        self.handshakes = 0
+        self.lock = threading.Lock()
+
+        server = self
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server.handle(self.request)
+
+        # the listen backlog has to take all concurrent handshakes of the
+        # load test, otherwise connects are delayed by SYN retransmissions
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 128
+        self.server.server_bind()
+        self.server.server_activate()
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, sock):
+        sock.settimeout(10)
+        try:
+            record = self.read(sock, 5)
+            [size] = struct.unpack('!H', record[3:5])
+            hello = self.read(sock, size)
+        except (OSError, ValueError):
+            return
+
+        if self.capacity is not None:
+            self.capacity.acquire()
+        try:
+            time.sleep(self.delay)
+            answer = self.answer(record[1:3], hello)
+        finally:
+            if self.capacity is not None:
+                self.capacity.release()
+
+        with self.lock:
+            self.handshakes += 1
+        try:
+            sock.sendall(answer)
+        except OSError:
+            pass
+
+    @staticmethod
+    def read(sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ValueError('connection closed')
+            data += chunk
+        return data
+
+    @staticmethod
+    def answer(record_version, hello):
+        # ClientHello: type, size, version, random, session id, cipher suites
+        if len(hello) < 41 or hello[0:1] != b'\x01':
+            return b'\x15' + record_version + b'\x00\x02\x02\x0a'
+        version = min(hello[4:6], b'\x03\x03')
+        offset = 38 + 1 + hello[38]
+        [size] = struct.unpack('!H', hello[offset:offset+2])
+        cipher_suites = [hello[i:i+2] for i in range(offset + 2, offset + 2 + size, 2)]
+
+        # the most preferred cipher suite, otherwise the first offered one
+        # (TLS 1.3 is not supported)
+        candidates = [cs for cs in Loopback_Handshake_Server.PREFERENCE if cs in cipher_suites]
+        candidates += [cs for cs in cipher_suites if cs[0:1] != b'\x13' and cs != b'\x00\xff']
+        if len(candidates) < 1:
+            return b'\x15' + record_version + b'\x00\x02\x02\x28'
+
+        server_hello = version + struct.pack('!I', int(time.time())) + b'\x00' * 28 + b'\x00' + candidates[0] + b'\x00'
+        handshake = b'\x02' + struct.pack('!I', len(server_hello))[1:] + server_hello + b'\x0e\x00\x00\x00'
+        return b'\x16' + version + struct.pack('!H', len(handshake)) + handshake
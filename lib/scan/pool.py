@@ -0,0 +1,160 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import multiprocessing
+import signal
+import threading
+
+# TLS SAK imports
+from lib.plugin import Plugin
+from lib.plugin import Plugin_Storage
+from lib.plugin.output import Helper_Output_Plugin
+from lib.plugin.output import Output_Ciphersuites_Plugin
+from lib.plugin.output import Output_Log_Plugin
+from lib.plugin.output import Output_Metrics_Plugin
+from lib.plugin.test import Test_Plugin
+from lib.scan import Scanner
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsratings import TLS_Ratings_Database
+
+class Worker_Output_Recorder(Output_Log_Plugin, Output_Ciphersuites_Plugin, Output_Metrics_Plugin):
+    def __init__(self):
+        self.events = []
+
+    def pop(self):
+        events = self.events
+        self.events = []
+        return events
+
+    def logVerbose(self, msg):
+        self.events += [('logVerbose', (msg,))]
+
+    def logInfo(self, msg):
+        self.events += [('logInfo', (msg,))]
+
+    def logError(self, msg):
+        self.events += [('logError', (msg,))]
+
+    def reportCiphersuite(self, target, protocol, cs):
+        self.events += [('reportCiphersuite', (target, protocol, cs))]
+
+    def reportCiphersuitesDone(self, target, protocol, fingerprint):
+        self.events += [('reportCiphersuitesDone', (target, protocol, fingerprint))]
+
+    def reportHandshake(self, protocol, duration, bytes_sent, bytes_received):
+        self.events += [('reportHandshake', (protocol, duration, bytes_sent, bytes_received))]
+
+    def reportAlert(self, protocol, description):
+        self.events += [('reportAlert', (protocol, description))]
+
+    def reportTimeout(self, protocol):
+        self.events += [('reportTimeout', (protocol,))]
+
+    def reportConnectionError(self, protocol):
+        self.events += [('reportConnectionError', (protocol,))]
+
+    def reportHandshakesSaved(self, protocol, count):
+        self.events += [('reportHandshakesSaved', (protocol, count))]
+
+    def reportTarget(self, target, duration):
+        self.events += [('reportTarget', (target, duration))]
+
+# state of a worker process
+worker = {}
+
+def initWorker(args):
+    # workers are stopped by the pool, not by the handler of the client
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # only test plugins run in worker processes, all output is recorded and
+    # replayed by the parent process, which stays the only writer
+    plugins = [p for p in Plugin.findPlugins() if issubclass(p, Test_Plugin) or p is Helper_Output_Plugin]
+    Plugin.namedInstances = {}
+    Plugin.loadPlugins(plugins)
+
+    recorder = Worker_Output_Recorder()
+    Plugin.instances += [recorder]
+    Plugin.executeLambda(None, lambda p, stor=Plugin_Storage(), args=args: p.init(stor, args))
+
+    # load databases once per worker instead of once per target
+    TLS_CipherSuite_Database.getInstance()
+    TLS_CompressionMethod_Database.getInstance()
+    TLS_Ratings_Database.getInstance()
+
+    worker['recorder'] = recorder
+    worker['output'] = Plugin.getPlugin('Helper_Output_Plugin')
+    worker['scanner'] = Scanner()
+    worker['plugins'] = [p for p in Plugin.instances if isinstance(p, Test_Plugin)]
+
+def scanWorker(storage):
+    scanner = worker['scanner']
+    try:
+        scanner.prepareStorage(storage, worker['plugins'])
+    except Exception as e:
+        # a failing target must not abort the scan of all other targets
+        worker['output'].logError('Error while scanning ' + str(storage.get('target')) + ': ' + str(e))
+        storage.put('error', str(e))
+    else:
+        scanner.execute(storage)
+    worker['output'].flush()
+    return storage, worker['recorder'].pop()
+
+class Scan_Pool:
+    def __init__(self, args, processes):
+        self.args = args
+        self.processes = processes
+        self.scanner = Scanner()
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+
+    def scan(self, targets):
+        # result plugins prepare their part of the storage in this process
+        plugins = [p for p in Plugin.instances if not isinstance(p, Test_Plugin)]
+
+        # limit the number of prepared targets waiting for a worker, so the
+        # memory does not grow with the number of targets
+        window = threading.Semaphore(self.processes * 4)
+        stopped = []
+
+        def tasks():
+            for target in targets:
+                window.acquire()
+                if len(stopped) > 0:
+                    return
+                yield self.scanner.prepare(target, plugins)
+
+        pool = multiprocessing.Pool(self.processes, initializer=initWorker, initargs=(self.args,))
+        finished = False
+        try:
+            # chunks of one target let idle workers pick up the next target
+            # instead of waiting behind a slow one
+            for storage, events in pool.imap_unordered(scanWorker, tasks(), chunksize=1):
+                window.release()
+                for name, params in events:
+                    getattr(self.output, name)(*params)
+                yield storage.get('target'), storage
+            pool.close()
+            pool.join()
+            finished = True
+        finally:
+            stopped += [True]
+            window.release()
+            # only workers of a failed or abandoned scan are killed
+            if not finished:
+                pool.terminate()
+                pool.join()
@@ -0,0 +1,100 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import string
+
+# TLS SAK imports
+from lib.connection import Connection_Exception
+from lib.connection import Connection_Timeout_Exception
+from lib.tls.tlscompressionmethods import TLS_CompressionMethod_Database
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlsconnection import TLS_Connection
+from lib.tls.tlsexceptions import TLS_Alert_Exception
+from lib.tls.tlsexceptions import TLS_Exception
+from lib.tls.tlsexceptions import TLS_Protocol_Version_Exception
+
+class Scan_Preflight:
+    PROTOCOL = 'TLSv1.2'
+    # size of the ClientHello record
+    MAXIMUM_SIZE = 255
+
+    # plaintext services by the first bytes they send (banner or answer to
+    # the ClientHello) with the STARTTLS mode to scan them
+    SERVICES = [(b'SSH-', 'ssh', None), (b'HTTP/', 'http', None), \
+                (b'+OK', 'pop3', None), (b'* OK', 'imap', None), (b'* PREAUTH', 'imap', None), \
+                (b'220', 'smtp', 'smtp'), (b'421', 'smtp', 'smtp'), (b'554', 'smtp', 'smtp')]
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+    def classify(self, target):
+        # send a single ClientHello and look at the first bytes of the answer:
+        # TLS records, a plaintext banner or nothing at all. Returns the
+        # service and the STARTTLS mode to scan it with ('tls' and None if
+        # the TLS tests may go on). Connection errors are raised, the target
+        # can not be tested at all then.
+        connection = target.createConnection()
+        connection.connect()
+        tls_connection = TLS_Connection(connection)
+        try:
+            connection.socket.settimeout(self.timeout)
+
+            tls_connection.setClientProtocolVersion(self.PROTOCOL)
+            tls_connection.setAvailableCompressionMethods(TLS_CompressionMethod_Database.getInstance().getAllCompressionMethods())
+            self.setCipherSuites(tls_connection)
+            tls_connection.connect()
+            return 'tls', None
+        except (TLS_Alert_Exception, TLS_Protocol_Version_Exception):
+            return 'tls', None
+        except Connection_Timeout_Exception:
+            # silent after the ClientHello: TLS servers answer right away
+            if tls_connection.bytes_received > 0:
+                return 'tls', None
+            return 'silent', None
+        except Connection_Exception:
+            # closed without an answer, this might be a TLS server which does
+            # not like the ClientHello, the TLS tests go on
+            return 'tls', None
+        except TLS_Exception:
+            # not a TLS record
+            return self.identify(tls_connection.buffer)
+        finally:
+            connection.close()
+
+    def setCipherSuites(self, tls_connection):
+        # common cipher suites only: the ClientHello has to stay below the
+        # size some intolerant servers do not answer
+        cipher_suites = [cs for cs in TLS_CipherSuite_Database.getInstance().getAllCipherSuites(self.PROTOCOL) \
+                         if cs.kx in ('ECDHE', 'DHE', 'RSA') and 'AES' in cs.name]
+        tls_connection.setAvailableCipherSuites(cipher_suites)
+        size = tls_connection.getClientHelloSize() - 2 * len(cipher_suites)
+        tls_connection.setAvailableCipherSuites(cipher_suites[:max(1, (self.MAXIMUM_SIZE - size) // 2)])
+
+    def identify(self, data):
+        for prefix, service, starttls in self.SERVICES:
+            if data.startswith(prefix):
+                if service == 'smtp' and b'FTP' in data.upper():
+                    service, starttls = 'ftp', 'ftp'
+                return service, starttls
+
+        printable = string.printable.encode('ascii')
+        if len(data) > 0 and all(byte in printable for byte in data[:64]):
+            return 'plaintext', None
+
+        # unknown binary answer (e.g. SSLv2), the TLS tests go on
+        return 'tls', None
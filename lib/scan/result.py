@@ -0,0 +1,186 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import binascii
+import threading
+
+# TLS SAK imports
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlsparameter import TLS_CipherSuite
+
+class Scan_Protocol_Result:
+    # results of a protocol, named like the keys of the serialized form
+    RESULTS = ['ciphersuites', 'fingerprint', 'certificates', 'keyexchange', 'honoredorder', 'hellolimit', 'error', \
+               'groups', 'grouporder', 'grouperror', 'compression', 'compressionerror', 'resumption', 'resumptionerror']
+    STATS = ['handshakes', 'failures', 'bytes_sent', 'bytes_received', 'time']
+    # results describing the configuration of the server, the others are
+    # errors or measurements which differ from scan to scan (e.g. latencies
+    # and session ids of the resumption test)
+    CONFIGURATION = ['ciphersuites', 'fingerprint', 'certificates', 'keyexchange', 'honoredorder', 'hellolimit', \
+                     'groups', 'grouporder', 'compression']
+
+    def __init__(self, result, protocol):
+        self.result = result
+        self.protocol = protocol
+
+        # cipher suites in the order preferred by the server
+        self.ciphersuites = []
+        self.fingerprint = None
+        self.certificates = None
+        # classification of the key exchange per cipher suite id
+        self.keyexchange = {}
+        self.honoredorder = None
+        # ClientHello size (bytes) the target answers, if it drops larger ones
+        self.hellolimit = None
+        self.error = None
+
+        self.groups = None
+        self.grouporder = None
+        self.grouperror = None
+
+        # names of the accepted compression methods
+        self.compression = None
+        self.compressionerror = None
+
+        self.resumption = None
+        self.resumptionerror = None
+
+        # statistics of all handshakes with this protocol
+        self.handshakes = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.time = 0.0
+
+    # ---- writers, safe to be used by parallel probes ----
+    def set(self, **results):
+        for name in results:
+            if name not in self.RESULTS:
+                raise AttributeError('unknown result: ' + name)
+        with self.result.lock:
+            for name, value in results.items():
+                setattr(self, name, value)
+
+    def addCipherSuite(self, cs):
+        with self.result.lock:
+            self.ciphersuites.append(cs)
+
+    def addKeyExchange(self, cs_id, classification):
+        with self.result.lock:
+            self.keyexchange[cs_id] = classification
+
+    def addProbe(self, duration, bytes_sent, bytes_received, failed=False):
+        with self.result.lock:
+            self.handshakes += 1
+            self.failures += 1 if failed else 0
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            self.time += duration
+
+    # ---- readers ----
+    def getCipherSuites(self):
+        with self.result.lock:
+            return list(self.ciphersuites)
+
+    def snapshot(self):
+        # results which have been set, lists and dicts are copied so the
+        # snapshot is not changed by later writers
+        with self.result.lock:
+            snapshot = {'ciphersuites': list(self.ciphersuites)}
+            if len(self.keyexchange) > 0:
+                snapshot['keyexchange'] = dict(self.keyexchange)
+            for name in self.RESULTS:
+                value = getattr(self, name)
+                if name not in snapshot and value is not None and name != 'keyexchange':
+                    snapshot[name] = list(value) if type(value) is list else value
+            return snapshot
+
+    def stats(self):
+        with self.result.lock:
+            return {name: getattr(self, name) for name in self.STATS}
+
+class Scan_Result:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.protocols = {}
+
+    # the lock can not be pickled (results are returned by worker processes)
+    def __getstate__(self):
+        return {'protocols': self.protocols}
+
+    def __setstate__(self, state):
+        self.lock = threading.RLock()
+        self.protocols = state['protocols']
+
+    def protocol(self, protocol):
+        # result of the protocol, created on first use
+        with self.lock:
+            if protocol not in self.protocols:
+                self.protocols[protocol] = Scan_Protocol_Result(self, protocol)
+            return self.protocols[protocol]
+
+    def get(self, protocol):
+        with self.lock:
+            return self.protocols.get(protocol)
+
+    def getCipherSuites(self, protocol):
+        result = self.get(protocol)
+        if result is None:
+            return []
+        return result.getCipherSuites()
+
+    def snapshot(self):
+        with self.lock:
+            return {protocol: result.snapshot() for protocol, result in self.protocols.items()}
+
+    def stats(self):
+        with self.lock:
+            return {protocol: result.stats() for protocol, result in self.protocols.items() if result.handshakes > 0}
+
+    # ---- serialization (JSON) ----
+    def serialize(self):
+        return {protocol: {name: self.serializeValue(value, protocol) for name, value in results.items()} \
+                for protocol, results in self.snapshot().items()}
+
+    @staticmethod
+    def serializeValue(value, protocol):
+        if type(value) is list:
+            return [Scan_Result.serializeValue(item, protocol) for item in value]
+        if type(value) is TLS_CipherSuite:
+            rating = value.getRating(protocol)
+            return {'id': binascii.hexlify(value.cs_id).decode('utf-8'), 'name': value.name, \
+                    'rating': rating.rating, 'status': rating.status, 'pfs': rating.pfs}
+        return value
+
+    @staticmethod
+    def deserialize(protocols, stats=None):
+        result = Scan_Result()
+        database = TLS_CipherSuite_Database.getInstance()
+        for protocol, results in protocols.items():
+            protocol_result = result.protocol(protocol)
+            for name, value in results.items():
+                if name == 'ciphersuites':
+                    value = [database.getCipherSuite(binascii.unhexlify(item['id'])) for item in value]
+                if name in Scan_Protocol_Result.RESULTS:
+                    setattr(protocol_result, name, value)
+        for protocol, values in (stats or {}).items():
+            protocol_result = result.protocol(protocol)
+            for name, value in values.items():
+                if name in Scan_Protocol_Result.STATS:
+                    setattr(protocol_result, name, value)
+        return result
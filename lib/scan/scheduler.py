@@ -0,0 +1,273 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+# TLS SAK imports
+from lib.plugin import Plugin
+from lib.plugin.output.ndjson import NDJSON_Result_Output_Plugin
+from lib.scan import Scan_Target
+from lib.scan import Scanner
+from lib.scan.result import Scan_Protocol_Result
+
+class Handshake_Rate_Limiter:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1) * 10)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, count):
+        # a scan needs more than a single token, so wait until its estimated
+        # number of handshakes is available (at most one full bucket)
+        count = min(count, self.burst)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def correct(self, estimated, actual):
+        # debit handshakes that were not estimated (or give unused ones back)
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.burst, self.tokens + min(estimated, self.burst) - actual)
+
+class Scheduled_Target:
+    def __init__(self, target, cls):
+        self.target = target
+        self.cls = cls
+        self.due = 0
+        self.last = None
+        self.failures = 0
+        self.digest = None
+        self.changed = 0
+        self.handshakes = None
+
+    def state(self):
+        return {'class': self.cls, 'last': self.last, 'failures': self.failures, 'digest': self.digest, \
+                'changed': self.changed, 'handshakes': self.handshakes}
+
+    def restore(self, state):
+        self.last = state.get('last')
+        self.failures = state.get('failures', 0)
+        self.digest = state.get('digest')
+        self.changed = state.get('changed', 0)
+        self.handshakes = state.get('handshakes')
+
+class Scan_Scheduler:
+    # default priority classes with their rescan interval in seconds, the
+    # order defines the priority when several targets are due
+    CLASSES = [('high', 6 * 3600), ('normal', 24 * 3600), ('low', 7 * 24 * 3600)]
+    # targets with a changed result are rescanned this much faster ...
+    CHANGED_FACTOR = 4
+    # ... for this many scans
+    CHANGED_SCANS = 3
+    # first retry after a failed scan (doubled for every further failure)
+    RETRY_DELAY = 300
+    # handshakes assumed for targets never scanned before
+    HANDSHAKES_ESTIMATE = 50
+
+    def __init__(self, classes=None, workers=4, rate=None, state_file=None):
+        self.classes = classes if classes is not None else list(self.CLASSES)
+        self.intervals = dict(self.classes)
+        self.ranks = {name: rank for rank, (name, interval) in enumerate(self.classes)}
+        self.workers = workers
+        self.limiter = Handshake_Rate_Limiter(rate) if rate is not None else None
+        self.state_file = state_file
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+        self.scanner = Scanner()
+
+        self.entries = {}
+        self.waiting = []
+        self.ready = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.results = queue.Queue()
+
+    # ---- inventory and state ----
+    def load(self, filename, port=443, starttls=None):
+        # one target per line: host[:port] [priority class]
+        with open(filename) as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if len(line) < 1:
+                    continue
+                fields = line.split()
+                cls = fields[1] if len(fields) > 1 else 'normal'
+                if cls not in self.intervals:
+                    raise ValueError('unknown priority class ' + cls + ' in ' + filename)
+                target = Scan_Target.parse(fields[0], port, starttls)
+                self.entries[str(target)] = Scheduled_Target(target, cls)
+
+        state = {}
+        if self.state_file is not None and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+
+        now = time.time()
+        for key, entry in self.entries.items():
+            if key in state:
+                entry.restore(state[key])
+            # continue the cadence of previous runs, new targets are due now
+            entry.due = now
+            if entry.last is not None:
+                entry.due = entry.last + self.interval(entry)
+            self.push(entry)
+
+    def saveState(self):
+        if self.state_file is None:
+            return
+
+        with self.condition:
+            state = {key: entry.state() for key, entry in self.entries.items()}
+        tmpname = self.state_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpname, 'w') as f:
+            json.dump(state, f, sort_keys=True)
+        os.replace(tmpname, self.state_file)
+
+    # ---- priority queue ----
+    def interval(self, entry):
+        interval = self.intervals[entry.cls]
+        if entry.changed > 0:
+            interval /= self.CHANGED_FACTOR
+        return interval
+
+    def push(self, entry):
+        with self.condition:
+            heapq.heappush(self.waiting, (entry.due, next(self.sequence), entry))
+            self.condition.notify()
+
+    def pop(self):
+        with self.condition:
+            while True:
+                # move all due targets into the ready queue ordered by class
+                now = time.time()
+                while len(self.waiting) > 0 and self.waiting[0][0] <= now:
+                    due, seq, entry = heapq.heappop(self.waiting)
+                    heapq.heappush(self.ready, (self.ranks[entry.cls], due, seq, entry))
+
+                if len(self.ready) > 0:
+                    return heapq.heappop(self.ready)[3]
+
+                timeout = None
+                if len(self.waiting) > 0:
+                    timeout = self.waiting[0][0] - now
+                self.condition.wait(timeout)
+
+    # ---- scanning ----
+    def work(self):
+        while True:
+            entry = self.pop()
+
+            estimate = entry.handshakes if entry.handshakes is not None else self.HANDSHAKES_ESTIMATE
+            if self.limiter is not None:
+                self.limiter.acquire(estimate)
+
+            try:
+                storage = self.scanner.scan(entry.target)
+            except Exception as e:
+                self.output.logError('Error while scanning ' + str(entry.target) + ': ' + str(e))
+                storage = None
+
+            if self.limiter is not None:
+                actual = storage.get('connections', estimate) if storage is not None else estimate
+                self.limiter.correct(estimate, actual)
+            self.results.put((entry, storage))
+
+    def update(self, entry, storage):
+        now = time.time()
+        record = None
+        if storage is not None:
+            record = NDJSON_Result_Output_Plugin.record(entry.target, storage)
+
+        # failed: no protocol could be checked at all
+        failed = record is None or all('error' in p for p in record['protocols'].values())
+
+        with self.condition:
+            if failed:
+                entry.failures += 1
+                delay = min(self.RETRY_DELAY * 2 ** (entry.failures - 1), self.interval(entry))
+                entry.due = now + delay * random.uniform(0.8, 1.2)
+            else:
+                entry.failures = 0
+                entry.last = now
+                entry.handshakes = storage.get('connections')
+
+                # rescan targets with changed results more often
+                digest = hashlib.sha256(json.dumps(self.configuration(record), sort_keys=True).encode('utf-8')).hexdigest()
+                if entry.digest is not None and digest != entry.digest:
+                    entry.changed = self.CHANGED_SCANS
+                elif entry.changed > 0:
+                    entry.changed -= 1
+                entry.digest = digest
+                entry.due = now + self.interval(entry)
+
+        self.push(entry)
+
+    @staticmethod
+    def configuration(record):
+        # the part of a result which only changes with the configuration of
+        # the target, of the resumption test only the supported mechanisms
+        configuration = {}
+        for protocol, results in record['protocols'].items():
+            configuration[protocol] = {name: value for name, value in results.items() if name in Scan_Protocol_Result.CONFIGURATION}
+            if 'resumption' in results:
+                configuration[protocol]['resumption'] = {mechanism: value.get('supported') for mechanism, value in results['resumption'].items()}
+        return configuration
+
+    def run(self):
+        for i in range(self.workers):
+            threading.Thread(target=self.work, daemon=True).start()
+        self.output.logInfo('Scheduling ' + str(len(self.entries)) + ' targets ...')
+
+        try:
+            # results are handed to the output plugins by this thread only
+            lastSave = time.monotonic()
+            while True:
+                try:
+                    entry, storage = self.results.get(timeout=10)
+                except queue.Empty:
+                    continue
+
+                if storage is not None:
+                    self.output.reportResult(entry.target, storage)
+                self.update(entry, storage)
+
+                if time.monotonic() - lastSave >= 60:
+                    self.saveState()
+                    lastSave = time.monotonic()
+        finally:
+            self.saveState()
@@ -0,0 +1,222 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import collections
+import http.server
+import itertools
+import json
+import queue
+import threading
+import time
+
+# TLS SAK imports
+from lib.plugin import Plugin
+from lib.plugin.output.ndjson import NDJSON_Result_Output_Plugin
+from lib.scan import Scan_Target
+from lib.scan import Scanner
+
+class Scan_Job:
+    def __init__(self, job_id, targets):
+        self.id = job_id
+        self.targets = targets
+        self.records = []
+        self.created = time.time()
+        self.finished = None
+        self.condition = threading.Condition()
+
+    def isDone(self):
+        return len(self.records) >= len(self.targets)
+
+    def status(self):
+        with self.condition:
+            state = 'queued'
+            if self.isDone():
+                state = 'done'
+            elif len(self.records) > 0:
+                state = 'running'
+            return {'id': self.id, 'state': state, 'targets': len(self.targets), 'finished': len(self.records), \
+                    'created': self.created, 'done': self.finished}
+
+    def addRecord(self, record):
+        with self.condition:
+            self.records += [record]
+            if self.isDone():
+                self.finished = time.time()
+            self.condition.notify_all()
+
+class Scan_Service:
+    # finished jobs kept for status and result queries
+    MAX_JOBS = 1000
+
+    def __init__(self, address, workers=4):
+        self.address = address
+        self.workers = workers
+        self.output = Plugin.getPlugin('Helper_Output_Plugin')
+        self.scanner = Scanner()
+
+        self.lock = threading.Lock()
+        self.jobs = collections.OrderedDict()
+        self.jobIds = itertools.count(1)
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+
+    # ---- job handling ----
+    def submit(self, targets):
+        with self.lock:
+            job = Scan_Job(next(self.jobIds), targets)
+            self.jobs[job.id] = job
+
+            # forget the oldest finished jobs
+            while len(self.jobs) > self.MAX_JOBS:
+                oldest = next(iter(self.jobs.values()))
+                if not oldest.isDone():
+                    break
+                del self.jobs[oldest.id]
+
+        for target in targets:
+            self.tasks.put((job, target))
+        return job
+
+    def getJob(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def listJobs(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.status() for job in jobs]
+
+    # ---- scanning ----
+    def work(self):
+        # the number of worker threads limits the concurrent scans of all jobs
+        while True:
+            job, target = self.tasks.get()
+            try:
+                storage = self.scanner.scan(target)
+            except Exception as e:
+                self.output.logError('Error while scanning ' + str(target) + ': ' + str(e))
+                storage = self.scanner.prepare(target)
+                storage.put('error', str(e))
+            self.results.put((job, target, storage))
+
+    def run(self):
+        for i in range(self.workers):
+            threading.Thread(target=self.work, daemon=True).start()
+
+        server = http.server.ThreadingHTTPServer(self.address, Scan_Service_Handler)
+        server.daemon_threads = True
+        server.service = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.output.logInfo('Scan service listening on ' + self.address[0] + ':' + str(server.server_address[1]) + ' ...')
+
+        try:
+            # results are handed to the output plugins by this thread only
+            while True:
+                job, target, storage = self.results.get()
+                self.output.reportResult(target, storage)
+                job.addRecord(NDJSON_Result_Output_Plugin.record(target, storage))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+class Scan_Service_Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def sendJSON(self, data, code=200):
+        body = json.dumps(data, sort_keys=True).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def getJob(self, path):
+        try:
+            job = self.server.service.getJob(int(path.split('/')[2]))
+        except ValueError:
+            job = None
+        if job is None:
+            self.sendJSON({'error': 'unknown scan job'}, 404)
+        return job
+
+    def do_POST(self):
+        if self.path != '/scans':
+            self.sendJSON({'error': 'not found'}, 404)
+            return
+
+        # {"targets": ["host[:port]", ...], "port": 443, "starttls": null}
+        try:
+            size = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(size).decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('scan request has to be a JSON object')
+            if not isinstance(request.get('targets'), list) or not all(isinstance(spec, str) for spec in request['targets']):
+                raise ValueError('targets have to be a list of strings')
+            port = int(request.get('port', 443))
+            starttls = request.get('starttls')
+            if starttls not in (None, 'smtp', 'ftp'):
+                raise ValueError('unsupported STARTTLS protocol: ' + str(starttls))
+            targets = [Scan_Target.parse(spec, port, starttls) for spec in request['targets']]
+            if len(targets) < 1:
+                raise ValueError('no target specified')
+        except (ValueError, KeyError, TypeError) as e:
+            self.sendJSON({'error': str(e)}, 400)
+            return
+
+        job = self.server.service.submit(targets)
+        self.sendJSON(job.status(), 201)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+
+        if parts == ['scans']:
+            self.sendJSON(self.server.service.listJobs())
+        elif len(parts) == 2 and parts[0] == 'scans':
+            job = self.getJob(self.path)
+            if job is not None:
+                self.sendJSON(job.status())
+        elif len(parts) == 3 and parts[0] == 'scans' and parts[2] == 'results':
+            job = self.getJob(self.path)
+            if job is not None:
+                self.streamResults(job)
+        else:
+            self.sendJSON({'error': 'not found'}, 404)
+
+    def streamResults(self, job):
+        # one JSON record per line as soon as each target is finished, the
+        # response ends when the whole job is done
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+
+        sent = 0
+        while True:
+            with job.condition:
+                while sent >= len(job.records) and not job.isDone():
+                    job.condition.wait()
+                records = job.records[sent:]
+                done = job.isDone()
+
+            for record in records:
+                self.wfile.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            sent += len(records)
+
+            if done and sent >= len(job.records):
+                break
@@ -47,8 +47,16 @@ class TLS_CipherSuite_Database():
 
     def getCipherSuite(self, cs_id):
         if cs_id not in self.database:
-            self.database[cs_id] = TLS_CipherSuite(cs_id=cs_id, name='unknown (' + binascii.hexlify(cs_id) + ')')
+            self.database[cs_id] = TLS_CipherSuite(cs_id=cs_id, name='unknown (' + binascii.hexlify(cs_id).decode('utf-8') + ')')
         return self.database[cs_id]
 
-    def getAllCipherSuites(self):
-        return [self.getCipherSuite(cs_id) for cs_id in sorted(self.database.keys())]
+    def getAllCipherSuites(self, protocol=None):
+        cipher_suites = [self.getCipherSuite(cs_id) for cs_id in sorted(self.database.keys())]
+
+        # TLS 1.3 cipher suites (no key exchange/authentication in their
+        # name) are only valid with TLS 1.3 and vice versa
+        if protocol == 'TLSv1.3':
+            cipher_suites = [cs for cs in cipher_suites if cs.kx == 'ANY']
+        elif protocol is not None:
+            cipher_suites = [cs for cs in cipher_suites if cs.kx != 'ANY']
+        return cipher_suites
@@ -48,7 +48,7 @@ class TLS_CompressionMethod_Database():
         if cm_id in self.database:
             return TLS_CompressionMethod(cm_id=cm_id, **self.database[cm_id])
         else:
-            return TLS_CompressionMethod(cm_id=cm_id, name='unknown (' + binascii.hexlify(cm_id) + ')')
+            return TLS_CompressionMethod(cm_id=cm_id, name='unknown (' + binascii.hexlify(cm_id).decode('utf-8') + ')')
 
     def getAllCompressionMethods(self):
         return [self.getCompressionMethod(cm_id) for cm_id in self.database]
@@ -15,11 +15,25 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# generic imports
+import binascii
+import os
+import struct
+
 # TLS SAK imports
 from lib.connection import Connection
 from lib.tls import TLS_VERSIONS
 from lib.tls.tlsparameter import TLS_CipherSuite
 from lib.tls.tlsparameter import TLS_CompressionMethod
+from lib.tls.tlsparameter import TLS_Extension
+from lib.tls.tlsparameter import TLS_Extension_ECPointFormats
+from lib.tls.tlsparameter import TLS_Extension_ExtendedMasterSecret
+from lib.tls.tlsparameter import TLS_Extension_KeyShare
+from lib.tls.tlsparameter import TLS_Extension_ServerName
+from lib.tls.tlsparameter import TLS_Extension_SignatureAlgorithms
+from lib.tls.tlsparameter import TLS_Extension_SupportedGroups
+from lib.tls.tlsparameter import TLS_Extension_SupportedVersions
+from lib.tls.tlsparameter import TLS_KeyExchange_Parameters
 from lib.tls.tlspkg import TLS_pkg
 from lib.tls.tlspkg import TLS_pkg_Alert
 from lib.tls.tlspkg import TLS_pkg_Handshake
@@ -32,8 +46,24 @@ from lib.tls.tlsexceptions import TLS_Alert_Exception
 from lib.tls.tlsexceptions import TLS_Exception
 from lib.tls.tlsexceptions import TLS_Parser_Exception
 from lib.tls.tlsexceptions import TLS_Protocol_Exception
+from lib.tls.tlsexceptions import TLS_Protocol_Version_Exception
 
 class TLS_Connection:
+    # extensions sent by default, built (and serialized) only once
+    DEFAULT_EXTENSIONS = [TLS_Extension_SupportedGroups(['x25519', 'secp256r1', 'x448', 'secp521r1', 'secp384r1', \
+                                                         'ffdhe2048', 'ffdhe3072', 'ffdhe4096', 'ffdhe6144', 'ffdhe8192']), \
+                          TLS_Extension_ECPointFormats(['uncompressed'])]
+    DEFAULT_EXTENSIONS_TLS12 = [TLS_Extension_SignatureAlgorithms(['ecdsa_secp256r1_sha256', 'ecdsa_secp384r1_sha384', \
+                                                                   'ecdsa_secp521r1_sha512', 'ed25519', 'ed448', \
+                                                                   'rsa_pss_rsae_sha256', 'rsa_pss_rsae_sha384', 'rsa_pss_rsae_sha512', \
+                                                                   'rsa_pss_pss_sha256', 'rsa_pss_pss_sha384', 'rsa_pss_pss_sha512', \
+                                                                   'rsa_pkcs1_sha256', 'rsa_pkcs1_sha384', 'rsa_pkcs1_sha512', \
+                                                                   'ecdsa_sha1', 'rsa_pkcs1_sha1', 'dsa_sha256', 'dsa_sha1'])]
+    DEFAULT_EXTENSIONS_TLS13 = [TLS_Extension_SupportedVersions(['TLSv1.3'])]
+
+    # ServerHello.random of a HelloRetryRequest (RFC 8446, 4.1.3)
+    HELLO_RETRY_REQUEST_RANDOM = binascii.unhexlify('cf21ad74e59a6111be1d8c021e65b891c2a211167abb8c5e079e09e2c8a8339c')
+
     def __init__(self, connection):
         if not issubclass(type(connection), Connection):
             raise TLS_Exception('connection has to be of type Connection for TLS connection')
@@ -43,6 +73,12 @@ class TLS_Connection:
         self.cipher_suites = []
         self.compression_methods = []
         self.state = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.extensions = None
+        self.groups = None
+        self.session_id = b''
+        self.server_name = getattr(connection, 'servername', None)
 
     # ---- connection property setters ----
     def setAvailableCipherSuites(self, cipher_suites):
@@ -74,6 +110,40 @@ class TLS_Connection:
 
         self.client_protocol_version = protocol_version
 
+    def setServerName(self, server_name):
+        # validate parameter
+        if server_name is not None and type(server_name) is not str:
+            raise TLS_Exception('server_name has to be a string')
+
+        self.server_name = server_name
+
+    def setSupportedGroups(self, groups):
+        # validate parameter
+        if type(groups) is not list:
+            raise TLS_Exception('groups has to be a list of named groups')
+        for group in groups:
+            if group not in TLS_Extension_SupportedGroups.GROUPS:
+                raise TLS_Exception('groups has to be a list of named groups')
+
+        self.groups = groups
+
+    def setSessionId(self, session_id):
+        # validate parameter
+        if type(session_id) is not bytes or len(session_id) > 32:
+            raise TLS_Exception('session_id has to be up to 32 bytes')
+
+        self.session_id = session_id
+
+    def setExtensions(self, extensions):
+        # validate parameter
+        if type(extensions) is not list:
+            raise TLS_Exception('extensions has to be a list of extensions')
+        for ext in extensions:
+            if not isinstance(ext, TLS_Extension):
+                raise TLS_Exception('extensions has to be a list of extensions')
+
+        self.extensions = extensions
+
 
     # ---- connection property getters ----
     def getChosenCipherSuite(self):
@@ -86,6 +156,48 @@ class TLS_Connection:
             return self.compression_method
         return None
 
+    def getCertificates(self):
+        if hasattr(self, 'certificates') and self.certificates is not None:
+            return self.certificates
+        return []
+
+    def getServerExtensions(self):
+        if hasattr(self, 'server_extensions') and self.server_extensions is not None:
+            return self.server_extensions
+        return []
+
+    def getHelloRetryRequest(self):
+        # named group requested by a HelloRetryRequest, None otherwise
+        if hasattr(self, 'hello_retry_request'):
+            return self.hello_retry_request
+        return None
+
+    def getKeyExchange(self):
+        # parameters of the ServerKeyExchange are only parsed on request, so
+        # a malformed package does not fail the handshake
+        if not hasattr(self, 'key_exchange') and hasattr(self, 'server_key_exchange'):
+            self.key_exchange = self._keyExchange(self.server_key_exchange)
+        if hasattr(self, 'key_exchange'):
+            return self.key_exchange
+        return None
+
+    def getSelectedGroup(self):
+        if hasattr(self, 'selected_group'):
+            return self.selected_group
+        return None
+
+    def getServerSessionId(self):
+        if hasattr(self, 'server_session_id'):
+            return self.server_session_id
+        return None
+
+    def isResumed(self):
+        # the server echoes the offered session id to resume the session (TLS
+        # 1.3 always echoes the legacy session id and resumes with PSKs only)
+        if self.getServerProtocolVersion() == 'TLSv1.3':
+            return False
+        return len(self.session_id) > 0 and self.getServerSessionId() == self.session_id
+
     def getServerProtocolVersion(self):
         if hasattr(self, 'server_protocol_version') and self.server_protocol_version is not None:
             return self.server_protocol_version
@@ -94,6 +206,7 @@ class TLS_Connection:
     # ---- internal methods ----
     def _readBuffer(self):
         buffer = self.connection.recv()
+        self.bytes_received += len(buffer)
         self.buffer += buffer
 
     def _readPackage(self):
@@ -105,11 +218,80 @@ class TLS_Connection:
             except TLS_Parser_Exception as e:
                 self._readBuffer()
 
+    def _clientExtensions(self):
+        if self.extensions is not None:
+            return self.extensions
+
+        # SSLv3 knows no extensions
+        if self.client_protocol_version == 'SSLv3':
+            return []
+
+        extensions = []
+        if self.server_name is not None:
+            extensions += [TLS_Extension_ServerName(self.server_name)]
+        if self.groups is None:
+            extensions += self.DEFAULT_EXTENSIONS
+        else:
+            extensions += [TLS_Extension_SupportedGroups(self.groups), self.DEFAULT_EXTENSIONS[1]]
+        if self.client_protocol_version in ('TLSv1.2', 'TLSv1.3'):
+            extensions += self.DEFAULT_EXTENSIONS_TLS12
+        if len(self.session_id) > 0:
+            # sessions with an extended master secret are only resumed if it
+            # is offered again (RFC 7627, 5.3)
+            extensions += [TLS_Extension_ExtendedMasterSecret()]
+        if self.client_protocol_version == 'TLSv1.3':
+            # any 32 bytes are a valid x25519 public key, the handshake never
+            # gets to the point where the shared secret is needed; servers
+            # preferring another group answer with a HelloRetryRequest. With
+            # explicit groups no key share is sent, so the server has to
+            # choose by its preference only.
+            shares = []
+            if self.groups is None:
+                shares = [('x25519', os.urandom(32))]
+            extensions += self.DEFAULT_EXTENSIONS_TLS13 + [TLS_Extension_KeyShare(shares)]
+        return extensions
+
+    def _isPSK(self):
+        return self.cipher_suite is not None and self.cipher_suite.au == 'PSK'
+
+    def _keyExchange(self, server_key_exchange):
+        # the layout of the parameters depends on the chosen cipher suite
+        kx = self.cipher_suite.kx if self.cipher_suite is not None else None
+        if kx in ('ECDHE', 'ECDH'):
+            parameters = server_key_exchange.getECDHParameters(self._isPSK())
+            if parameters is not None:
+                return TLS_KeyExchange_Parameters('ECDH', group=parameters[0], public=parameters[1])
+        elif kx in ('DHE', 'DH'):
+            parameters = server_key_exchange.getDHParameters(self._isPSK())
+            if parameters is not None:
+                prime, generator, public = parameters
+                return TLS_KeyExchange_Parameters('DH', prime=prime, generator=generator, public=public)
+        return None
+
+    def _clientHello(self):
+        # TLS 1.3 is negotiated with the supported_versions extension, the
+        # legacy version fields stay at TLS 1.2 (handshake) and TLS 1.0 (record)
+        # and compression has to be limited to the null method
+        hello_version = self.client_protocol_version
+        record_version = self.client_protocol_version
+        compression_methods = self.compression_methods
+        if self.client_protocol_version == 'TLSv1.3':
+            hello_version = 'TLSv1.2'
+            record_version = 'TLSv1.0'
+            compression_methods = [cm for cm in compression_methods if cm.cm_id == b'\x00']
+
+        client_hello = TLS_Handshake_pkg_ClientHello(version=hello_version, cipher_suites=self.cipher_suites, compression_methods=compression_methods, session_id=self.session_id, extensions=self._clientExtensions())
+        return TLS_pkg_Handshake(record_version, client_hello).serialize()
+
+    def getClientHelloSize(self):
+        # size of the ClientHello record with the current settings
+        return len(self._clientHello())
+
     # ---- state machine ----
     def connect(self):
-        client_hello = TLS_Handshake_pkg_ClientHello(version=self.client_protocol_version, cipher_suites=self.cipher_suites, compression_methods=self.compression_methods)
-        handshake_client_hello = TLS_pkg_Handshake(self.client_protocol_version, client_hello)
-        self.connection.send(handshake_client_hello.serialize())
+        data = self._clientHello()
+        self.connection.send(data)
+        self.bytes_sent += len(data)
 
         serverHelloDoneReceived = False
         while not serverHelloDoneReceived:
@@ -125,6 +307,38 @@ class TLS_Connection:
                     self.cipher_suite = hs.cipher_suite
                     self.compression_method = hs.compression_method
                     self.server_protocol_version = hs.version
+                    self.server_extensions = hs.extensions
+                    self.server_session_id = hs.session_id
+
+                    supported_versions = hs.getExtension(TLS_Extension_SupportedVersions.EXTENSIONTYPE)
+                    if supported_versions is not None and len(supported_versions.versions) == 1:
+                        self.server_protocol_version = supported_versions.versions[0]
+                    if self.server_protocol_version != self.client_protocol_version:
+                        raise TLS_Protocol_Version_Exception(self.client_protocol_version, self.server_protocol_version)
+
+                    # everything after the ServerHello is encrypted in TLS 1.3,
+                    # but the cipher suite is already chosen (even by a
+                    # HelloRetryRequest)
+                    if self.server_protocol_version == 'TLSv1.3':
+                        key_share = hs.getExtension(TLS_Extension_KeyShare.EXTENSIONTYPE)
+                        if struct.pack('!I', hs.timestamp) + hs.random == self.HELLO_RETRY_REQUEST_RANDOM:
+                            self.hello_retry_request = key_share.selected_group if key_share is not None else None
+                        self.selected_group = key_share.selected_group if key_share is not None else None
+                        if self.selected_group is not None:
+                            self.key_exchange = TLS_KeyExchange_Parameters('DH' if self.selected_group.startswith('ffdhe') else 'ECDH', group=self.selected_group)
+                        serverHelloDoneReceived = True
+                        break
+
+                    # an abbreviated handshake continues with ChangeCipherSpec
+                    # and the encrypted Finished of the server
+                    if self.isResumed():
+                        serverHelloDoneReceived = True
+                        break
+                elif type(hs) is TLS_Handshake_pkg_Certificate:
+                    self.certificates = hs.certificates
+                elif type(hs) is TLS_Handshake_pkg_ServerKeyExchange:
+                    self.selected_group = hs.getNamedCurve(self._isPSK())
+                    self.server_key_exchange = hs
                 elif type(hs) is TLS_Handshake_pkg_ServerHelloDone:
                     serverHelloDoneReceived = True
                     break
@@ -50,6 +50,15 @@ class TLS_Protocol_Exception(TLS_Exception):
     def __str__(self):
         return 'TLS_Protocol_Exception: ' + str(self.msg)
 
+class TLS_Protocol_Version_Exception(TLS_Protocol_Exception):
+    def __init__(self, requested, negotiated):
+        self.requested = requested
+        self.negotiated = negotiated
+        self.msg = 'server negotiated ' + str(negotiated) + ' instead of ' + str(requested)
+
+    def __str__(self):
+        return 'TLS_Protocol_Version_Exception: ' + str(self.msg)
+
 class TLS_Alert_Exception(TLS_Exception):
     def __init__(self, level, description):
         self.level = level
@@ -0,0 +1,142 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import binascii
+import json
+import random
+import threading
+
+class TLS_KeyExchange_Database():
+    instance = None
+
+    # security level in bits of the named elliptic curves
+    CURVES = {'sect163k1': 163, 'sect163r1': 163, 'sect163r2': 163, 'sect193r1': 193, 'sect193r2': 193, \
+              'sect233k1': 233, 'sect233r1': 233, 'sect239k1': 239, 'sect283k1': 283, 'sect283r1': 283, \
+              'sect409k1': 409, 'sect409r1': 409, 'sect571k1': 571, 'sect571r1': 571, 'secp160k1': 160, \
+              'secp160r1': 160, 'secp160r2': 160, 'secp192k1': 192, 'secp192r1': 192, 'secp224k1': 224, \
+              'secp224r1': 224, 'secp256k1': 256, 'secp256r1': 256, 'secp384r1': 384, 'secp521r1': 521, \
+              'brainpoolP256r1': 256, 'brainpoolP384r1': 384, 'brainpoolP512r1': 512, 'x25519': 256, 'x448': 448}
+
+    @staticmethod
+    def getInstance():
+        if TLS_KeyExchange_Database.instance is None:
+            TLS_KeyExchange_Database.instance = TLS_KeyExchange_Database()
+        return TLS_KeyExchange_Database.instance
+
+    def __init__(self):
+        self.loadDatabase()
+
+        # classifications by parameters, the same few primes and curves are
+        # seen over and over again
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def loadDatabase(self):
+        with open('data/dhprimes.json') as f:
+            data = f.read().replace('\n', '')
+
+        json_data = json.loads(data)
+
+        self.primes = {}
+        self.groups = {}
+        for prime in json_data:
+            value = binascii.unhexlify(prime)
+            self.primes[value] = json_data[prime]
+            if json_data[prime]['name'].startswith('RFC 7919 '):
+                self.groups[json_data[prime]['name'][9:]] = value
+
+    def classify(self, parameters):
+        if parameters.kind == 'DH' and parameters.prime is None and parameters.group in self.groups:
+            key = ('DH', self.groups[parameters.group], b'\x02')
+        else:
+            key = (parameters.kind, parameters.prime if parameters.kind == 'DH' else parameters.group, parameters.generator)
+
+        with self.lock:
+            classification = self.cache.get(key)
+        if classification is None:
+            if key[0] == 'DH':
+                classification = self.classifyDH(key[1], key[2])
+            else:
+                classification = self.classifyECDH(key[1])
+            with self.lock:
+                self.cache[key] = classification
+        return classification
+
+    def classifyECDH(self, curve):
+        bits = self.CURVES.get(curve)
+        if bits is None:
+            status = 'unknown'
+        elif bits < 224:
+            status = 'insecure'
+        else:
+            status = 'secure'
+        return {'type': 'ECDH', 'group': curve, 'bits': bits, 'status': status}
+
+    def classifyDH(self, prime, generator):
+        if prime is None:
+            return {'type': 'DH', 'group': None, 'bits': None, 'status': 'unknown'}
+
+        known = self.primes.get(prime.lstrip(b'\x00'))
+        p = int.from_bytes(prime, 'big')
+        bits = p.bit_length()
+
+        # well-known primes are safe primes, others have to be checked
+        safe = known is not None or self.isSafePrime(p)
+
+        # Logjam: export grade groups are broken, 1024 bit groups are within
+        # reach of precomputation - especially if they are shared widely
+        if bits < 1024 or not safe:
+            status = 'insecure'
+        elif bits < 2048:
+            status = 'insecure' if known is not None else 'avoid'
+        else:
+            status = 'secure'
+
+        return {'type': 'DH', 'group': known['name'] if known is not None else None, 'bits': bits, 'status': status, \
+                'common': known is not None, 'safeprime': safe, \
+                'generator': int.from_bytes(generator, 'big') if generator is not None else None}
+
+    @staticmethod
+    def isProbablePrime(n, rounds=16):
+        if n < 2:
+            return False
+        for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+            if n % p == 0:
+                return n == p
+
+        # Miller-Rabin
+        d = n - 1
+        s = 0
+        while d % 2 == 0:
+            d //= 2
+            s += 1
+        for i in range(rounds):
+            x = pow(random.randrange(2, n - 1), d, n)
+            if x == 1 or x == n - 1:
+                continue
+            for j in range(s - 1):
+                x = pow(x, 2, n)
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def isSafePrime(p):
+        return TLS_KeyExchange_Database.isProbablePrime((p - 1) // 2) and TLS_KeyExchange_Database.isProbablePrime(p)
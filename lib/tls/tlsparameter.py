@@ -17,11 +17,16 @@
 
 # generic imports
 import binascii
+import hashlib
+import struct
 
 # TLS SAK imports
+from lib.tls import TLS_VERSIONS
 from lib.tls.tlsexceptions import TLS_Exception
 from lib.tls.tlsratings import TLS_Rating
 from lib.tls.tlsratings import TLS_Ratings_Database
+from lib.tls.tlskeyexchange import TLS_KeyExchange_Database
+from lib.tls.tlsx509 import X509_Certificate_Cache
 
 class TLS_CipherSuite:
     def __init__(self, cs_id, name='unknown', kx=None, au=None, enc=None, bits=None, mac=None, ref=None):
@@ -41,6 +46,12 @@ class TLS_CipherSuite:
         self.mac = mac
         self.ref = ref
 
+    def __eq__(self, other):
+        return type(other) is TLS_CipherSuite and self.cs_id == other.cs_id
+
+    def __hash__(self):
+        return hash(self.cs_id)
+
     def serialize(self):
         return self.cs_id
 
@@ -66,23 +77,322 @@ class TLS_CompressionMethod:
         self.cm_id = cm_id
         self.name = name
 
+    def __eq__(self, other):
+        return type(other) is TLS_CompressionMethod and self.cm_id == other.cm_id
+
+    def __hash__(self):
+        return hash(self.cm_id)
+
     def serialize(self):
         return self.cm_id
 
 class TLS_Extension:
-    def __init__(self):
-        pass
+    EXTENSIONTYPE = None
+
+    # extension classes by type, collected on first use
+    classes = None
+
+    def __init__(self, ext_type=None, data=b''):
+        if ext_type is None:
+            ext_type = self.EXTENSIONTYPE
+
+        # validation
+        if type(ext_type) is not bytes or len(ext_type) != 2:
+            raise TLS_Exception('invalid extension type')
+        if type(data) is not bytes or len(data) > 0xffff:
+            raise TLS_Exception('invalid extension data')
+
+        self.ext_type = ext_type
+        self.data = data
+
+        # extensions are immutable, so the serialized form is built only once
+        self.serialized = ext_type + struct.pack('!H', len(data)) + data
 
     def serialize(self):
-        pass
+        return self.serialized
 
+    @staticmethod
+    def parseList(buffer):
+        #  2 bytes  extension type
+        #  2 bytes  size in bytes of extension data
+        # .. bytes  extension data
+        extensions = []
+        pos = 0
+        while pos < len(buffer):
+            if len(buffer) < pos + 4:
+                raise TLS_Exception('extension header exceeds list of extensions')
+            ext_type = buffer[pos:pos+2]
+            [ext_size] = struct.unpack('!H', buffer[pos+2:pos+4])
+            if len(buffer) < pos + 4 + ext_size:
+                raise TLS_Exception('extension data exceeds list of extensions')
+            data = buffer[pos+4:pos+4+ext_size]
+            pos += 4 + ext_size
+
+            cls = TLS_Extension.getClass(ext_type)
+            if cls is not None:
+                extensions += [cls.fromData(data)]
+            else:
+                extensions += [TLS_Extension(ext_type, data)]
+        return extensions
+
+    @staticmethod
+    def getClass(ext_type):
+        if TLS_Extension.classes is None:
+            TLS_Extension.classes = {cls.EXTENSIONTYPE: cls for cls in TLS_Extension.__subclasses__()}
+        return TLS_Extension.classes.get(ext_type)
+
+    @classmethod
+    def fromData(cls, data):
+        extension = cls.__new__(cls)
+        TLS_Extension.__init__(extension, cls.EXTENSIONTYPE, data)
+        return extension
+
+    def getName(self):
+        return 'unknown (' + binascii.hexlify(self.ext_type).decode('utf-8') + ')'
+
+class TLS_Extension_ServerName(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x00'
+
+    def __init__(self, hostname):
+        if type(hostname) is str:
+            hostname = hostname.encode('idna')
+        self.hostname = hostname
+
+        #  2 bytes  size in bytes of server name list
+        #  1 byte   name type           (0x00 = host_name)
+        #  2 bytes  size in bytes of host name
+        # .. bytes  host name
+        entry = b'\x00' + struct.pack('!H', len(hostname)) + hostname
+        super().__init__(data=struct.pack('!H', len(entry)) + entry)
+
+    @classmethod
+    def fromData(cls, data):
+        # servers acknowledge the server name with empty data
+        extension = super().fromData(data)
+        extension.hostname = data[5:] if len(data) > 5 else None
+        return extension
+
+    def getName(self):
+        return 'server_name'
+
+class TLS_Extension_SupportedGroups(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x0a'
+    GROUPS = {'sect163k1': b'\x00\x01', 'sect163r1': b'\x00\x02', 'sect163r2': b'\x00\x03', 'sect193r1': b'\x00\x04', \
+              'sect193r2': b'\x00\x05', 'sect233k1': b'\x00\x06', 'sect233r1': b'\x00\x07', 'sect239k1': b'\x00\x08', \
+              'sect283k1': b'\x00\x09', 'sect283r1': b'\x00\x0a', 'sect409k1': b'\x00\x0b', 'sect409r1': b'\x00\x0c', \
+              'sect571k1': b'\x00\x0d', 'sect571r1': b'\x00\x0e', 'secp160k1': b'\x00\x0f', 'secp160r1': b'\x00\x10', \
+              'secp160r2': b'\x00\x11', 'secp192k1': b'\x00\x12', 'secp192r1': b'\x00\x13', 'secp224k1': b'\x00\x14', \
+              'secp224r1': b'\x00\x15', 'secp256k1': b'\x00\x16', 'secp256r1': b'\x00\x17', 'secp384r1': b'\x00\x18', \
+              'secp521r1': b'\x00\x19', 'brainpoolP256r1': b'\x00\x1a', 'brainpoolP384r1': b'\x00\x1b', \
+              'brainpoolP512r1': b'\x00\x1c', 'x25519': b'\x00\x1d', 'x448': b'\x00\x1e', \
+              'ffdhe2048': b'\x01\x00', 'ffdhe3072': b'\x01\x01', 'ffdhe4096': b'\x01\x02', 'ffdhe6144': b'\x01\x03', \
+              'ffdhe8192': b'\x01\x04'}
+    NAMES = None
+
+    def __init__(self, groups):
+        for group in groups:
+            if group not in self.GROUPS:
+                raise TLS_Exception('unknown named group: ' + str(group))
+        self.groups = groups
+
+        #  2 bytes  size in bytes of named group list
+        #  2 bytes*x  named group id    (0x001d = x25519)
+        content = b''.join(self.GROUPS[group] for group in groups)
+        super().__init__(data=struct.pack('!H', len(content)) + content)
+
+    @classmethod
+    def fromData(cls, data):
+        extension = super().fromData(data)
+        extension.groups = [TLS_Extension_SupportedGroups.getGroupName(data[i:i+2]) for i in range(2, len(data) - 1, 2)]
+        return extension
+
+    @staticmethod
+    def getGroupName(group_id):
+        if TLS_Extension_SupportedGroups.NAMES is None:
+            TLS_Extension_SupportedGroups.NAMES = {v: k for k, v in TLS_Extension_SupportedGroups.GROUPS.items()}
+        name = TLS_Extension_SupportedGroups.NAMES.get(group_id)
+        if name is None:
+            return 'unknown (' + binascii.hexlify(group_id).decode('utf-8') + ')'
+        return name
+
+    def getName(self):
+        return 'supported_groups'
+
+class TLS_Extension_ECPointFormats(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x0b'
+    FORMATS = {'uncompressed': b'\x00', 'ansiX962_compressed_prime': b'\x01', 'ansiX962_compressed_char2': b'\x02'}
+
+    def __init__(self, formats):
+        for fmt in formats:
+            if fmt not in self.FORMATS:
+                raise TLS_Exception('unknown ec point format: ' + str(fmt))
+        self.formats = formats
+
+        #  1 byte   size in bytes of point format list
+        #  1 byte*x   point format id   (0x00 = uncompressed)
+        content = b''.join(self.FORMATS[fmt] for fmt in formats)
+        super().__init__(data=struct.pack('!B', len(content)) + content)
+
+    @classmethod
+    def fromData(cls, data):
+        extension = super().fromData(data)
+        names = {v: k for k, v in TLS_Extension_ECPointFormats.FORMATS.items()}
+        extension.formats = [names.get(data[i:i+1], 'unknown') for i in range(1, len(data))]
+        return extension
+
+    def getName(self):
+        return 'ec_point_formats'
+
+class TLS_Extension_SignatureAlgorithms(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x0d'
+    ALGORITHMS = {'rsa_pkcs1_sha1': b'\x02\x01', 'ecdsa_sha1': b'\x02\x03', 'rsa_pkcs1_sha256': b'\x04\x01', \
+                  'ecdsa_secp256r1_sha256': b'\x04\x03', 'rsa_pkcs1_sha384': b'\x05\x01', 'ecdsa_secp384r1_sha384': b'\x05\x03', \
+                  'rsa_pkcs1_sha512': b'\x06\x01', 'ecdsa_secp521r1_sha512': b'\x06\x03', 'rsa_pss_rsae_sha256': b'\x08\x04', \
+                  'rsa_pss_rsae_sha384': b'\x08\x05', 'rsa_pss_rsae_sha512': b'\x08\x06', 'ed25519': b'\x08\x07', \
+                  'ed448': b'\x08\x08', 'rsa_pss_pss_sha256': b'\x08\x09', 'rsa_pss_pss_sha384': b'\x08\x0a', \
+                  'rsa_pss_pss_sha512': b'\x08\x0b', 'dsa_sha1': b'\x02\x02', 'dsa_sha256': b'\x04\x02'}
+
+    def __init__(self, algorithms):
+        for algorithm in algorithms:
+            if algorithm not in self.ALGORITHMS:
+                raise TLS_Exception('unknown signature algorithm: ' + str(algorithm))
+        self.algorithms = algorithms
+
+        #  2 bytes  size in bytes of signature algorithm list
+        #  2 bytes*x  signature algorithm id    (0x0403 = ecdsa_secp256r1_sha256)
+        content = b''.join(self.ALGORITHMS[algorithm] for algorithm in algorithms)
+        super().__init__(data=struct.pack('!H', len(content)) + content)
+
+    def getName(self):
+        return 'signature_algorithms'
+
+class TLS_Extension_ExtendedMasterSecret(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x17'
 
-class TLS_Certificate:
     def __init__(self):
-        pass
+        super().__init__()
+
+    def getName(self):
+        return 'extended_master_secret'
+
+class TLS_Extension_SupportedVersions(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x2b'
+
+    def __init__(self, versions):
+        for version in versions:
+            if version not in TLS_VERSIONS:
+                raise TLS_Exception('unknown protocol version: ' + str(version))
+        self.versions = versions
+
+        #  1 byte   size in bytes of version list
+        #  2 bytes*x  version           (0x0304 = TLS 1.3)
+        content = b''.join(TLS_VERSIONS[version] for version in versions)
+        super().__init__(data=struct.pack('!B', len(content)) + content)
+
+    @classmethod
+    def fromData(cls, data):
+        # the server answers with the selected version only
+        extension = super().fromData(data)
+        if len(data) == 2:
+            raw = [data]
+        else:
+            raw = [data[i:i+2] for i in range(1, len(data) - 1, 2)]
+        names = {v: k for k, v in TLS_VERSIONS.items()}
+        extension.versions = [names.get(v, 'unknown (' + binascii.hexlify(v).decode('utf-8') + ')') for v in raw]
+        return extension
+
+    def getName(self):
+        return 'supported_versions'
+
+
+class TLS_Extension_KeyShare(TLS_Extension):
+    EXTENSIONTYPE = b'\x00\x33'
+
+    def __init__(self, shares):
+        for group, key_exchange in shares:
+            if group not in TLS_Extension_SupportedGroups.GROUPS:
+                raise TLS_Exception('unknown named group: ' + str(group))
+        self.shares = shares
+        self.selected_group = None
+
+        #  2 bytes  size in bytes of key share list
+        # - list of key shares -
+        #  2 bytes  named group id      (0x001d = x25519)
+        #  2 bytes  size in bytes of key exchange
+        # .. bytes  key exchange
+        content = b''.join(TLS_Extension_SupportedGroups.GROUPS[group] + struct.pack('!H', len(key_exchange)) + key_exchange for group, key_exchange in shares)
+        super().__init__(data=struct.pack('!H', len(content)) + content)
+
+    @classmethod
+    def fromData(cls, data):
+        # a HelloRetryRequest only names the group the server wants, a
+        # ServerHello carries a single key share
+        extension = super().fromData(data)
+        extension.shares = []
+        extension.selected_group = None
+        if len(data) == 2:
+            extension.selected_group = TLS_Extension_SupportedGroups.getGroupName(data)
+        elif len(data) >= 4:
+            [size] = struct.unpack('!H', data[2:4])
+            if len(data) == 4 + size:
+                extension.selected_group = TLS_Extension_SupportedGroups.getGroupName(data[0:2])
+                extension.shares = [(extension.selected_group, data[4:])]
+        return extension
+
+    def getName(self):
+        return 'key_share'
+
+class TLS_KeyExchange_Parameters:
+    def __init__(self, kind, group=None, prime=None, generator=None, public=None):
+        # kind is 'DH' or 'ECDH', finite field groups are either named
+        # (TLS 1.3) or given by their prime (ServerKeyExchange)
+        self.kind = kind
+        self.group = group
+        self.prime = prime
+        self.generator = generator
+        self.public = public
+
+    def getClassification(self):
+        return TLS_KeyExchange_Database.getInstance().classify(self)
+
+class TLS_Certificate:
+    def __init__(self, data=None):
+        self.data = data
+        self.fingerprint = None
 
     def serialize(self):
-        pass
+        return self.data
 
     def parse(self, buffer):
-        pass
+        # only keep the DER encoding, it is decoded on first access
+        self.data = buffer
+        self.fingerprint = None
+        return self
+
+    def getFingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = hashlib.sha256(self.data).hexdigest()
+        return self.fingerprint
+
+    def getInfo(self):
+        return X509_Certificate_Cache.get(self.getFingerprint(), self.data)
+
+    def getSubject(self):
+        return self.getInfo().subject
+
+    def getIssuer(self):
+        return self.getInfo().issuer
+
+    def getSubjectAltNames(self):
+        return self.getInfo().subject_alt_names
+
+    def getValidity(self):
+        info = self.getInfo()
+        return info.not_before, info.not_after
+
+    def getKey(self):
+        info = self.getInfo()
+        return info.key_type, info.key_size
+
+    def getSignatureAlgorithm(self):
+        return self.getInfo().signature_algorithm
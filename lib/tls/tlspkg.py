@@ -31,6 +31,7 @@ from lib.tls.tlsparameter import TLS_Certificate
 from lib.tls.tlsparameter import TLS_CipherSuite
 from lib.tls.tlsparameter import TLS_CompressionMethod
 from lib.tls.tlsparameter import TLS_Extension
+from lib.tls.tlsparameter import TLS_Extension_SupportedGroups
 
 class TLS_pkg():
     def __init__(self):
@@ -281,7 +282,8 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
             raise TLS_Exception('invalid timestamp type in client hello package')
         if len(self.random) != 28:
             raise TLS_Exception('invalid length of random number in client hello package')
-        #TODO: validity check of session_id
+        if type(self.session_id) is not bytes or len(self.session_id) > 32:
+            raise TLS_Exception('invalid session id in client hello package')
         if type(self.cipher_suites) is not list or len(self.cipher_suites) < 1:
             raise TLS_Exception('missing list of cipher suites in client hello package')
         for cs in self.cipher_suites:
@@ -295,7 +297,7 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
         if type(self.extensions) is not list:
             self.extensions = []
         for ext in self.extensions:
-            if type(ext) is not TLS_Extension:
+            if not isinstance(ext, TLS_Extension):
                 raise TLS_Exception('invalid item in extensions in client hello package: ' + type(ext))
 
         v = TLS_VERSIONS[self.version]
@@ -345,11 +347,11 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38:
-            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + pkg_size)
+            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + str(pkg_size))
 
         # fetch SSL/TLS version
         version = pkg_content[0:2]
-        self.version = 'unknown (' + binascii.hexlify(version) + ')'
+        self.version = 'unknown (' + binascii.hexlify(version).decode('utf-8') + ')'
         for v in TLS_VERSIONS:
             if TLS_VERSIONS[v] == version:
                 self.version = v
@@ -365,7 +367,7 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38 + add_size:
-            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(38 + add_size))
+            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(38 + add_size))
 
         # fetch session id
         self.session_id = pkg_content[35:35+sid_size]
@@ -380,7 +382,7 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38 + add_size:
-            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(38 + add_size))
+            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(38 + add_size))
 
         # fetch all cipher suites
         self.cipher_suites = []
@@ -393,7 +395,7 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38 + add_size:
-            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(38 + add_size))
+            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(38 + add_size))
 
         # fetch all compression methods
         self.compression_methods = []
@@ -403,16 +405,23 @@ class TLS_Handshake_pkg_ClientHello(TLS_Handshake_pkg):
         # (optional) fetch size of extensions
         self.extensions = []
         if pkg_size < 38 + add_size + 2:
-            return
+            return self
 
         [ext_size] = struct.unpack('!H', pkg_content[35+sid_size+2+cs_size+1+cm_size:35+sid_size+2+cs_size+1+cm_size+2])
         add_size += ext_size
 
         # pkg_size valid?
         if pkg_size < 40 + add_size:
-            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(40 + add_size))
+            raise TLS_Malformed_Package_Exception('size of ClientHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(40 + add_size))
+
+        # fetch extensions
+        ext_pos = 35+sid_size+2+cs_size+1+cm_size+2
+        try:
+            self.extensions = TLS_Extension.parseList(pkg_content[ext_pos:ext_pos+ext_size])
+        except TLS_Exception as e:
+            raise TLS_Malformed_Package_Exception('invalid extensions in ClientHello package: ' + str(e))
 
-        # TODO: fetch extensions
+        return self
 
 
 class TLS_Handshake_pkg_ServerHello(TLS_Handshake_pkg):
@@ -445,7 +454,7 @@ class TLS_Handshake_pkg_ServerHello(TLS_Handshake_pkg):
         if type(self.extensions) is not list:
             self.extensions = []
         for ext in self.extensions:
-            if type(ext) is not TLS_Extension:
+            if not isinstance(ext, TLS_Extension):
                 raise TLS_Exception('invalid item in extensions in server hello package: ' + type(ext))
 
         v = TLS_VERSIONS[self.version]
@@ -491,7 +500,7 @@ class TLS_Handshake_pkg_ServerHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38:
-            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + pkg_size)
+            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + str(pkg_size))
 
         # fetch SSL/TLS version
         version = pkg_content[0:2]
@@ -511,7 +520,7 @@ class TLS_Handshake_pkg_ServerHello(TLS_Handshake_pkg):
 
         # pkg_size valid?
         if pkg_size < 38 + add_size:
-            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(38 + add_size))
+            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(38 + add_size))
 
         # fetch session id
         self.session_id = pkg_content[35:35+sid_size]
@@ -525,16 +534,29 @@ class TLS_Handshake_pkg_ServerHello(TLS_Handshake_pkg):
         # (optional) fetch size of extensions
         self.extensions = []
         if pkg_size < 38 + add_size + 2:
-            return
+            return self
 
         [ext_size] = struct.unpack('!H', pkg_content[35+sid_size+3:35+sid_size+5])
         add_size += ext_size
 
         # pkg_size valid?
         if pkg_size < 38 + add_size + 2:
-            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + pkg_size + ' instead of ' + str(38 + add_size + 2))
+            raise TLS_Malformed_Package_Exception('size of ServerHello package content smaller than minimum for a valid package: ' + str(pkg_size) + ' instead of ' + str(38 + add_size + 2))
+
+        # fetch extensions
+        ext_pos = 35+sid_size+5
+        try:
+            self.extensions = TLS_Extension.parseList(pkg_content[ext_pos:ext_pos+ext_size])
+        except TLS_Exception as e:
+            raise TLS_Malformed_Package_Exception('invalid extensions in ServerHello package: ' + str(e))
+
+        return self
 
-        # TODO: fetch extensions
+    def getExtension(self, ext_type):
+        for ext in self.extensions:
+            if ext.ext_type == ext_type:
+                return ext
+        return None
 
 class TLS_Handshake_pkg_Certificate(TLS_Handshake_pkg):
     PACKAGETYPE = b'\x0b'
@@ -550,6 +572,7 @@ class TLS_Handshake_pkg_Certificate(TLS_Handshake_pkg):
 
         #  1 byte   handshake type      (0x0b = Certificate)
         #  3 bytes  size in bytes of Certificate package
+        #  3 bytes  size in bytes of list of certificates
         # .. bytes  content of list of certificates
 
         # - list of certificates -
@@ -564,8 +587,10 @@ class TLS_Handshake_pkg_Certificate(TLS_Handshake_pkg):
             certs_content += crt_size + crt_content
 
         certs_size = struct.pack('!I', len(certs_content))[-3:]
+        pkg_content = certs_size + certs_content
+        pkg_size = struct.pack('!I', len(pkg_content))[-3:]
 
-        return self.PACKAGETYPE + certs_size + certs_content
+        return self.PACKAGETYPE + pkg_size + pkg_content
 
     def parse(self, buffer):
         self.parser_assert_len(buffer, 4)
@@ -578,12 +603,19 @@ class TLS_Handshake_pkg_Certificate(TLS_Handshake_pkg):
         # set parse size
         self.setParseSize(4 + pkg_size)
 
+        # size of list of certificates
+        if pkg_size < 3:
+            raise TLS_Parser_Exception('invalid size of certificate list in certificate package')
+        [certs_size] = struct.unpack('!I', b'\x00' + pkg_content[0:3])
+        if 3 + certs_size > pkg_size:
+            raise TLS_Parser_Exception('invalid size of certificate list in certificate package')
+
         # pointer for current position in pkg_content
-        pos = 0
+        pos = 3
         self.certificates = []
 
         # extract all certificates
-        while pos < pkg_size:
+        while pos < 3 + certs_size:
             if pos + 3 >= pkg_size:
                 raise TLS_Parser_Exception('invalid size of certificate list in certificate package')
 
@@ -601,8 +633,7 @@ class TLS_Handshake_pkg_Certificate(TLS_Handshake_pkg):
 class TLS_Handshake_pkg_ServerKeyExchange(TLS_Handshake_pkg):
     PACKAGETYPE = b'\x0c'
     def __init__(self):
-        # TODO: implement
-        pass
+        self.data = None
 
     def serialize(self):
         raise TLS_Not_Implemented_Exception('handshake: server key exchange')
@@ -625,7 +656,73 @@ class TLS_Handshake_pkg_ServerKeyExchange(TLS_Handshake_pkg):
         # set parse size
         self.setParseSize(4 + pkg_size)
 
-        # TODO: not implemented yet
+        # content depends on the key exchange of the chosen cipher suite
+        self.data = pkg_content
+
+        return self
+
+    def getParameters(self, psk=False):
+        # (EC)DHE_PSK parameters are preceded by the PSK identity hint
+        #  2 bytes  size in bytes of PSK identity hint
+        # .. bytes  PSK identity hint
+        if self.data is None or not psk:
+            return self.data
+        if len(self.data) < 2:
+            raise TLS_Malformed_Package_Exception('PSK identity hint exceeds ServerKeyExchange package')
+        [hint_size] = struct.unpack('!H', self.data[0:2])
+        if len(self.data) < 2 + hint_size:
+            raise TLS_Malformed_Package_Exception('PSK identity hint exceeds ServerKeyExchange package')
+        return self.data[2+hint_size:]
+
+    def getNamedCurve(self, psk=False):
+        # ECDHE parameters start with
+        #  1 byte   curve type          (0x03 = named_curve)
+        #  2 bytes  named curve id      (0x0017 = secp256r1)
+        try:
+            data = self.getParameters(psk)
+        except TLS_Malformed_Package_Exception:
+            return None
+        if data is None or len(data) < 3 or data[0:1] != b'\x03':
+            return None
+        return TLS_Extension_SupportedGroups.getGroupName(data[1:3])
+
+    def getECDHParameters(self, psk=False):
+        #  1 byte   curve type          (0x03 = named_curve)
+        #  2 bytes  named curve id
+        #  1 byte   size in bytes of public point
+        # .. bytes  public point
+        # .. bytes  signature (not parsed)
+        curve = self.getNamedCurve(psk)
+        data = self.getParameters(psk)
+        if curve is None or len(data) < 4:
+            return None
+        [point_size] = struct.unpack('!B', data[3:4])
+        if len(data) < 4 + point_size:
+            raise TLS_Malformed_Package_Exception('public point exceeds ServerKeyExchange package')
+        return curve, data[4:4+point_size]
+
+    def getDHParameters(self, psk=False):
+        #  2 bytes  size in bytes of prime p
+        # .. bytes  prime p
+        #  2 bytes  size in bytes of generator g
+        # .. bytes  generator g
+        #  2 bytes  size in bytes of public value Ys
+        # .. bytes  public value Ys
+        # .. bytes  signature (not parsed, DHE_PSK has none)
+        data = self.getParameters(psk)
+        if data is None:
+            return None
+        values = []
+        pos = 0
+        for i in range(3):
+            if len(data) < pos + 2:
+                raise TLS_Malformed_Package_Exception('DH parameters exceed ServerKeyExchange package')
+            [size] = struct.unpack('!H', data[pos:pos+2])
+            if len(data) < pos + 2 + size:
+                raise TLS_Malformed_Package_Exception('DH parameters exceed ServerKeyExchange package')
+            values += [data[pos+2:pos+2+size]]
+            pos += 2 + size
+        return tuple(values)
 
 
 class TLS_Handshake_pkg_CertificateRequest(TLS_Handshake_pkg):
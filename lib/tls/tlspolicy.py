@@ -0,0 +1,169 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import fnmatch
+import json
+
+# TLS SAK imports
+from lib.tls import TLS_VERSIONS
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlsexceptions import TLS_Exception
+from lib.tls.tlsratings import TLS_Rating
+
+class TLS_Policy:
+    # cipher suite parameters a rule can match (with shell-style patterns)
+    PARAMETERS = ['name', 'kx', 'au', 'enc', 'bits', 'mac']
+
+    # The ratings and rules are compiled into bitmasks per protocol, where
+    # bit n stands for the n-th known cipher suite. The cipher suites a host
+    # supports are turned into the same kind of bitmask, so rating a host or
+    # checking a rule costs a single AND per protocol instead of rating each
+    # cipher suite again.
+    def __init__(self, rules=None):
+        self.cipher_suites = []
+        self.index = {}
+
+        # per protocol: (rating, status) -> mask, masks of PFS cipher suites
+        self.levels = {protocol: {} for protocol in TLS_VERSIONS}
+        self.pfs = {protocol: 0 for protocol in TLS_VERSIONS}
+        self.sortedLevels = None
+
+        # per rule: protocol -> mask of violating cipher suites, per protocol
+        # the mask of cipher suites violating any rule
+        self.rules = {}
+        self.ruleMasks = {}
+        self.violating = {protocol: 0 for protocol in TLS_VERSIONS}
+
+        # fleets share few configurations, so evaluations are cached
+        self.cache = {}
+
+        for cs in TLS_CipherSuite_Database.getInstance().getAllCipherSuites():
+            self.addCipherSuite(cs)
+        for name, rule in (rules or {}).items():
+            self.addRule(name, rule)
+
+    @staticmethod
+    def loadRules(filename):
+        with open(filename) as f:
+            data = f.read().replace('\n', '')
+
+        return json.loads(data)
+
+    # ---- compilation ----
+    def addCipherSuite(self, cs):
+        if cs.cs_id in self.index:
+            return self.index[cs.cs_id]
+
+        bit = 1 << len(self.cipher_suites)
+        self.index[cs.cs_id] = bit
+        self.cipher_suites.append(cs)
+
+        for protocol in TLS_VERSIONS:
+            rating = cs.getRating(protocol)
+            key = (rating.rating, rating.status)
+            self.levels[protocol][key] = self.levels[protocol].get(key, 0) | bit
+            if rating.pfs:
+                self.pfs[protocol] |= bit
+            for name, rule in self.rules.items():
+                if self.matches(rule, protocol, cs, rating):
+                    self.ruleMasks[name][protocol] |= bit
+                    self.violating[protocol] |= bit
+        self.sortedLevels = None
+        self.cache = {}
+        return bit
+
+    def addRule(self, name, rule):
+        for key in rule:
+            if key not in self.PARAMETERS and key not in ['protocol', 'maxrating', 'pfs', 'description']:
+                raise TLS_Exception('unknown condition in policy rule ' + name + ': ' + key)
+
+        self.rules[name] = rule
+        self.ruleMasks[name] = {protocol: 0 for protocol in TLS_VERSIONS}
+        for protocol in TLS_VERSIONS:
+            for n, cs in enumerate(self.cipher_suites):
+                if self.matches(rule, protocol, cs, cs.getRating(protocol)):
+                    self.ruleMasks[name][protocol] |= 1 << n
+            self.violating[protocol] |= self.ruleMasks[name][protocol]
+        self.cache = {}
+
+    @staticmethod
+    def matches(rule, protocol, cs, rating):
+        # a cipher suite violates a rule if it matches all of its conditions
+        if 'protocol' in rule and not any(fnmatch.fnmatchcase(protocol, pattern) for pattern in rule['protocol']):
+            return False
+        for param in TLS_Policy.PARAMETERS:
+            if param not in rule:
+                continue
+            value = getattr(cs, param)
+            if value is None or not any(fnmatch.fnmatchcase(value, pattern) for pattern in rule[param]):
+                return False
+        if 'maxrating' in rule and rating.rating > rule['maxrating']:
+            return False
+        if 'pfs' in rule and rating.pfs != rule['pfs']:
+            return False
+        return True
+
+    # ---- evaluation ----
+    def mask(self, cipher_suites):
+        mask = 0
+        for cs in cipher_suites:
+            bit = self.index.get(cs.cs_id)
+            if bit is None:
+                bit = self.addCipherSuite(cs)
+            mask |= bit
+        return mask
+
+    def getCipherSuites(self, mask):
+        cipher_suites = []
+        while mask:
+            bit = mask & -mask
+            cipher_suites.append(self.cipher_suites[bit.bit_length() - 1])
+            mask ^= bit
+        return cipher_suites
+
+    def evaluate(self, support):
+        # support: protocol -> mask of supported cipher suites, returns the
+        # rating of the host and the violated rules with their cipher suites
+        # (shared by hosts with the same support, so it must not be changed)
+        key = frozenset(support.items())
+        if key in self.cache:
+            return self.cache[key]
+        if self.sortedLevels is None:
+            self.sortedLevels = {protocol: sorted(levels.items()) for protocol, levels in self.levels.items()}
+
+        ratings = {}
+        violations = {}
+        for protocol, mask in support.items():
+            if mask == 0 or protocol not in self.sortedLevels:
+                continue
+
+            # the weakest supported cipher suite rates the protocol
+            for (rating, status), level in self.sortedLevels[protocol]:
+                if level & mask:
+                    ratings[protocol] = TLS_Rating(status=status, rating=rating, pfs=(self.pfs[protocol] & mask) != 0)
+                    break
+
+            if not self.violating[protocol] & mask:
+                continue
+            for name, masks in self.ruleMasks.items():
+                hit = masks[protocol] & mask
+                if hit:
+                    violations.setdefault(name, {})[protocol] = hit
+
+        self.cache[key] = (TLS_Rating.getParentRating(ratings), violations)
+        return self.cache[key]
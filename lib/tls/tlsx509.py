@@ -0,0 +1,217 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import collections
+import datetime
+import ipaddress
+import threading
+
+# TLS SAK imports
+from lib.tls.tlsexceptions import TLS_Exception
+
+class X509_Exception(TLS_Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return 'X509_Exception: ' + str(self.msg)
+
+class X509_DER:
+    # minimal DER reader: returns (tag, content, rest) for the first element
+    @staticmethod
+    def read(buffer):
+        if len(buffer) < 2:
+            raise X509_Exception('DER element too short')
+        tag = buffer[0]
+        length = buffer[1]
+        pos = 2
+        if length & 0x80:
+            count = length & 0x7f
+            if count < 1 or count > 4 or len(buffer) < 2 + count:
+                raise X509_Exception('invalid DER length')
+            length = int.from_bytes(buffer[2:2+count], 'big')
+            pos += count
+        if len(buffer) < pos + length:
+            raise X509_Exception('DER element exceeds buffer')
+        return tag, buffer[pos:pos+length], buffer[pos+length:]
+
+    @staticmethod
+    def children(buffer):
+        items = []
+        while len(buffer) > 0:
+            tag, content, buffer = X509_DER.read(buffer)
+            items += [(tag, content)]
+        return items
+
+    @staticmethod
+    def oid(content):
+        values = []
+        value = 0
+        for byte in content:
+            value = (value << 7) | (byte & 0x7f)
+            if not byte & 0x80:
+                values += [value]
+                value = 0
+        if len(values) < 1:
+            raise X509_Exception('empty object identifier')
+        first = min(values[0] // 40, 2)
+        return '.'.join(str(v) for v in [first, values[0] - first * 40] + values[1:])
+
+    @staticmethod
+    def string(tag, content):
+        # BMPString is UTF-16, everything else is read as UTF-8 (a superset of
+        # the ASCII based string types)
+        if tag == 0x1e:
+            return content.decode('utf-16-be', 'replace')
+        return content.decode('utf-8', 'replace')
+
+    @staticmethod
+    def time(tag, content):
+        text = content.decode('ascii')
+        if tag == 0x17:
+            # UTCTime: YYMMDDHHMMSSZ, years 50-99 are 19xx
+            year = int(text[0:2])
+            text = ('19' if year >= 50 else '20') + text
+        return datetime.datetime.strptime(text[:14], '%Y%m%d%H%M%S').replace(tzinfo=datetime.timezone.utc)
+
+class X509_Certificate_Info:
+    NAMES = {'2.5.4.3': 'CN', '2.5.4.5': 'serialNumber', '2.5.4.6': 'C', '2.5.4.7': 'L', '2.5.4.8': 'ST', \
+             '2.5.4.9': 'street', '2.5.4.10': 'O', '2.5.4.11': 'OU', '0.9.2342.19200300.100.1.25': 'DC', \
+             '1.2.840.113549.1.9.1': 'emailAddress'}
+    SIGNATURES = {'1.2.840.113549.1.1.4': 'md5WithRSAEncryption', '1.2.840.113549.1.1.5': 'sha1WithRSAEncryption', \
+                  '1.2.840.113549.1.1.10': 'rsassaPss', '1.2.840.113549.1.1.11': 'sha256WithRSAEncryption', \
+                  '1.2.840.113549.1.1.12': 'sha384WithRSAEncryption', '1.2.840.113549.1.1.13': 'sha512WithRSAEncryption', \
+                  '1.2.840.10045.4.1': 'ecdsa-with-SHA1', '1.2.840.10045.4.3.2': 'ecdsa-with-SHA256', \
+                  '1.2.840.10045.4.3.3': 'ecdsa-with-SHA384', '1.2.840.10045.4.3.4': 'ecdsa-with-SHA512', \
+                  '1.2.840.10040.4.3': 'dsa-with-SHA1', '2.16.840.1.101.3.4.3.2': 'dsa-with-SHA256', \
+                  '1.3.101.112': 'Ed25519', '1.3.101.113': 'Ed448'}
+    KEYS = {'1.2.840.113549.1.1.1': 'RSA', '1.2.840.113549.1.1.10': 'RSA-PSS', '1.2.840.10040.4.1': 'DSA', \
+            '1.2.840.10045.2.1': 'EC', '1.3.101.112': 'Ed25519', '1.3.101.113': 'Ed448'}
+    CURVES = {'1.2.840.10045.3.1.7': ('secp256r1', 256), '1.3.132.0.34': ('secp384r1', 384), '1.3.132.0.35': ('secp521r1', 521), \
+              '1.2.840.10045.3.1.1': ('secp192r1', 192), '1.3.132.0.33': ('secp224r1', 224), '1.3.132.0.10': ('secp256k1', 256), \
+              '1.3.36.3.3.2.8.1.1.7': ('brainpoolP256r1', 256), '1.3.36.3.3.2.8.1.1.11': ('brainpoolP384r1', 384), \
+              '1.3.36.3.3.2.8.1.1.13': ('brainpoolP512r1', 512)}
+
+    def __init__(self, data):
+        try:
+            self.parse(data)
+        except (IndexError, ValueError) as e:
+            raise X509_Exception('invalid certificate: ' + str(e))
+
+    def parse(self, data):
+        tag, certificate, rest = X509_DER.read(data)
+        tbs, signature_algorithm, signature_value = X509_DER.children(certificate)[:3]
+        fields = X509_DER.children(tbs[1])
+
+        # skip the optional explicit version
+        if fields[0][0] == 0xa0:
+            self.version = int.from_bytes(X509_DER.read(fields[0][1])[1], 'big') + 1
+            fields = fields[1:]
+        else:
+            self.version = 1
+
+        self.serial = format(int.from_bytes(fields[0][1], 'big'), 'x')
+        self.signature_algorithm = self.algorithm(signature_algorithm[1], self.SIGNATURES)
+        self.issuer = self.name(fields[2][1])
+        not_before, not_after = X509_DER.children(fields[3][1])[:2]
+        self.not_before = X509_DER.time(*not_before)
+        self.not_after = X509_DER.time(*not_after)
+        self.subject = self.name(fields[4][1])
+        self.key_type, self.key_size, self.key_curve = self.publicKey(fields[5][1])
+
+        self.subject_alt_names = []
+        for tag, content in fields[6:]:
+            if tag == 0xa3:
+                self.extensions(X509_DER.read(content)[1])
+
+    def algorithm(self, content, names):
+        oid = X509_DER.oid(X509_DER.children(content)[0][1])
+        return names.get(oid, oid)
+
+    def name(self, content):
+        # RFC 4514 style, most significant RDN last
+        parts = []
+        for tag, rdn in X509_DER.children(content):
+            for tag, attribute in X509_DER.children(rdn):
+                (oid_tag, oid), (value_tag, value) = X509_DER.children(attribute)[:2]
+                oid = X509_DER.oid(oid)
+                parts += [self.NAMES.get(oid, oid) + '=' + X509_DER.string(value_tag, value)]
+        return ','.join(reversed(parts))
+
+    def publicKey(self, content):
+        algorithm, key = X509_DER.children(content)[:2]
+        parameters = X509_DER.children(algorithm[1])
+        oid = X509_DER.oid(parameters[0][1])
+        key_type = self.KEYS.get(oid, oid)
+        key_bits = key[1][1:]
+
+        if key_type in ('RSA', 'RSA-PSS'):
+            modulus = X509_DER.children(X509_DER.read(key_bits)[1])[0][1]
+            return key_type, int.from_bytes(modulus, 'big').bit_length(), None
+        if key_type == 'DSA' and len(parameters) > 1:
+            prime = X509_DER.children(parameters[1][1])[0][1]
+            return key_type, int.from_bytes(prime, 'big').bit_length(), None
+        if key_type == 'EC' and len(parameters) > 1 and parameters[1][0] == 0x06:
+            curve, size = self.CURVES.get(X509_DER.oid(parameters[1][1]), (X509_DER.oid(parameters[1][1]), None))
+            return key_type, size, curve
+        if key_type == 'Ed25519':
+            return key_type, 256, None
+        if key_type == 'Ed448':
+            return key_type, 456, None
+        return key_type, None, None
+
+    def extensions(self, content):
+        for tag, extension in X509_DER.children(content):
+            items = X509_DER.children(extension)
+            if X509_DER.oid(items[0][1]) != '2.5.29.17':
+                continue
+
+            # subjectAltName: dNSName [2] and iPAddress [7]
+            for name_tag, name in X509_DER.children(X509_DER.read(items[-1][1])[1]):
+                if name_tag == 0x82:
+                    self.subject_alt_names += ['DNS:' + name.decode('ascii', 'replace')]
+                elif name_tag == 0x87 and len(name) in (4, 16):
+                    self.subject_alt_names += ['IP:' + str(ipaddress.ip_address(name))]
+
+    def summary(self):
+        return {'subject': self.subject, 'issuer': self.issuer, 'serial': self.serial, \
+                'san': self.subject_alt_names, 'notbefore': self.not_before.isoformat(), 'notafter': self.not_after.isoformat(), \
+                'keytype': self.key_type, 'keysize': self.key_size, 'curve': self.key_curve, \
+                'signature': self.signature_algorithm}
+
+class X509_Certificate_Cache:
+    # certificates are decoded once per process, keyed by their fingerprint
+    size = 1024
+    entries = collections.OrderedDict()
+    lock = threading.Lock()
+
+    @staticmethod
+    def get(fingerprint, data):
+        with X509_Certificate_Cache.lock:
+            info = X509_Certificate_Cache.entries.get(fingerprint)
+            if info is not None:
+                X509_Certificate_Cache.entries.move_to_end(fingerprint)
+                return info
+
+        info = X509_Certificate_Info(data)
+
+        with X509_Certificate_Cache.lock:
+            X509_Certificate_Cache.entries[fingerprint] = info
+            while len(X509_Certificate_Cache.entries) > X509_Certificate_Cache.size:
+                X509_Certificate_Cache.entries.popitem(last=False)
+        return info
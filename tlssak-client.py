@@ -17,18 +17,48 @@
 
 # generic imports
 import argparse
+import signal
+import socket
+import sys
 
 # TLS SAK imports
-from lib.connection.starttls import Connection_STARTTLS_FTP
-from lib.connection.starttls import Connection_STARTTLS_SMTP
-from lib.connection.tcpsocket import Connection_TCP_Socket
 from lib.plugin import Plugin
 from lib.plugin import Plugin_Storage
-from lib.plugin.test import Active_Test_Plugin
+from lib.scan import Scan_Target
+from lib.scan import Scanner
+from lib.scan.dedup import Target_Deduplicator
+from lib.scan.distributed import Scan_Coordinator
+from lib.scan.distributed import Scan_Worker
+from lib.scan.pool import Scan_Pool
+from lib.scan.scheduler import Scan_Scheduler
+from lib.scan.service import Scan_Service
 
 # presets
 starttls_supported = ['smtp', 'ftp']
 
+def terminate(signum, frame):
+    sys.exit('terminated by signal ' + str(signum))
+
+def targets(args):
+    # invalid targets are reported and skipped
+    output = Plugin.getPlugin('Helper_Output_Plugin')
+    for host in args.hosts:
+        try:
+            yield Scan_Target.parse(host, args.port, args.starttls)
+        except ValueError as e:
+            output.logError(str(e))
+
+    if args.targetsfile is not None:
+        with open(args.targetsfile) as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if len(line) < 1 or line.startswith('#'):
+                    continue
+                try:
+                    yield Scan_Target.parse(line, args.port, args.starttls)
+                except ValueError as e:
+                    output.logError(args.targetsfile + ':' + str(number) + ': ' + str(e))
+
 def main():
     # load plugins
     plugins = Plugin.findPlugins()
@@ -38,29 +68,102 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--starttls', help='use STARTTLS for specific protocol', choices=starttls_supported, dest='starttls')
     parser.add_argument('-p', '--port', type=int, default=443, help='TCP port to be checked', dest='port')
-    parser.add_argument('host', help='hostname or IP address of target system')
+    parser.add_argument('-iL', '--targets-file', default=None, help='read additional targets (host[:port], one per line) from file', dest='targetsfile')
+    parser.add_argument('-P', '--processes', type=int, default=1, help='scan targets in parallel with this number of worker processes', dest='processes')
+    parser.add_argument('--coordinator', default=None, metavar='HOST:PORT', help='distribute the targets to workers connecting to this address instead of scanning them', dest='coordinator')
+    parser.add_argument('--worker', default=None, metavar='URL', help='scan targets leased from a coordinator (e.g. http://127.0.0.1:8700)', dest='worker')
+    parser.add_argument('--lease-size', type=int, default=10, help='number of targets per coordinator lease', dest='leasesize')
+    parser.add_argument('--lease-timeout', type=int, default=300, help='seconds without progress until a lease is handed to another worker', dest='leasetimeout')
+    parser.add_argument('--lease-retries', type=int, default=3, help='number of leases per target before it is given up', dest='leaseretries')
+    parser.add_argument('--daemon', default=None, metavar='HOST:PORT', help='run as scan service accepting scan jobs over HTTP on this address', dest='daemon')
+    parser.add_argument('--daemon-workers', type=int, default=4, help='number of targets scanned concurrently by the scan service', dest='daemonworkers')
+    parser.add_argument('--schedule', default=None, metavar='FILE', help='continuously rescan the targets of this inventory (host[:port] [class] per line)', dest='schedule')
+    parser.add_argument('--schedule-class', default=[], action='append', metavar='NAME=SECONDS', help='priority class with its rescan interval, highest priority first (default: high=21600, normal=86400, low=604800)', dest='scheduleclasses')
+    parser.add_argument('--schedule-state', default=None, metavar='FILE', help='keep the schedule (last scans, failures) in this file across restarts', dest='schedulestate')
+    parser.add_argument('--schedule-workers', type=int, default=4, help='number of targets scanned concurrently by the scheduler', dest='scheduleworkers')
+    parser.add_argument('--handshake-rate', type=float, default=None, help='global budget of handshakes per second for scheduled scans', dest='handshakerate')
+    parser.add_argument('--dedup', action='store_true', help='scan targets sharing address and server configuration only once', dest='dedup')
+    parser.add_argument('hosts', nargs='*', help='hostname or IP address of target system (optionally with :port)')
     Plugin.executeLambda(None, lambda p, parser=parser: p.prepareArguments(parser))
     args = parser.parse_args()
 
+    if len(args.hosts) < 1 and args.targetsfile is None and args.worker is None and args.daemon is None and args.schedule is None:
+        parser.error('no target specified')
+
+    classes = None
+    if len(args.scheduleclasses) > 0:
+        try:
+            classes = [(c.split('=')[0], float(c.split('=')[1])) for c in args.scheduleclasses]
+        except (IndexError, ValueError):
+            parser.error('invalid priority class, expected NAME=SECONDS')
+    if args.handshakerate is not None and args.handshakerate <= 0:
+        parser.error('--handshake-rate has to be greater than 0')
+    if args.coordinator is not None and args.worker is not None:
+        parser.error('--coordinator and --worker are mutually exclusive')
+
     # create storage
     storage = Plugin_Storage()
 
     # init plugins
     Plugin.executeLambda(None, lambda p, stor=storage, args=args: p.init(stor, args))
 
-    # create connection object
-    if args.starttls == 'ftp':
-        connection = Connection_STARTTLS_FTP(args.host, args.port)
-    elif args.starttls == 'smtp':
-        connection = Connection_STARTTLS_SMTP(args.host, args.port)
-    else:
-        connection = Connection_TCP_Socket(args.host, args.port)
+    # terminate gracefully (e.g. flush journal) when stopped by a scheduler
+    signal.signal(signal.SIGTERM, terminate)
+
+    try:
+        # scan all targets, results are handed to the output plugins right
+        # after each target has been finished
+        output = Plugin.getPlugin('Helper_Output_Plugin')
+        accepted = (target for target in targets(args) if all(p.acceptTarget(target) for p in Plugin.instances))
+
+        # scan service: keep plugins and databases loaded and scan the
+        # targets of jobs submitted over HTTP
+        if args.daemon is not None:
+            target = Scan_Target.parse(args.daemon, 8800)
+            Scan_Service((target.host, target.port), args.daemonworkers).run()
+            return
+
+        # scheduler: rescan the inventory forever
+        if args.schedule is not None:
+            scheduler = Scan_Scheduler(classes, args.scheduleworkers, args.handshakerate, args.schedulestate)
+            scheduler.load(args.schedule, args.port, args.starttls)
+            scheduler.run()
+            return
+
+        # coordinator: only hand out targets and collect results
+        if args.coordinator is not None:
+            target = Scan_Target.parse(args.coordinator, 8700)
+            Scan_Coordinator((target.host, target.port), args.leasesize, args.leasetimeout, args.leaseretries).run(accepted)
+            return
+
+        # worker: scan targets leased from a coordinator
+        worker = None
+        if args.worker is not None:
+            worker = Scan_Worker(args.worker, socket.gethostname(), args.leasesize)
+            accepted = worker.targets()
+
+        # only scan one member of targets sharing the same server
+        dedup = None
+        if args.dedup and worker is None:
+            dedup = Target_Deduplicator()
+            accepted = dedup.group(list(accepted))
+
+        if args.processes > 1:
+            results = Scan_Pool(args, args.processes).scan(accepted)
+        else:
+            scanner = Scanner()
+            results = ((target, scanner.scan(target)) for target in accepted)
 
-    # execute all active tests
-    Plugin.executeLambda(Active_Test_Plugin, lambda p, c=connection, stor=storage: p.execute(c, stor))
+        if dedup is not None:
+            results = dedup.expand(results)
 
-    # deinit plugins:
-    Plugin.executeLambda(None, lambda p, stor=storage: p.deinit(stor))
+        for target, result in results:
+            output.reportResult(target, result)
+            if worker is not None:
+                worker.upload(target, result)
+    finally:
+        # deinit plugins:
+        Plugin.executeLambda(None, lambda p, stor=storage: p.deinit(stor))
 
 if __name__ == '__main__':
     main()
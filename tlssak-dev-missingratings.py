@@ -21,13 +21,13 @@ from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
 from lib.tls.tlsratings import TLS_Ratings_Database
 
 def main():
-    missing = []
+    missing = set()
 
     ratings = TLS_Ratings_Database.getInstance()
     for v in TLS_VERSIONS:
         r = ratings.getRating(param='protocol', setting=v, default=None)
         if r is None:
-            missing += ['protocol=' + v]
+            missing.add('protocol=' + v)
 
     cipher_suites = TLS_CipherSuite_Database.getInstance().getAllCipherSuites()
     for cs in cipher_suites:
@@ -40,12 +40,10 @@ def main():
 
         for k in kvpairs:
             r = ratings.getRating(param=k, setting=kvpairs[k], default=None)
-            dstr = k + '=' + kvpairs[k]
-            if r is None and dstr not in missing:
-                missing += [dstr]
+            if r is None:
+                missing.add(k + '=' + kvpairs[k])
 
-    missing.sort()
-    for m in missing:
+    for m in sorted(missing):
         print(m)
 
 if __name__ == '__main__':
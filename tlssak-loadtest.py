@@ -0,0 +1,107 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import argparse
+import json
+import sys
+
+# TLS SAK imports
+from lib.scan import Scan_Target
+from lib.scan.loadtest import Handshake_Load_Test
+from lib.scan.loadtest import Loopback_Handshake_Server
+from lib.tls import TLS_VERSIONS
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+
+def main():
+    parser = argparse.ArgumentParser(description='measure the handshake capacity of a TLS server (handshakes are stopped after the server flight, so no ClientKeyExchange - and no RSA decryption - is done)')
+    parser.add_argument('target', nargs='?', default=None, help='hostname or IP address of target system (optionally with :port)')
+    parser.add_argument('-tp', '--tls-protocol', default=[], action='append', choices=list(TLS_VERSIONS.keys()), help='protocol to connect with (default: TLSv1.2)', dest='protocols')
+    parser.add_argument('-c', '--ciphersuite', default=[], action='append', help='test cipher suites whose name contains this text, one after another (default: the suite preferred by the server)', dest='ciphersuites')
+    parser.add_argument('--rate', type=float, default=None, help='start this many handshakes per second (open loop) instead of running them back to back', dest='rate')
+    parser.add_argument('--concurrency', type=int, default=16, help='number of handshakes in flight (maximum with --rate)', dest='concurrency')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per protocol and cipher suite', dest='duration')
+    parser.add_argument('--starttls', default=None, choices=['ftp', 'smtp'], help='use STARTTLS before the handshake', dest='starttls')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per protocol and cipher suite', dest='json')
+    parser.add_argument('--loopback', action='store_true', help='test against a stand-in server on 127.0.0.1 instead of a target (e.g. to try the options)', dest='loopback')
+    parser.add_argument('--loopback-delay', type=float, default=0.001, help='seconds the stand-in server takes per handshake', dest='loopbackdelay')
+    parser.add_argument('--loopback-capacity', type=int, default=4, help='number of handshakes the stand-in server handles at the same time', dest='loopbackcapacity')
+    args = parser.parse_args()
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error('--rate has to be greater than 0')
+    if args.concurrency < 1:
+        parser.error('--concurrency has to be at least 1')
+    if args.loopbackcapacity < 1:
+        parser.error('--loopback-capacity has to be at least 1')
+    if (args.target is None) == (not args.loopback):
+        parser.error('either a target or --loopback has to be given')
+    if args.loopback and args.starttls is not None:
+        parser.error('--starttls is not supported by the stand-in server')
+
+    server = None
+    if args.loopback:
+        server = Loopback_Handshake_Server(args.loopbackdelay, args.loopbackcapacity).start()
+        target = Scan_Target('127.0.0.1', server.port)
+    else:
+        target = Scan_Target.parse(args.target, 443, args.starttls)
+    try:
+        run(args, target)
+    finally:
+        if server is not None:
+            server.stop()
+
+def run(args, target):
+    protocols = args.protocols if len(args.protocols) > 0 else ['TLSv1.2']
+    database = TLS_CipherSuite_Database.getInstance()
+
+    for protocol in protocols:
+        # resolve names, only suites accepted by the server are tested
+        candidates = database.getAllCipherSuites(protocol)
+        if len(args.ciphersuites) > 0:
+            candidates = [cs for cs in candidates if any(pattern.upper() in cs.name.upper() for pattern in args.ciphersuites)]
+        else:
+            candidates = [None]
+
+        for cipher_suite in candidates:
+            if cipher_suite is None:
+                cipher_suite = Handshake_Load_Test.preferred(target, protocol, database.getAllCipherSuites(protocol))
+                if cipher_suite is None:
+                    print(str(target) + ' ' + protocol + ': no cipher suite accepted', file=sys.stderr)
+                    continue
+            elif Handshake_Load_Test(target, protocol, cipher_suite).handshake() is not None:
+                if len(candidates) < 10:
+                    print(str(target) + ' ' + protocol + ' ' + cipher_suite.name + ': not accepted', file=sys.stderr)
+                continue
+
+            report = Handshake_Load_Test(target, protocol, cipher_suite, args.rate, args.concurrency, args.duration).run()
+            if args.json:
+                print(json.dumps(report, sort_keys=True))
+            else:
+                print(str(target) + ' ' + protocol + ' ' + cipher_suite.name + ': ' + \
+                      str(report['handshakes']) + ' handshakes, ' + '%.1f' % report['handshakes_per_second'] + '/s, ' + \
+                      ', '.join(name + ' ' + milliseconds(report[name]) for name in ('p50', 'p90', 'p99', 'max')) + \
+                      ''.join(', ' + str(count) + 'x ' + error for error, count in sorted(report['errors'].items())))
+            sys.stdout.flush()
+
+def milliseconds(value):
+    if value is None:
+        return '-'
+    return '%.1fms' % (value * 1000)
+
+if __name__ == '__main__':
+    main()
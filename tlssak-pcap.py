@@ -0,0 +1,68 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import argparse
+import json
+import multiprocessing
+import sys
+
+# TLS SAK imports
+from lib.pcap import Pcap_Exception
+from lib.pcap.analysis import Pcap_TLS_Statistics
+from lib.pcap.analysis import analyzeFile
+
+def main():
+    parser = argparse.ArgumentParser(description='aggregate the TLS handshakes in pcap/pcapng captures')
+    parser.add_argument('files', nargs='+', help='pcap or pcapng files')
+    parser.add_argument('-P', '--processes', type=int, default=multiprocessing.cpu_count(), help='number of files analyzed in parallel', dest='processes')
+    parser.add_argument('--top', type=int, default=20, help='number of offered cipher suites and server names listed', dest='top')
+    parser.add_argument('--json', action='store_true', help='print the statistics as JSON', dest='json')
+    args = parser.parse_args()
+
+    statistics = Pcap_TLS_Statistics()
+    failed = False
+
+    # one file per task, every worker process has its own connection table
+    with multiprocessing.Pool(max(1, min(args.processes, len(args.files)))) as pool:
+        for path, result in pool.imap_unordered(analyzeFileSafe, args.files):
+            if type(result) is str:
+                print(result, file=sys.stderr)
+                failed = True
+                continue
+            statistics.merge(result)
+
+    report = statistics.report(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, counter in report.items():
+            print(name + ':')
+            for key, value in counter.items():
+                print('  ' + str(value).rjust(10) + '  ' + str(key))
+
+    if failed:
+        sys.exit(1)
+
+def analyzeFileSafe(path):
+    try:
+        return analyzeFile(path)
+    except (OSError, Pcap_Exception) as e:
+        return path, path + ': ' + str(e)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import argparse
+import sqlite3
+import struct
+import sys
+import time
+
+# TLS SAK imports
+from lib.plugin.output.sqlite import SQLite_Result_Output_Plugin
+from lib.scan import Scan_Target
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+from lib.tls.tlspolicy import TLS_Policy
+
+def main():
+    parser = argparse.ArgumentParser(description='rate scan results stored with --sqlite-db and check them against policies')
+    parser.add_argument('database', help='SQLite database written by tlssak-client.py')
+    parser.add_argument('-p', '--policy', default=[], action='append', help='JSON file with policy rules (default: data/policies.json)', dest='policies')
+    parser.add_argument('--since', type=float, default=None, help='only consider scans of the last N days', dest='since')
+    parser.add_argument('--max-rating', type=int, default=None, help='only list targets rated with this value or lower', dest='maxrating')
+    parser.add_argument('--violations', action='store_true', help='only list targets violating a policy rule', dest='violations')
+    args = parser.parse_args()
+
+    rules = {}
+    for filename in args.policies or ['data/policies.json']:
+        rules.update(TLS_Policy.loadRules(filename))
+    policy = TLS_Policy(rules)
+
+    try:
+        db = SQLite_Result_Output_Plugin.openReadOnly(args.database)
+    except sqlite3.Error as e:
+        sys.exit('unable to open result database ' + args.database + ': ' + str(e))
+
+    # latest result per target within the selected time range
+    where = ''
+    params = []
+    if args.since is not None:
+        where = ' WHERE started >= ?'
+        params = [time.time() - args.since * 86400]
+    query = 'SELECT r.id, r.host, r.port, c.protocol, c.cs_id FROM results r JOIN ciphersuites c ON c.result_id = r.id ' \
+            'WHERE r.id IN (SELECT MAX(id) FROM results' + where + ' GROUP BY host, port, starttls)'
+
+    # collect the supported cipher suites of each target as bitmasks
+    database = TLS_CipherSuite_Database.getInstance()
+    bits = {}
+    targets = {}
+    support = {}
+    for result_id, host, port, protocol, cs_id in db.execute(query, params):
+        bit = bits.get(cs_id)
+        if bit is None:
+            bit = bits[cs_id] = policy.mask([database.getCipherSuite(struct.pack('!H', cs_id))])
+        if result_id not in targets:
+            targets[result_id] = Scan_Target(host, port)
+            support[result_id] = {}
+        support[result_id][protocol] = support[result_id].get(protocol, 0) | bit
+
+    start = time.perf_counter()
+    evaluated = [(targets[result_id], policy.evaluate(support[result_id])) for result_id in targets]
+    duration = time.perf_counter() - start
+
+    violated = {}
+    for target, (rating, violations) in sorted(evaluated, key=lambda item: str(item[0])):
+        for name in violations:
+            violated[name] = violated.get(name, 0) + 1
+        if args.maxrating is not None and rating.rating > args.maxrating:
+            continue
+        if args.violations and len(violations) < 1:
+            continue
+
+        print(str(target) + ' ' + rating.status + '/' + str(rating.rating))
+        for name, protocols in sorted(violations.items()):
+            for protocol, mask in protocols.items():
+                print('  ! ' + name + ' (' + protocol + '): ' + ', '.join(cs.name for cs in policy.getCipherSuites(mask)))
+
+    print(str(len(evaluated)) + ' targets evaluated in ' + '%.1f' % (duration * 1000) + ' ms', file=sys.stderr)
+    for name in sorted(violated):
+        print(' * ' + name + ': ' + str(violated[name]) + ' targets', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
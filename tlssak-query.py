@@ -0,0 +1,101 @@
+# TLS-SAK - TLS Swiss Army Knife
+# https://github.com/RBT-itsec/TLS-SAK
+# Copyright (C) 2016 by Mirko Hansen / ARGE Rundfunk-Betriebstechnik
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# generic imports
+import argparse
+import sqlite3
+import struct
+import sys
+import time
+
+# TLS SAK imports
+from lib.plugin.output.sqlite import SQLite_Result_Output_Plugin
+from lib.scan import Scan_Target
+from lib.tls.tlsciphersuites import TLS_CipherSuite_Database
+
+def main():
+    parser = argparse.ArgumentParser(description='query scan results stored with --sqlite-db')
+    parser.add_argument('database', help='SQLite database written by tlssak-client.py')
+    parser.add_argument('-c', '--ciphersuite', default=[], action='append', help='only list cipher suites whose name contains this text (e.g. RC4)', dest='ciphersuites')
+    parser.add_argument('-tp', '--tls-protocol', default=[], action='append', help='only list results for this protocol', dest='protocols')
+    parser.add_argument('--host', default=None, help='only list results of this target (host[:port])', dest='host')
+    parser.add_argument('--max-rating', type=int, default=None, help='only list cipher suites rated with this value or lower', dest='maxrating')
+    parser.add_argument('--since', type=float, default=None, help='only consider scans of the last N days', dest='since')
+    parser.add_argument('--all', action='store_true', help='list all matching scans instead of only the latest result per target', dest='all')
+    args = parser.parse_args()
+
+    try:
+        db = SQLite_Result_Output_Plugin.openReadOnly(args.database)
+    except sqlite3.Error as e:
+        sys.exit('unable to open result database ' + args.database + ': ' + str(e))
+
+    where = []
+    params = []
+
+    if args.since is not None:
+        where += ['r.started >= ?']
+        params += [time.time() - args.since * 86400]
+
+    if args.host is not None:
+        target = Scan_Target.parse(args.host, None)
+        where += ['r.host = ?']
+        params += [target.host]
+        if target.port is not None:
+            where += ['r.port = ?']
+            params += [target.port]
+
+    if not args.all:
+        # latest result per target within the selected time range
+        latest = 'SELECT MAX(id) FROM results r'
+        if len(where) > 0:
+            latest += ' WHERE ' + ' AND '.join(where)
+        latest += ' GROUP BY host, port, starttls'
+        where += ['r.id IN (' + latest + ')']
+        params += params
+
+    if len(args.ciphersuites) > 0:
+        # resolve names to ids, so the index on cs_id can be used
+        cs_ids = []
+        for cs in TLS_CipherSuite_Database.getInstance().getAllCipherSuites():
+            if any(pattern.upper() in cs.name.upper() for pattern in args.ciphersuites):
+                [cs_id] = struct.unpack('!H', cs.cs_id)
+                cs_ids += [cs_id]
+        if len(cs_ids) < 1:
+            sys.exit('no known cipher suite matches ' + ', '.join(args.ciphersuites))
+        where += ['c.cs_id IN (' + ','.join('?' * len(cs_ids)) + ')']
+        params += cs_ids
+
+    if len(args.protocols) > 0:
+        where += ['c.protocol IN (' + ','.join('?' * len(args.protocols)) + ')']
+        params += args.protocols
+
+    if args.maxrating is not None:
+        where += ['c.rating <= ?']
+        params += [args.maxrating]
+
+    query = 'SELECT r.host, r.port, r.started, c.protocol, c.cs_id, c.status FROM results r JOIN ciphersuites c ON c.result_id = r.id'
+    if len(where) > 0:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY r.host, r.port, r.started, c.protocol, c.position'
+
+    database = TLS_CipherSuite_Database.getInstance()
+    for host, port, started, protocol, cs_id, status in db.execute(query, params):
+        cs = database.getCipherSuite(struct.pack('!H', cs_id))
+        print(str(Scan_Target(host, port)) + ' ' + time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)) + ' ' + protocol + ' ' + cs.name + ' (' + status + ')')
+
+if __name__ == '__main__':
+    main()